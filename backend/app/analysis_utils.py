@@ -1,59 +1,110 @@
 # backend/app/analysis_utils.py
-from datetime import time, timedelta
+"""
+Движок анализа данных пациента.
 
-def analyze_patient_data(all_records: list) -> list:
-    recommendations = []
-    # Разделяем данные по типам для удобства анализа
-    glucose_records = [r for r in all_records if r['record_type'] == 'glucose']
-    carb_records = [r for r in all_records if r['record_type'] == 'carbs']
-    
-    
-    # --- Правило 1: Поиск ночных гипогликемий ---
-    night_lows = 0
-    for record in glucose_records:
-        record_time = record["timestamp"].time()
-        # Ночное время с 00:00 до 06:00
-        if time(0, 0) <= record_time < time(6, 0):
-            if record["value"] < 4.0: # Порог гипогликемии
-                night_lows += 1
-    
-    if night_lows > 2: # Если было больше 2 случаев за период
-        recommendations.append(
+Правила работают над отсортированными массивами NumPy (epoch-секунды и значения),
+поэтому каждое правило - это маски и searchsorted, а не вложенные циклы по записям.
+Новое правило регистрируется декоратором @rule и получает те же входные данные (AnalysisData).
+"""
+from typing import Callable, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.time_utils import from_epoch, to_epoch
+
+SECONDS_PER_DAY = 86400
+HYPO_THRESHOLD = 4.0          # Порог гипогликемии, ммоль/л
+HYPER_THRESHOLD = 10.0        # Порог гипергликемии, ммоль/л
+NIGHT_END = 6 * 3600          # Ночное время с 00:00 до 06:00
+NIGHT_LOWS_LIMIT = 2          # Рекомендация, если ночных гипогликемий больше
+POST_MEAL_WINDOW = 2 * 3600   # Окно поиска пика после еды
+
+NO_FINDINGS_MESSAGE = "✅ Комплексный анализ не выявил явных отклонений."
+
+
+class AnalysisData(NamedTuple):
+    glucose_ts: np.ndarray        # int64, отсортированы по возрастанию
+    glucose_values: np.ndarray    # float64
+    glucose_time_of_day: np.ndarray  # секунды от начала суток
+    carbs_ts: np.ndarray
+    carbs_values: np.ndarray
+
+
+RULES: List[Callable[[AnalysisData], Optional[str]]] = []
+
+
+def rule(func):
+    """Регистрирует правило анализа. Правило возвращает текст рекомендации или None."""
+    RULES.append(func)
+    return func
+
+
+# --- Правило 1: Поиск ночных гипогликемий ---
+@rule
+def night_hypoglycemia(data: AnalysisData) -> Optional[str]:
+    night_lows = np.count_nonzero((data.glucose_time_of_day < NIGHT_END) & (data.glucose_values < HYPO_THRESHOLD))
+    if night_lows > NIGHT_LOWS_LIMIT:
+        return (
             "⚠️ Обнаружены повторяющиеся ночные гипогликемии. "
             "Рекомендуется рассмотреть коррекцию вечерней дозы базального инсулина."
         )
+    return None
+
+
+# --- Правило 2: Поиск постпрандиальных (после еды) пиков ---
+@rule
+def post_meal_spike(data: AnalysisData) -> Optional[str]:
+    if not len(data.carbs_ts) or not len(data.glucose_ts):
+        return None
+
+    # Окно (прием пищи, прием пищи + 2 часа] для каждого приема - два бинарных поиска
+    lo = np.searchsorted(data.glucose_ts, data.carbs_ts, side="right")
+    hi = np.searchsorted(data.glucose_ts, data.carbs_ts + POST_MEAL_WINDOW, side="right")
+
+    # Максимум по каждому окну за один проход: reduceat по парам (lo, hi);
+    # -inf в конце позволяет использовать hi == len(glucose) как индекс
+    padded = np.append(data.glucose_values, -np.inf)
+    peaks = np.maximum.reduceat(padded, np.column_stack([lo, hi]).ravel())[::2]
+    spikes = np.flatnonzero((hi > lo) & (peaks > HYPER_THRESHOLD))
+    if not len(spikes):
+        return None
 
-    # --- Правило 2: Поиск постпрандиальных (после еды) пиков ---
-    post_meal_spikes = 0
-    # (Это упрощенная симуляция, т.к. у нас нет данных о приемах пищи.
-    # Мы ищем пики в типичное время после еды)
-    for record in glucose_records:
-        record_time = record["timestamp"].time()
-        if time(10, 0) <= record_time < time(12, 0) or \
-           time(15, 0) <= record_time < time(17, 0) or \
-           time(20, 0) <= record_time < time(22, 0):
-            if record["value"] > 10.0: # Порог гипергликемии
-                post_meal_spikes += 1
-    
-    for meal in carb_records:
-        # Ищем показания глюкозы через ~2 часа после еды
-        two_hours_after = meal['timestamp'] + timedelta(hours=2)
-        relevant_glucose_readings = [
-            g['value'] for g in glucose_records 
-            if meal['timestamp'] < g['timestamp'] <= two_hours_after
-        ]
-        
-        if relevant_glucose_readings:
-            peak_glucose = max(relevant_glucose_readings)
-            if peak_glucose > 10.0: # Постпрандиальная гипергликемия
-                meal_time = meal['timestamp'].strftime('%d.%m %H:%M')
-                recommendations.append(
-                    f"📈 Обнаружен высокий пик глюкозы ({peak_glucose} ммоль/л) после приема пищи в {meal_time}. "
-                    "Возможно, углеводный коэффициент для этого приема пищи нуждается в коррекции."
-                )
-                break # Достаточно одного примера, чтобы не спамить
+    first = spikes[0]  # Достаточно одного примера, чтобы не спамить
+    peak_glucose = float(peaks[first])
+    meal_time = from_epoch(int(data.carbs_ts[first])).strftime('%d.%m %H:%M')
+    return (
+        f"📈 Обнаружен высокий пик глюкозы ({peak_glucose} ммоль/л) после приема пищи в {meal_time}. "
+        "Возможно, углеводный коэффициент для этого приема пищи нуждается в коррекции."
+    )
 
+
+def analyze_series(glucose_ts: np.ndarray, glucose_values: np.ndarray,
+                   carbs_ts: np.ndarray, carbs_values: np.ndarray) -> list:
+    """Запускает все зарегистрированные правила над отсортированными рядами глюкозы и углеводов."""
+    glucose_ts = np.asarray(glucose_ts, dtype=np.int64)
+    data = AnalysisData(
+        glucose_ts=glucose_ts,
+        glucose_values=np.asarray(glucose_values, dtype=np.float64),
+        glucose_time_of_day=glucose_ts % SECONDS_PER_DAY,
+        carbs_ts=np.asarray(carbs_ts, dtype=np.int64),
+        carbs_values=np.asarray(carbs_values, dtype=np.float64),
+    )
+    recommendations = [message for message in (check(data) for check in RULES) if message]
     if not recommendations:
-        recommendations.append("✅ Комплексный анализ не выявил явных отклонений.")
+        recommendations.append(NO_FINDINGS_MESSAGE)
+    return recommendations
+
+
+def analyze_patient_data(all_records: list) -> list:
+    """
+    Совместимый интерфейс: принимает список словарей {"timestamp": datetime, "record_type", "value"}.
+    """
+    def series(record_type):
+        points = sorted(
+            (to_epoch(r["timestamp"]), r["value"]) for r in all_records if r["record_type"] == record_type
+        )
+        timestamps = np.array([p[0] for p in points], dtype=np.int64)
+        values = np.array([p[1] for p in points], dtype=np.float64)
+        return timestamps, values
 
-    return recommendations
\ No newline at end of file
+    return analyze_series(*series("glucose"), *series("carbs"))
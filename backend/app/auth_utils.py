@@ -1,48 +1,89 @@
+import threading
 from datetime import datetime, timedelta, timezone
-from jose import JWTError, jwt
-import secrets
-from datetime import datetime, timedelta, timezone
-from jose import JWTError, jwt
-from dotenv import load_dotenv # <--- Импортируем функцию
-import os # <--- Импортируем модуль os для доступа к переменным окружения
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import sqlite3
-
-# Загружаем переменные из .env файла в окружение
-load_dotenv()
+from app.config import DOCTOR_CACHE_SIZE, DOCTOR_CACHE_TTL, SECRET_KEY
+from app.database import connection
+from app.cache_utils import LRUCache
 
 # --- КОНФИГУРАЦИЯ БЕЗОПАСНОСТИ ---
 
-# Читаем секретный ключ из переменных окружения
-# os.getenv() вернет None, если переменная не найдена
-SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
-DB_NAME = "medical_app.db"
+# Кэш врачей процесса (DOCTOR_CACHE_SIZE / DOCTOR_CACHE_TTL): большинство запросов проверяют токен без обращения к базе.
+# Смена пароля и деактивация сбрасывают запись сразу в этом процессе, в остальных воркерах - не позже TTL.
+# Колонки врача, доступные обработчикам (хэш пароля в кэш не попадает)
+DOCTOR_COLUMNS = "id, username, full_name, specialization, is_active, token_version"
 
-# Добавляем проверку, что ключ действительно загружен
-if SECRET_KEY is None:
-    raise ValueError("Необходимо установить переменную окружения SECRET_KEY в .env файле")
+def load_jwt():
+    # python-jose тянет за собой cryptography - импортируем при первом использовании, а не при старте.
+    # Ключ проверяется здесь же: без него приложение импортируется, а /api/ready покажет jwt как failed
+    if SECRET_KEY is None:
+        raise ValueError("Необходимо установить переменную окружения SECRET_KEY в .env файле")
+    from jose import JWTError, jwt
+    return jwt, JWTError
 
 def create_access_token(data: dict):
+    jwt, _ = load_jwt()
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_doctor_token(doctor) -> str:
+    """Токен врача: имя (sub), id (did) и версия токенов (ver) для проверки без запроса к базе."""
+    return create_access_token(
+        data={"sub": doctor["username"], "did": doctor["id"], "ver": doctor["token_version"]}
+    )
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+doctor_cache = LRUCache("doctors", maxsize=DOCTOR_CACHE_SIZE, ttl=DOCTOR_CACHE_TTL)
+# Счетчик сбросов кэша: запрос, прочитавший врача из базы до сброса, не кладет его в кэш после
+_invalidations = 0
+_invalidation_lock = threading.Lock()
+
+def _load_doctor(column: str, value):
+    with connection() as con:
+        row = con.execute(f"SELECT {DOCTOR_COLUMNS} FROM doctors WHERE {column} = ?", (value,)).fetchone()
+    return dict(row) if row is not None else None
+
+def invalidate_doctor(doctor_id: int):
+    """
+    Сбрасывает врача из кэша (смена пароля, деактивация). Вызывается после коммита:
+    до него параллельный запрос прочитал бы из базы старую строку и снова положил ее в кэш.
+    """
+    global _invalidations
+    with _invalidation_lock:
+        _invalidations += 1
+        doctor_cache.pop(doctor_id)
+
+def _cache_doctor(doctor_id: int, user: dict, generation: int):
+    # Строка прочитана до сброса кэша (generation устарел) - могла быть старой, не кэшируем
+    with _invalidation_lock:
+        if generation == _invalidations:
+            doctor_cache.set(doctor_id, user)
+
+def bump_token_version(con: sqlite3.Connection, doctor_id: int):
+    """
+    Отзывает все выданные врачу токены. Коммит выполняет вызывающий код,
+    после коммита он же вызывает invalidate_doctor.
+    """
+    con.execute("UPDATE doctors SET token_version = token_version + 1 WHERE id = ?", (doctor_id,))
+
 def get_current_doctor(token: str = Depends(oauth2_scheme)):
     """
     Зависимость для проверки JWT-токена и получения данных о текущем враче.
+    Врач берется из кэша по id из токена; соединение с базой открывается только при промахе.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учетные данные",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    jwt, JWTError = load_jwt()
     try:
         # Декодируем токен
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -51,16 +92,50 @@ def get_current_doctor(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    # Ищем пользователя в БД, чтобы убедиться, что он все еще существует и активен
-    con = sqlite3.connect(DB_NAME)
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute("SELECT * FROM doctors WHERE username = ?", (username,))
-    user = cur.fetchone()
-    con.close()
-    
-    if user is None:
+
+    doctor_id = payload.get("did")
+    if doctor_id is None:
+        # Токены, выданные до появления did/ver: ищем по имени, версию не проверяем
+        user = _load_doctor("username", username)
+        token_version = user["token_version"] if user is not None else None
+    else:
+        user = doctor_cache.get(doctor_id)
+        if user is None:
+            generation = _invalidations
+            user = _load_doctor("id", doctor_id)
+            if user is not None:
+                _cache_doctor(doctor_id, user, generation)
+        token_version = payload.get("ver")
+
+    # Врач должен существовать, быть активным, а токен - выданным после последней смены пароля
+    if user is None or user["is_active"] == 0 or user["token_version"] != token_version:
         raise credentials_exception
-        
-    return user
\ No newline at end of file
+
+    return user
+
+
+def set_doctor_active(con: sqlite3.Connection, username: str, active: bool) -> bool:
+    """Включает/отключает учетную запись врача; отключение отзывает его токены."""
+    row = con.execute("SELECT id FROM doctors WHERE username = ?", (username,)).fetchone()
+    if row is None:
+        return False
+    con.execute("UPDATE doctors SET is_active = ? WHERE id = ?", (1 if active else 0, row["id"]))
+    bump_token_version(con, row["id"])
+    con.commit()
+    invalidate_doctor(row["id"])
+    return True
+
+
+if __name__ == "__main__":
+    # Деактивация/активация врача из каталога backend:
+    #     python -m app.auth_utils deactivate <username>
+    import sys
+    from app.database import DB_NAME, create_connection
+
+    if len(sys.argv) != 3 or sys.argv[1] not in ("activate", "deactivate"):
+        sys.exit("Использование: python -m app.auth_utils activate|deactivate <username>")
+    action, target = sys.argv[1], sys.argv[2]
+    db = create_connection(DB_NAME)
+    found = set_doctor_active(db, target, action == "activate")
+    db.close()
+    print(f"Врач '{target}': {'готово' if found else 'не найден'}")
@@ -0,0 +1,111 @@
+# backend/app/blind_index.py
+"""
+Слепой индекс (blind index) для поиска пациентов по префиксу имени.
+
+ФИО хранится зашифрованным, поэтому искать по нему в SQL нельзя. Вместо этого для каждого слова имени
+(в нижнем регистре, "ё" -> "е") сохраняются HMAC-SHA256 всех его префиксов длиной от MIN_PREFIX
+до MAX_PREFIX символов в таблице patient_name_index (doctor_id, token_hash, patient_id).
+Поиск "ив" считает тот же HMAC и делает поиск по индексу, ничего не расшифровывая.
+Без ключа (производного от ENCRYPTION_KEY) хэши нельзя сопоставить с именами перебором словаря.
+
+Слова длиннее MAX_PREFIX индексируются по первым MAX_PREFIX символам.
+
+Пересчет индекса для всех пациентов (из каталога backend):
+    python -m app.blind_index
+"""
+import hashlib
+import hmac
+import logging
+import re
+import sqlite3
+
+from app.database import DB_NAME, create_connection
+from app.encryption_utils import decrypt_data, key_bytes
+
+# Ключ индекса производится от ENCRYPTION_KEY при первом вызове, а не при импорте
+_index_key = None
+MIN_PREFIX = 2
+MAX_PREFIX = 16
+
+_TOKEN_RE = re.compile(r"[^\W\d_]+")
+
+logger = logging.getLogger(__name__)
+
+
+def name_tokens(text: str) -> list:
+    """Нормализованные слова: нижний регистр, ё -> е, только буквы."""
+    return _TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+def _token_hash(token: str) -> bytes:
+    global _index_key
+    if _index_key is None:
+        _index_key = hmac.new(key_bytes(), b"patient-name-blind-index", hashlib.sha256).digest()
+    # 16 байт HMAC достаточно для поиска и вдвое уменьшает индекс
+    return hmac.new(_index_key, token.encode("utf-8"), hashlib.sha256).digest()[:16]
+
+
+def index_hashes(full_name: str) -> set:
+    """Хэши всех префиксов всех слов имени - то, что сохраняется в индексе."""
+    hashes = set()
+    for token in name_tokens(full_name):
+        token = token[:MAX_PREFIX]
+        for length in range(MIN_PREFIX, len(token) + 1):
+            hashes.add(_token_hash(token[:length]))
+    return hashes
+
+
+def query_hashes(query: str) -> set:
+    """Хэши слов поискового запроса; слова короче MIN_PREFIX не участвуют в поиске."""
+    return {_token_hash(token[:MAX_PREFIX]) for token in name_tokens(query) if len(token) >= MIN_PREFIX}
+
+
+def index_patient(con: sqlite3.Connection, doctor_id: int, patient_id: int, full_name: str):
+    """(Пере)индексирует имя пациента. Коммит выполняет вызывающий код."""
+    con.execute("DELETE FROM patient_name_index WHERE patient_id = ?", (patient_id,))
+    con.executemany(
+        "INSERT OR IGNORE INTO patient_name_index (doctor_id, token_hash, patient_id) VALUES (?, ?, ?)",
+        ((doctor_id, token_hash, patient_id) for token_hash in index_hashes(full_name)),
+    )
+
+
+def unindex_patient(con: sqlite3.Connection, patient_id: int):
+    con.execute("DELETE FROM patient_name_index WHERE patient_id = ?", (patient_id,))
+
+
+def rebuild_name_index(con: sqlite3.Connection, verbose: bool = False) -> int:
+    """
+    Пересчитывает индекс по всем пациентам (нужен ключ шифрования, чтобы расшифровать имена).
+    Имена, которые не расшифровываются текущим ключом, пропускаются с предупреждением:
+    такие пациенты не находятся поиском, но база и приложение остаются работоспособными.
+    Возвращает число проиндексированных пациентов.
+    """
+    from cryptography.fernet import InvalidToken
+
+    con.execute("DELETE FROM patient_name_index")
+    patients = con.execute("SELECT id, doctor_id, encrypted_full_name FROM patients").fetchall()
+    skipped = []
+    for patient_id, doctor_id, encrypted_name in patients:
+        try:
+            full_name = decrypt_data(encrypted_name)
+        except InvalidToken:
+            skipped.append(patient_id)
+            continue
+        index_patient(con, doctor_id, patient_id, full_name)
+    con.commit()
+    if skipped:
+        logger.warning(
+            "Имена %d пациентов не расшифровываются текущим ENCRYPTION_KEY и не попали в индекс поиска "
+            "(первые id: %s); после исправления ключа выполните python -m app.blind_index",
+            len(skipped), skipped[:10],
+        )
+    if verbose:
+        print(f"  Проиндексировано пациентов: {len(patients) - len(skipped)}, пропущено: {len(skipped)}")
+    return len(patients) - len(skipped)
+
+
+if __name__ == "__main__":
+    connection = create_connection(DB_NAME)
+    rebuild_name_index(connection, verbose=True)
+    connection.close()
+    print("Индекс имен пациентов пересчитан.")
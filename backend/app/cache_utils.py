@@ -0,0 +1,143 @@
+# backend/app/cache_utils.py
+"""
+Потокобезопасный LRU-кэш в памяти процесса со счетчиками попаданий/промахов.
+Все созданные кэши регистрируются по имени, их статистика доступна через cache_stats().
+
+Необязательно: ttl (секунды жизни записи) и on_evict - вызывается для каждого значения,
+покидающего кэш (вытеснение, истечение ttl, замена, pop, clear), например чтобы затереть буфер;
+weigher и maxweight - ограничение суммарного "веса" записей (например, байтов массивов) в дополнение к maxsize.
+Если on_evict изменяет значение на месте, читать его нужно через get(..., transform=...): преобразование
+выполняется под блокировкой кэша и не пересекается с затиранием в другом потоке.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+CACHES = {}
+
+
+class LRUCache:
+    def __init__(self, name: str, maxsize: int, ttl: float = None, on_evict=None, weigher=None, maxweight: int = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.weigher = weigher
+        self.maxweight = maxweight
+        self.weight = 0
+        # ключ -> (момент истечения или None, значение)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._next_purge = 0.0
+        CACHES[name] = self
+
+    def _discard(self, value, notify: bool = True):
+        if self.weigher is not None:
+            self.weight -= self.weigher(value)
+        if notify and self.on_evict is not None:
+            self.on_evict(value)
+
+    def _over_limit(self) -> bool:
+        if len(self._data) > self.maxsize:
+            return True
+        return self.maxweight is not None and self.weight > self.maxweight
+
+    def get(self, key, default=None, transform=None):
+        """transform (если задан) применяется к найденному значению под блокировкой кэша."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._discard(value)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value if transform is None else transform(value)
+
+    def set(self, key, value):
+        now = time.monotonic()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if expires_at is not None and now >= self._next_purge:
+                # Не чаще раза за ttl выбрасываем истекшие записи, к которым больше не обращались
+                self._purge_locked(now)
+                self._next_purge = now + self.ttl
+            old = self._data.pop(key, _MISSING)
+            if old is not _MISSING:
+                self._discard(old[1], notify=old[1] is not value)
+            if self.weigher is not None:
+                weight = self.weigher(value)
+                if self.maxweight is not None and weight > self.maxweight:
+                    # Запись тяжелее всего кэша не сохраняется и не вытесняет остальные
+                    return
+                self.weight += weight
+            self._data[key] = (expires_at, value)
+            while self._over_limit():
+                _, (_, evicted) = self._data.popitem(last=False)
+                self._discard(evicted)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            self._discard(entry[1])
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            for _, value in self._data.values():
+                self._discard(value)
+            self._data.clear()
+            self.weight = 0
+
+    def purge_expired(self) -> int:
+        """Удаляет все записи с истекшим ttl (get удаляет их и сам, но только при обращении)."""
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            return self._purge_locked(time.monotonic())
+
+    def _purge_locked(self, now: float) -> int:
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            self._discard(self._data.pop(key)[1])
+        self.expirations += len(expired)
+        return len(expired)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+        if self.weigher is not None:
+            stats.update(weight=self.weight, maxweight=self.maxweight)
+        return stats
+
+
+def cache_stats() -> dict:
+    """Статистика всех зарегистрированных кэшей."""
+    return {name: cache.stats() for name, cache in CACHES.items()}
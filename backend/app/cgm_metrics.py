@@ -0,0 +1,227 @@
+# backend/app/cgm_metrics.py
+"""
+Стандартные метрики НМГ (непрерывного мониторинга глюкозы) за произвольное окно:
+время в диапазонах, среднее, GMI, коэффициент вариации и профиль AGP (перцентили по времени суток).
+
+Все метрики собираются из суточных частичных сумм (DayPartial), которые складываются:
+число точек, сумма, сумма квадратов, число точек в каждом диапазоне и гистограмма значений
+по получасовым интервалам суток. Перцентили AGP берутся из сложенной гистограммы
+(шаг HISTOGRAM_STEP, точность - половина шага).
+
+Частичные суммы полных суток кэшируются. Версия суток - пара (count, sum) из суточного агрегата
+timeseries_rollups, который обновляется при каждом приеме данных: новые точки за день меняют ключ
+только этого дня. Неполные сутки на краях окна и сутки без агрегата считаются по сырым точкам без кэша.
+"""
+import logging
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from app.cache_utils import LRUCache
+from app.config import CGM_PARTIALS_CACHE_MAX_BYTES, CGM_PARTIALS_CACHE_SIZE
+from app.rollups import read_rollups
+from app.timeseries_store import read_series
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+GLUCOSE_RECORD_TYPES = ("glucose",)
+
+# Границы диапазонов, ммоль/л (международный консенсус по метрикам НМГ)
+VERY_LOW = 3.0
+LOW = 3.9
+HIGH = 10.0
+VERY_HIGH = 13.9
+RANGE_NAMES = ("very_low", "low", "target", "high", "very_high")
+
+# Гистограмма для AGP: интервалы суток и шаг значений
+AGP_SLOT_SECONDS = 30 * 60
+AGP_SLOTS = SECONDS_PER_DAY // AGP_SLOT_SECONDS
+HISTOGRAM_STEP = 0.1
+HISTOGRAM_BINS = 300          # 0..30 ммоль/л; значения вне диапазона попадают в крайние корзины
+AGP_PERCENTILES = (5, 25, 50, 75, 95)
+
+# GMI (%) = 3.31 + 0.02392 * среднее в мг/дл; в ммоль/л коэффициент умножается на 18.016
+GMI_INTERCEPT = 3.31
+GMI_SLOPE_MMOL = 0.02392 * 18.016
+
+
+class DayPartial(NamedTuple):
+    count: int
+    total: float
+    total_sq: float
+    ranges: np.ndarray                 # (5,) int64 - точки в каждом из RANGE_NAMES
+    histogram: Optional[np.ndarray]    # (AGP_SLOTS, HISTOGRAM_BINS) uint16; None для дня без точек
+
+
+EMPTY_DAY = DayPartial(0, 0.0, 0.0, np.zeros(len(RANGE_NAMES), dtype=np.int64), None)
+
+
+def _partial_bytes(partial: DayPartial) -> int:
+    return partial.ranges.nbytes + (partial.histogram.nbytes if partial.histogram is not None else 0)
+
+
+day_partials_cache = LRUCache(
+    "cgm_day_partials", maxsize=CGM_PARTIALS_CACHE_SIZE, weigher=_partial_bytes, maxweight=CGM_PARTIALS_CACHE_MAX_BYTES
+)
+
+
+def partials_from_points(timestamps: np.ndarray, values: np.ndarray) -> dict:
+    """Частичные суммы для каждых суток, в которых есть точки: {номер суток: DayPartial}."""
+    if not len(timestamps):
+        return {}
+    day_numbers = timestamps // SECONDS_PER_DAY
+    days, day_index = np.unique(day_numbers, return_inverse=True)
+    n = len(days)
+
+    counts = np.bincount(day_index, minlength=n)
+    totals = np.bincount(day_index, weights=values, minlength=n)
+    totals_sq = np.bincount(day_index, weights=values * values, minlength=n)
+    # Номер диапазона: < 3.0, 3.0..3.9, 3.9..10.0 (включительно), > 10.0, > 13.9
+    band = (values >= VERY_LOW).astype(np.int64) + (values >= LOW) + (values > HIGH) + (values > VERY_HIGH)
+    ranges = np.bincount(day_index * len(RANGE_NAMES) + band, minlength=n * len(RANGE_NAMES)).reshape(n, -1)
+
+    slot = (timestamps % SECONDS_PER_DAY) // AGP_SLOT_SECONDS
+    value_bin = np.clip((values / HISTOGRAM_STEP).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+    cell = (day_index * AGP_SLOTS + slot) * HISTOGRAM_BINS + value_bin
+    histograms = np.bincount(cell, minlength=n * AGP_SLOTS * HISTOGRAM_BINS)
+    histograms = histograms.reshape(n, AGP_SLOTS, HISTOGRAM_BINS).astype(np.uint16)
+
+    return {
+        day: DayPartial(int(count), float(total), float(total_sq), ranges[i], histograms[i].copy())
+        for i, (day, count, total, total_sq) in enumerate(zip(days.tolist(), counts.tolist(), totals.tolist(), totals_sq.tolist()))
+    }
+
+
+def _uncovered_runs(first: int, last: int, covered: list):
+    """Сплошные диапазоны дней из [first, last], не входящие в отсортированный covered: (1, 9), [3, 4, 7] -> [(1, 2), (5, 6), (8, 9)]"""
+    runs = []
+    start = first
+    for day in covered:
+        if day > start:
+            runs.append((start, day - 1))
+        start = day + 1
+    if start <= last:
+        runs.append((start, last))
+    return runs
+
+
+def collect_partials(con, patient_id: int, start_epoch: int, end_epoch: int) -> list:
+    """
+    Частичные суммы для окна [start_epoch, end_epoch]: полные сутки - из кэша (недостающие и сутки
+    без суточного агрегата читаются сплошными диапазонами дней), неполные сутки на краях - по сырым точкам.
+    """
+    first_full = -(-start_epoch // SECONDS_PER_DAY)
+    last_full = (end_epoch + 1) // SECONDS_PER_DAY - 1
+    partials = []
+
+    edges = []
+    if first_full > last_full:
+        edges.append((start_epoch, end_epoch))
+    else:
+        if start_epoch < first_full * SECONDS_PER_DAY:
+            edges.append((start_epoch, first_full * SECONDS_PER_DAY - 1))
+        if end_epoch >= (last_full + 1) * SECONDS_PER_DAY:
+            edges.append(((last_full + 1) * SECONDS_PER_DAY, end_epoch))
+    for edge_start, edge_end in edges:
+        partials.extend(partials_from_points(*read_series(con, patient_id, GLUCOSE_RECORD_TYPES, edge_start, edge_end)).values())
+
+    if first_full > last_full:
+        return partials
+
+    # Версии суток из суточных агрегатов
+    buckets, counts, sums, _, _ = read_rollups(
+        con, patient_id, GLUCOSE_RECORD_TYPES, "1d", first_full * SECONDS_PER_DAY, (last_full + 1) * SECONDS_PER_DAY - 1
+    )
+    versions = {}
+    cached_days = []
+    for day, count, total in zip((buckets // SECONDS_PER_DAY).tolist(), counts.tolist(), sums.tolist()):
+        partial = day_partials_cache.get((patient_id, day, count, total))
+        if partial is None:
+            versions[day] = (count, total)
+        else:
+            cached_days.append(day)
+            partials.append(partial)
+
+    # Все остальные сутки читаются по сырым точкам сплошными диапазонами - и с агрегатом, но без кэша,
+    # и без агрегата: данные, записанные в обход update_rollups, не должны выпадать из метрик
+    computed = {}
+    for run_start, run_end in _uncovered_runs(first_full, last_full, cached_days):
+        computed.update(partials_from_points(*read_series(
+            con, patient_id, GLUCOSE_RECORD_TYPES, run_start * SECONDS_PER_DAY, (run_end + 1) * SECONDS_PER_DAY - 1
+        )))
+    for day, version in versions.items():
+        partial = computed.pop(day, EMPTY_DAY)
+        day_partials_cache.set((patient_id, day, *version), partial)
+        partials.append(partial)
+    # Осталось только то, для чего нет суточного агрегата: без версии такие сутки не кэшируются
+    if computed:
+        logger.warning(
+            "Пациент %d: у %d суток с точками глюкозы нет суточных агрегатов; выполните python -m app.rollups --check",
+            patient_id, len(computed),
+        )
+        partials.extend(computed.values())
+    return partials
+
+
+def _histogram_percentiles(histogram: np.ndarray, percentiles) -> np.ndarray:
+    """Перцентили по каждой строке гистограммы (AGP_SLOTS, HISTOGRAM_BINS) с интерполяцией внутри корзины."""
+    cumulative = np.cumsum(histogram, axis=1)
+    totals = cumulative[:, -1]
+    result = np.full((len(percentiles), len(histogram)), np.nan)
+    has_data = totals > 0
+    for row, p in enumerate(percentiles):
+        target = totals * (p / 100)
+        # Первая корзина, в которой накопленное число точек достигает цели
+        index = np.minimum(np.argmax(cumulative >= np.maximum(target, 1e-9)[:, None], axis=1), HISTOGRAM_BINS - 1)
+        slots = np.arange(len(histogram))
+        before = np.where(index > 0, cumulative[slots, index - 1], 0)
+        in_bin = histogram[slots, index]
+        fraction = np.where(in_bin > 0, (target - before) / np.maximum(in_bin, 1), 0.5)
+        result[row] = np.where(has_data, (index + np.clip(fraction, 0.0, 1.0)) * HISTOGRAM_STEP, np.nan)
+    return result
+
+
+def compute_metrics(partials: list, percentiles=AGP_PERCENTILES) -> dict:
+    """Метрики НМГ из частичных сумм (в любом порядке)."""
+    count = sum(p.count for p in partials)
+    if not count:
+        return {"readings": 0, "days_with_data": 0}
+
+    total = sum(p.total for p in partials)
+    total_sq = sum(p.total_sq for p in partials)
+    ranges = np.sum([p.ranges for p in partials], axis=0)
+    histogram = np.zeros((AGP_SLOTS, HISTOGRAM_BINS), dtype=np.int64)
+    for partial in partials:
+        if partial.histogram is not None:
+            histogram += partial.histogram
+
+    mean = total / count
+    sd = float(np.sqrt(max(total_sq / count - mean * mean, 0.0)))
+    share = ranges / count * 100
+    bands = _histogram_percentiles(histogram, percentiles)
+
+    return {
+        "readings": count,
+        "days_with_data": sum(1 for p in partials if p.count),
+        "mean": round(mean, 2),
+        "sd": round(sd, 2),
+        "cv": round(sd / mean * 100, 1) if mean else None,
+        "gmi": round(GMI_INTERCEPT + GMI_SLOPE_MMOL * mean, 1),
+        "time_in_range": round(float(share[2]), 1),
+        "time_below_range": round(float(share[0] + share[1]), 1),
+        "time_above_range": round(float(share[3] + share[4]), 1),
+        "ranges": {name: round(float(value), 1) for name, value in zip(RANGE_NAMES, share)},
+        "agp": {
+            "slot_minutes": AGP_SLOT_SECONDS // 60,
+            "time": [f"{slot * AGP_SLOT_SECONDS // 3600:02d}:{slot * AGP_SLOT_SECONDS % 3600 // 60:02d}" for slot in range(AGP_SLOTS)],
+            **{
+                f"p{p:g}": [None if np.isnan(v) else round(v, 2) for v in row.tolist()]
+                for p, row in zip(percentiles, bands)
+            },
+        },
+    }
+
+
+def window_metrics(con, patient_id: int, start_epoch: int, end_epoch: int) -> dict:
+    return compute_metrics(collect_partials(con, patient_id, start_epoch, end_epoch))
@@ -0,0 +1,112 @@
+# backend/app/config.py
+"""
+Все настройки приложения из переменных окружения (и файла .env).
+.env читается один раз - здесь; модули импортируют уже разобранные значения.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _list(name: str, default: str = "") -> list:
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+# --- БЕЗОПАСНОСТЬ ---
+# os.getenv() вернет None, если переменная не найдена; проверка - в auth_utils и encryption_utils
+SECRET_KEY = os.getenv("SECRET_KEY")
+ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
+# Стоимость bcrypt; хэши с меньшей стоимостью пересчитываются при входе
+BCRYPT_ROUNDS = _int("BCRYPT_ROUNDS", 12)
+# Потоки для bcrypt: checkpw отпускает GIL, поэтому проверки идут параллельно на разных ядрах
+PASSWORD_WORKERS = _int("PASSWORD_WORKERS", min(4, os.cpu_count() or 1))
+PASSWORD_MAX_PENDING = _int("PASSWORD_MAX_PENDING", PASSWORD_WORKERS * 8)
+PASSWORD_QUEUE_TIMEOUT = _float("PASSWORD_QUEUE_TIMEOUT", 5)
+# Кэш врачей процесса: смена пароля и деактивация видны в других воркерах не позже TTL
+DOCTOR_CACHE_SIZE = _int("DOCTOR_CACHE_SIZE", 1024)
+DOCTOR_CACHE_TTL = _float("DOCTOR_CACHE_TTL", 60)
+# Кэш расшифрованных персональных данных
+DECRYPT_CACHE_SIZE = _int("DECRYPT_CACHE_SIZE", 20000)
+DECRYPT_CACHE_TTL = _float("DECRYPT_CACHE_TTL", 300)
+
+# --- БАЗА ДАННЫХ ---
+DB_NAME = os.getenv("DB_NAME", "medical_app.db")
+# Максимальное число соединений в пуле одного процесса (воркера uvicorn)
+DB_POOL_SIZE = _int("DB_POOL_SIZE", 8)
+# Сколько секунд ждать свободное соединение, если пул исчерпан
+DB_POOL_TIMEOUT = _float("DB_POOL_TIMEOUT", 10)
+
+# --- ВРЕМЕННЫЕ РЯДЫ И ПРИЕМ ДАННЫХ ---
+# Типы записей, которые пишутся компактными чанками (например, "glucose"); по умолчанию выключено
+CHUNKED_RECORD_TYPES = frozenset(_list("CHUNKED_RECORD_TYPES"))
+# Отложенная запись включена по умолчанию; "0" возвращает синхронную запись в запросе
+INGEST_WRITE_BEHIND = os.getenv("INGEST_WRITE_BEHIND", "1") != "0"
+# Максимум точек, ожидающих записи; сверх этого запросы отклоняются с 429
+INGEST_QUEUE_MAX_POINTS = _int("INGEST_QUEUE_MAX_POINTS", 200000)
+# Писатель сбрасывает очередь не реже этого интервала (секунды) ...
+INGEST_FLUSH_INTERVAL = _float("INGEST_FLUSH_INTERVAL", 0.5)
+# ... или сразу, как только накопилось столько точек
+INGEST_FLUSH_POINTS = _int("INGEST_FLUSH_POINTS", 20000)
+# Каталог спула на диске (пусто - спул выключен)
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "")
+# Сверять агрегаты 15м/1ч/1д с данными при старте и пересчитывать расходящиеся ряды
+ROLLUP_CHECK_ON_STARTUP = os.getenv("ROLLUP_CHECK_ON_STARTUP", "1") != "0"
+
+# --- ОБНОВЛЕНИЯ В РЕАЛЬНОМ ВРЕМЕНИ (SSE) ---
+# Интервал комментария-пульса в простаивающем потоке (секунды): держит соединение через прокси
+LIVE_HEARTBEAT_SECONDS = _float("LIVE_HEARTBEAT_SECONDS", 15)
+# Сообщений в очереди одного подписчика; переполнение - подписчик отключается как медленный
+LIVE_QUEUE_SIZE = _int("LIVE_QUEUE_SIZE", 64)
+# Максимум одновременных подписок процесса
+LIVE_MAX_SUBSCRIBERS = _int("LIVE_MAX_SUBSCRIBERS", 1000)
+
+# --- РАЗБОР ТЕКСТОВЫХ РЕКОМЕНДАЦИЙ ---
+# Малая русская модель: быстрая и работает на CPU
+SPACY_MODEL = os.getenv("SPACY_MODEL", "ru_core_news_sm")
+# Компоненты, которые не загружаются вовсе (tok2vec, morphologizer, attribute_ruler и lemmatizer нужны для лемм)
+SPACY_EXCLUDE = _list("SPACY_EXCLUDE", "parser,ner,senter")
+# Размер пачки nlp.pipe и предел числа процессов для пакетного разбора
+NLP_BATCH_SIZE = _int("NLP_BATCH_SIZE", 64)
+NLP_MAX_PROCESSES = _int("NLP_MAX_PROCESSES", 1)
+PARSE_CACHE_SIZE = _int("PARSE_CACHE_SIZE", 10000)
+# Путь к файлу дискового уровня кэша разбора (пусто - только память)
+PARSE_CACHE_DB = os.getenv("PARSE_CACHE_DB", "")
+PARSE_CACHE_DISK_MAX_ROWS = _int("PARSE_CACHE_DISK_MAX_ROWS", 200000)
+
+# --- МЕТРИКИ НМГ ---
+# Кэш суточных частичных сумм (гистограмма суток ~29 КБ)
+CGM_PARTIALS_CACHE_SIZE = _int("CGM_PARTIALS_CACHE_SIZE", 20000)
+CGM_PARTIALS_CACHE_MAX_BYTES = _int("CGM_PARTIALS_CACHE_MAX_BYTES", 128 * 1024 * 1024)
+
+# --- СИМУЛЯЦИЯ ---
+# Процессы для больших перечислений вариантов (1 - все варианты считаются векторно в процессе запроса)
+SWEEP_WORKERS = _int("SWEEP_WORKERS", min(4, os.cpu_count() or 1))
+# Перечисления с большим числом вариантов делятся между процессами
+SWEEP_POOL_THRESHOLD = _int("SWEEP_POOL_THRESHOLD", 256)
+SWEEP_MAX_VARIANTS = _int("SWEEP_MAX_VARIANTS", 5000)
+# Бюджет одной пачки: точки вывода x варианты (матрица глюкозы float64, 2 млн - 16 МБ)
+# и шаги интегрирования x варианты (время счета); при мелком шаге допустимо меньше вариантов
+SWEEP_MAX_OUTPUT_VALUES = _int("SWEEP_MAX_OUTPUT_VALUES", 2000000)
+SWEEP_MAX_STEP_VALUES = _int("SWEEP_MAX_STEP_VALUES", 10000000)
+# Кэш расшифрованных параметров и сценариев (TTL - как у кэша персональных данных)
+SIMULATION_INPUTS_CACHE_SIZE = _int("SIMULATION_INPUTS_CACHE_SIZE", 4096)
+# Кэш траекторий в памяти: не больше стольких записей и байтов массивов
+SIMULATION_CACHE_SIZE = _int("SIMULATION_CACHE_SIZE", 4096)
+SIMULATION_CACHE_MAX_BYTES = _int("SIMULATION_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+# Каталог дискового уровня кэша траекторий (пусто - только память)
+SIMULATION_CACHE_DIR = os.getenv("SIMULATION_CACHE_DIR", "")
+SIMULATION_CACHE_DISK_MAX_FILES = _int("SIMULATION_CACHE_DISK_MAX_FILES", 20000)
+
+# --- ЗАПУСК ---
+# Прогревать тяжелые подсистемы (шифрование, JWT, bcrypt, spaCy) в фоне после старта
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") != "0"
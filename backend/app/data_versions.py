@@ -0,0 +1,34 @@
+# backend/app/data_versions.py
+"""
+Счетчики версий данных ("водяные знаки") по сущностям, например версия временных рядов пациента.
+Писатели увеличивают версию в той же транзакции, что и сами данные;
+кэши используют версию как часть ключа, поэтому устаревшие записи просто перестают находиться.
+Из версий же строятся ETag ответов (app.etags).
+"""
+import sqlite3
+
+# Сущности, для которых ведутся версии (entity_id - id пациента)
+TIMESERIES = "timeseries"
+MEDICAL_RECORDS = "medical_records"
+PARAMETERS = "parameters"
+SCENARIOS = "scenarios"
+# Список пациентов врача (entity_id - id врача): создание и удаление пациентов
+PATIENTS = "patients"
+
+
+def bump_versions(con: sqlite3.Connection, entity: str, entity_ids):
+    """Увеличивает версию для каждого id. Коммит выполняет вызывающий код."""
+    con.executemany(
+        """
+        INSERT INTO data_versions (entity, entity_id, version) VALUES (?, ?, 1)
+        ON CONFLICT (entity, entity_id) DO UPDATE SET version = version + 1
+        """,
+        ((entity, entity_id) for entity_id in set(entity_ids)),
+    )
+
+
+def get_version(con: sqlite3.Connection, entity: str, entity_id: int) -> int:
+    row = con.execute(
+        "SELECT version FROM data_versions WHERE entity = ? AND entity_id = ?", (entity, entity_id)
+    ).fetchone()
+    return row[0] if row else 0
@@ -0,0 +1,131 @@
+# backend/app/database.py
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from app.config import DB_NAME, DB_POOL_SIZE as POOL_SIZE, DB_POOL_TIMEOUT as POOL_TIMEOUT
+
+# --- КОНФИГУРАЦИЯ БАЗЫ ДАННЫХ ---
+
+# Размер кэша подготовленных выражений sqlite3 на одно соединение.
+# Запросы в роутерах - константные строки, поэтому повторно используются уже скомпилированные выражения.
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",      # читатели не блокируют писателя
+    "PRAGMA synchronous = NORMAL",    # в режиме WAL безопасно и без fsync на каждый коммит
+    "PRAGMA cache_size = -65536",     # 64 МБ кэша страниц на соединение
+    "PRAGMA mmap_size = 268435456",   # 256 МБ файла читаются через mmap
+    "PRAGMA busy_timeout = 5000",     # ждем блокировку писателя вместо мгновенной ошибки
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+def create_connection(db_name: str = DB_NAME) -> sqlite3.Connection:
+    """Открывает новое соединение с настроенными PRAGMA."""
+    con = sqlite3.connect(db_name, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    con.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        con.execute(pragma)
+    return con
+
+
+class ConnectionPool:
+    """
+    Пул соединений SQLite для одного процесса.
+    Соединения создаются лениво (не больше size) и переиспользуются между запросами.
+    """
+
+    def __init__(self, db_name: str = DB_NAME, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                return create_connection(self.db_name)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError("Нет свободных соединений с базой данных")
+
+    def release(self, con: sqlite3.Connection):
+        try:
+            # Незавершенная транзакция (например, после исключения в обработчике) откатывается
+            if con.in_transaction:
+                con.rollback()
+        except sqlite3.Error:
+            # Соединение испорчено - выбрасываем его, пул создаст новое
+            with self._lock:
+                self._created -= 1
+            con.close()
+            return
+        self._idle.put(con)
+
+    def close(self):
+        while True:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            con.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Возвращает пул текущего процесса (после fork воркера создается новый)."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool()
+                _pool_pid = pid
+    return _pool
+
+
+@contextmanager
+def connection():
+    """Контекстный менеджер: берет соединение из пула и возвращает его обратно."""
+    pool = get_pool()
+    con = pool.acquire()
+    try:
+        yield con
+    finally:
+        pool.release(con)
+
+
+def get_db():
+    """
+    Зависимость FastAPI: соединение из пула на время запроса.
+    (get_current_doctor берет соединение сам и только при промахе кэша врачей.)
+    """
+    with connection() as con:
+        yield con
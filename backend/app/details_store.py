@@ -0,0 +1,141 @@
+# backend/app/details_store.py
+"""
+Дедуплицированное хранение примечаний (details) к точкам временных рядов.
+
+Устройства присылают одни и те же примечания тысячи раз ("Быстрый инсулин на еду" на каждом болюсе),
+поэтому каждое уникальное примечание шифруется и хранится один раз в timeseries_details,
+а timeseries_data ссылается на него через details_id.
+
+Адресом служит HMAC-SHA256 от текста на ключе, производном от ENCRYPTION_KEY:
+по digest нельзя подобрать текст без ключа, а одинаковые тексты получают один и тот же адрес.
+Шифрование остается прежним (encrypt_data / decrypt_data).
+
+Перенос старых строк с encrypted_details в общую таблицу (из каталога backend):
+    python -m app.details_store
+"""
+import hashlib
+import hmac
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from app.cache_utils import LRUCache
+from app.database import DB_NAME, create_connection
+from app.encryption_utils import decrypt_data, encrypt_data, key_bytes
+
+# Отдельный ключ для адресов, чтобы не использовать ключ шифрования напрямую (считается при первом вызове)
+_digest_key = None
+# С какого числа уникальных примечаний в пачке шифровать в пуле потоков
+PARALLEL_THRESHOLD = 64
+ENCRYPT_WORKERS = 4
+# Размер пачки при переносе старых строк
+MIGRATE_BATCH_SIZE = 5000
+
+# digest -> шифротекст: повторные примечания в следующих пачках не шифруются заново
+ciphertext_cache = LRUCache("details_ciphertexts", maxsize=4096)
+
+_executor = ThreadPoolExecutor(max_workers=ENCRYPT_WORKERS, thread_name_prefix="details-encrypt")
+
+
+def details_digest(text: str) -> str:
+    global _digest_key
+    if _digest_key is None:
+        _digest_key = hmac.new(key_bytes(), b"timeseries-details-digest", hashlib.sha256).digest()
+    return hmac.new(_digest_key, text.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def encrypt_details(texts) -> dict:
+    """
+    Шифрует каждое уникальное примечание один раз.
+    Возвращает {текст: (digest, шифротекст)} - пара и кладется в строки для write_points.
+    """
+    refs = {}
+    to_encrypt = []
+    for text in set(texts):
+        digest = details_digest(text)
+        encrypted = ciphertext_cache.get(digest)
+        if encrypted is None:
+            to_encrypt.append((text, digest))
+        else:
+            refs[text] = (digest, encrypted)
+
+    if len(to_encrypt) >= PARALLEL_THRESHOLD:
+        encrypted_list = list(_executor.map(encrypt_data, (text for text, _ in to_encrypt)))
+    else:
+        encrypted_list = [encrypt_data(text) for text, _ in to_encrypt]
+
+    for (text, digest), encrypted in zip(to_encrypt, encrypted_list):
+        ciphertext_cache.set(digest, encrypted)
+        refs[text] = (digest, encrypted)
+    return refs
+
+
+def store_details(con: sqlite3.Connection, refs) -> dict:
+    """
+    Сохраняет пары (digest, шифротекст), которых еще нет в базе, и возвращает {digest: details_id}.
+    Коммит выполняет вызывающий код.
+    """
+    refs = dict(refs)
+    if not refs:
+        return {}
+    cur = con.cursor()
+    cur.executemany(
+        "INSERT INTO timeseries_details (digest, encrypted_details) VALUES (?, ?) ON CONFLICT (digest) DO NOTHING",
+        refs.items(),
+    )
+    digests = list(refs)
+    ids = {}
+    # Ограничение SQLite на число параметров запроса
+    for offset in range(0, len(digests), 500):
+        part = digests[offset:offset + 500]
+        cur.execute(
+            f"SELECT digest, id FROM timeseries_details WHERE digest IN ({', '.join('?' * len(part))})", part
+        )
+        ids.update(cur.fetchall())
+    return ids
+
+
+def read_details(con: sqlite3.Connection, details_ids) -> dict:
+    """Расшифровывает примечания по id: {details_id: текст}."""
+    details_ids = list(set(details_ids))
+    result = {}
+    for offset in range(0, len(details_ids), 500):
+        part = details_ids[offset:offset + 500]
+        rows = con.execute(
+            f"SELECT id, encrypted_details FROM timeseries_details WHERE id IN ({', '.join('?' * len(part))})", part
+        )
+        result.update((row[0], decrypt_data(row[1])) for row in rows)
+    return result
+
+
+def migrate_legacy_details(con: sqlite3.Connection, verbose: bool = False) -> int:
+    """Переносит encrypted_details старых строк в timeseries_details, по пачке за транзакцию."""
+    moved = 0
+    while True:
+        rows = con.execute(
+            """
+            SELECT id, encrypted_details FROM timeseries_data
+            WHERE encrypted_details IS NOT NULL LIMIT ?
+            """,
+            (MIGRATE_BATCH_SIZE,),
+        ).fetchall()
+        if not rows:
+            return moved
+        texts = {row[0]: decrypt_data(row[1]) for row in rows}
+        refs = encrypt_details(texts.values())
+        ids = store_details(con, refs.values())
+        con.executemany(
+            "UPDATE timeseries_data SET details_id = ?, encrypted_details = NULL WHERE id = ?",
+            ((ids[refs[text][0]], row_id) for row_id, text in texts.items()),
+        )
+        con.commit()
+        moved += len(rows)
+        if verbose:
+            print(f"  Перенесено примечаний: {moved}")
+
+
+if __name__ == "__main__":
+    connection = create_connection(DB_NAME)
+    total = migrate_legacy_details(connection, verbose=True)
+    connection.execute("VACUUM")
+    connection.close()
+    print(f"Перенесено примечаний: {total}")
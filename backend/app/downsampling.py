@@ -0,0 +1,51 @@
+# backend/app/downsampling.py
+"""
+Прореживание рядов для графиков алгоритмом Largest-Triangle-Three-Buckets (LTTB).
+В отличие от усреднения, LTTB сохраняет визуально значимые точки - пики и гипогликемии.
+
+Средние следующих корзин и площади треугольников считаются векторно в NumPy;
+последовательным остается только проход по корзинам (зависимость от выбранной точки предыдущей корзины).
+"""
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Возвращает отсортированные индексы точек, которые нужно оставить (не больше max_points).
+    x должен быть отсортирован по возрастанию.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Границы корзин: первая и последняя точки остаются всегда, остальные делятся на max_points - 2 корзины
+    edges = (np.arange(max_points - 1) * ((n - 2) / (max_points - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    starts, ends = edges[:-1], edges[1:]
+
+    # Средняя точка каждой "следующей" корзины (для последней корзины - последняя точка ряда)
+    cum_x = np.r_[0.0, np.cumsum(x)]
+    cum_y = np.r_[0.0, np.cumsum(y)]
+    sizes = ends - starts
+    avg_x = np.append((cum_x[ends] - cum_x[starts]) / sizes, x[-1])[1:]
+    avg_y = np.append((cum_y[ends] - cum_y[starts]) / sizes, y[-1])[1:]
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        bx, by = x[start:end], y[start:end]
+        ax, ay = x[a], y[a]
+        areas = np.abs((ax - avg_x[bucket]) * (by - ay) - (ax - bx) * (avg_y[bucket] - ay))
+        a = start + int(areas.argmax())
+        selected[bucket + 1] = a
+    return selected
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int):
+    """Прореживает ряд (x, y) до max_points точек. Возвращает новые массивы x и y."""
+    indices = lttb_indices(x, y, max_points)
+    return np.asarray(x)[indices], np.asarray(y)[indices]
@@ -1,30 +1,83 @@
 # backend/app/encryption_utils.py
-from cryptography.fernet import Fernet
-from dotenv import load_dotenv
-import os
+import threading
 
-load_dotenv()
+from app.cache_utils import LRUCache
+from app.config import DECRYPT_CACHE_SIZE, DECRYPT_CACHE_TTL, ENCRYPTION_KEY
 
-# Загружаем ключ шифрования из переменных окружения
-ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
+_fernet = None
+_fernet_lock = threading.Lock()
 
-if ENCRYPTION_KEY is None:
-    raise ValueError("Необходимо установить ENCRYPTION_KEY в .env файле")
+def key_bytes() -> bytes:
+    """
+    Ключ шифрования в байтах (Fernet работает с байтами).
+    Проверяется при первом использовании: без ключа приложение импортируется, но /api/ready
+    покажет подсистему encryption как failed.
+    """
+    if ENCRYPTION_KEY is None:
+        raise ValueError("Необходимо установить ENCRYPTION_KEY в .env файле")
+    return ENCRYPTION_KEY.encode('utf-8')
 
-# Преобразуем ключ в байты, так как Fernet работает с байтами
-key_bytes = ENCRYPTION_KEY.encode('utf-8')
-fernet = Fernet(key_bytes)
+def get_fernet():
+    """Объект Fernet; cryptography импортируется при первом шифровании, а не при старте приложения."""
+    global _fernet
+    if _fernet is None:
+        with _fernet_lock:
+            if _fernet is None:
+                from cryptography.fernet import Fernet
+                _fernet = Fernet(key_bytes())
+    return _fernet
 
 def encrypt_data(data: str) -> str:
     """Шифрует строку и возвращает зашифрованную строку."""
     if not isinstance(data, str):
         raise TypeError("Шифруемые данные должны быть строкой")
-    encrypted_data = fernet.encrypt(data.encode('utf-8'))
+    encrypted_data = get_fernet().encrypt(data.encode('utf-8'))
     return encrypted_data.decode('utf-8')
 
 def decrypt_data(encrypted_data: str) -> str:
     """Дешифрует строку и возвращает исходную строку."""
     if not isinstance(encrypted_data, str):
         raise TypeError("Дешифруемые данные должны быть строкой")
-    decrypted_data = fernet.decrypt(encrypted_data.encode('utf-8'))
-    return decrypted_data.decode('utf-8')
\ No newline at end of file
+    decrypted_data = get_fernet().decrypt(encrypted_data.encode('utf-8'))
+    return decrypted_data.decode('utf-8')
+
+# --- КЭШ РАСШИФРОВАННЫХ ДАННЫХ ---
+# Списки пациентов перезагружаются часто, а Fernet-расшифровка (HMAC + AES) каждой строки дорогая.
+# Ключ - шифротекст (случайный IV делает его уникальным для каждой записи), значение - bytearray
+# с открытым текстом, который затирается нулями при вытеснении, истечении TTL, замене и инвалидации.
+# Буфер из кэша не выходит наружу: строка декодируется под блокировкой кэша, поэтому затирание
+# в другом потоке не может попасть между чтением буфера и декодированием.
+
+def _zero(buffer: bytearray):
+    buffer[:] = bytes(len(buffer))
+
+
+def _decode(buffer: bytearray) -> str:
+    return buffer.decode('utf-8')
+
+
+decryption_cache = LRUCache("decrypted_pii", maxsize=DECRYPT_CACHE_SIZE, ttl=DECRYPT_CACHE_TTL, on_evict=_zero)
+
+
+def decrypt_cached(encrypted_data: str) -> str:
+    """Как decrypt_data, но повторные расшифровки одного шифротекста берутся из кэша."""
+    text = decryption_cache.get(encrypted_data, transform=_decode)
+    if text is None:
+        plaintext = get_fernet().decrypt(encrypted_data.encode('utf-8'))
+        # Строка получается до публикации буфера: параллельный промах по тому же шифротексту
+        # заменит (и затрет) наш буфер в кэше, но не результат
+        text = plaintext.decode('utf-8')
+        decryption_cache.set(encrypted_data, bytearray(plaintext))
+    return text
+
+
+def prime_decryption_cache(encrypted_data: str, data: str):
+    """Кладет в кэш только что зашифрованное значение, чтобы первое чтение не расшифровывало его."""
+    decryption_cache.set(encrypted_data, bytearray(data.encode('utf-8')))
+
+
+def invalidate_decrypted(*encrypted_values):
+    """Удаляет (и затирает) значения из кэша, например при удалении пациента."""
+    for encrypted_data in encrypted_values:
+        if encrypted_data:
+            decryption_cache.pop(encrypted_data)
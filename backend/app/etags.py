@@ -0,0 +1,41 @@
+# backend/app/etags.py
+"""
+Условные GET-запросы (ETag / If-None-Match) для данных пациентов.
+
+ETag строится из версий данных (app.data_versions) и параметров запроса, поэтому проверяется
+без чтения самих данных и без расшифровки: при совпадении ответ - 304 без тела.
+Версии растут в той же транзакции, что и запись данных, так что ETag меняется вместе с содержимым.
+
+Cache-Control: private, no-cache - клиент (HTTP-кэш Chromium в Electron) хранит ответ у себя
+и перед каждым использованием переспрашивает сервер с If-None-Match.
+"""
+import hashlib
+
+from fastapi import Request, Response, status
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из частей (версии, параметры запроса): строки, числа, None."""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match сравнивается слабо: W/"x" совпадает с "x"
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,362 @@
+# backend/app/ingest_pipeline.py
+"""
+Отложенная запись (write-behind) данных устройств.
+
+Обработчик POST /api/ingest/ только шифрует детали и кладет точки в ограниченную очередь процесса.
+Единственный фоновый поток-писатель объединяет точки из многих запросов и записывает их
+одной транзакцией раз в INGEST_FLUSH_INTERVAL секунд или при накоплении INGEST_FLUSH_POINTS точек.
+Если очередь заполнена, запрос получает 429 (IngestQueueFull).
+
+Если задан INGEST_SPOOL_DIR, каждая принятая пачка сначала дописывается в файл-спул на диске.
+Сегмент спула удаляется только после коммита его точек, а при старте необработанные сегменты
+дозаписываются в базу - принятые (202) данные переживают падение процесса.
+
+У каждого процесса (воркера uvicorn) в INGEST_SPOOL_DIR свой подкаталог <время>-<pid> и файл
+блокировки <время>-<pid>.lock, который процесс держит заблокированным все время работы
+(блокировку снимает ОС при завершении процесса). При старте дозаписываются только подкаталоги,
+блокировку которых удалось захватить, то есть оставшиеся от завершившихся процессов:
+живые сегменты соседних воркеров не трогаются.
+
+Запись повторяется только при временных ошибках базы (блокировка, ввод-вывод, нет места) и не
+больше MAX_RETRIES раз; прочие ошибки и исчерпанные повторы переводят запись на отдельные пачки.
+"""
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from app.config import (
+    INGEST_FLUSH_INTERVAL as FLUSH_INTERVAL,
+    INGEST_FLUSH_POINTS as FLUSH_POINTS,
+    INGEST_QUEUE_MAX_POINTS as QUEUE_MAX_POINTS,
+    INGEST_SPOOL_DIR as SPOOL_DIR,
+    INGEST_WRITE_BEHIND as WRITE_BEHIND_ENABLED,
+)
+from app.data_versions import TIMESERIES, bump_versions
+from app.database import DB_NAME, create_connection
+from app.live_updates import publish_rows
+from app.rollups import refresh_days, update_rollups
+from app.timeseries_store import write_points
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повтором, если запись в базу не удалась, и число повторов
+RETRY_DELAY = 1.0
+MAX_RETRIES = 30
+# Временные ошибки SQLite (основной код): SQLITE_BUSY, SQLITE_LOCKED, SQLITE_IOERR, SQLITE_FULL, SQLITE_CANTOPEN
+TRANSIENT_ERROR_CODES = frozenset({5, 6, 10, 13, 14})
+
+SPOOL_SUFFIX = ".ndjson"
+SPOOL_LOCK_SUFFIX = ".lock"
+
+
+class IngestQueueFull(Exception):
+    """Очередь записи заполнена, клиенту нужно повторить позже."""
+
+
+def store_rows(con: sqlite3.Connection, rows: list):
+    """
+    Записывает точки, обновляет агрегаты и версии данных пациентов. Коммит выполняет вызывающий код.
+    rows - кортежи (patient_id, timestamp, timestamp_epoch, record_type, value, details),
+    где details - None или пара (digest, шифротекст) из details_store.encrypt_details.
+    """
+    # Высокочастотные ряды (CHUNKED_RECORD_TYPES) уходят в компактные чанки, остальное - в timeseries_data
+    rollup_rows, stale_days = write_points(con, rows)
+    # Агрегаты 15м/1ч/1д обновляются в той же транзакции: прибавляются только новые точки,
+    # сутки, где повтор изменил значение в чанке, пересчитываются
+    update_rollups(con, rollup_rows)
+    refresh_days(con, stale_days)
+    # Новая версия данных пациента инвалидирует закэшированные рекомендации
+    bump_versions(con, TIMESERIES, (row[0] for row in rows))
+
+
+def _is_transient(error: sqlite3.OperationalError) -> bool:
+    """Ошибка, после которой запись имеет смысл повторить (а не ошибка схемы или данных)."""
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in TRANSIENT_ERROR_CODES
+    message = str(error).lower()
+    return "locked" in message or "disk" in message or "unable to open" in message
+
+
+def _try_lock(lock_file) -> bool:
+    """Неблокирующая исключительная блокировка открытого файла; ОС снимает ее при завершении процесса."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _to_spool_row(row: tuple) -> list:
+    patient_id, timestamp, epoch, record_type, value, details = row
+    if isinstance(timestamp, datetime):
+        # Так же, как адаптер sqlite3 сохраняет datetime в колонку timestamp
+        timestamp = timestamp.isoformat(" ")
+    return [patient_id, timestamp, epoch, record_type, value, details]
+
+
+class IngestPipeline:
+    def __init__(self, db_name: str = DB_NAME, max_points: int = QUEUE_MAX_POINTS,
+                 flush_interval: float = FLUSH_INTERVAL, flush_points: int = FLUSH_POINTS,
+                 spool_dir: str = SPOOL_DIR):
+        self.db_name = db_name
+        self.max_points = max_points
+        self.flush_interval = flush_interval
+        self.flush_points = flush_points
+        self.spool_dir = spool_dir or None
+
+        self._batches = []
+        self._pending_points = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._con = None
+
+        self._spool_file = None
+        self._spool_segment = None
+        self._spool_sequence = 0
+        # Свой подкаталог спула и удерживаемый файл блокировки
+        self._spool_owner_dir = None
+        self._spool_lock = None
+
+        # Счетчики для мониторинга и нагрузочного теста
+        self.flushes = 0
+        self.written_points = 0
+        self.rejected_points = 0
+        self.dropped_points = 0
+
+    # --- Публичный интерфейс ---
+
+    def start(self):
+        """Дозаписывает остатки спула и запускает фоновый поток-писатель."""
+        if self._thread is not None:
+            return
+        self._con = create_connection(self.db_name)
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._claim_spool_dir()
+            self._replay_spool()
+            self._open_spool_segment()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Останавливает писателя, предварительно записав все принятые точки."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._thread = None
+        if self._spool_file is not None:
+            self._spool_file.close()
+            self._spool_file = None
+            if not self._pending_points:
+                os.remove(self._spool_segment)
+                self._release_spool_dir()
+        self._con.close()
+        self._con = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def submit(self, rows: list):
+        """Ставит точки в очередь записи. Бросает IngestQueueFull, если места нет."""
+        if not rows:
+            return
+        with self._cond:
+            if self._stopping:
+                raise IngestQueueFull("Прием данных останавливается")
+            if self._pending_points + len(rows) > self.max_points:
+                self.rejected_points += len(rows)
+                raise IngestQueueFull("Очередь записи заполнена")
+            if self._spool_file is not None:
+                self._spool_file.write(json.dumps([_to_spool_row(row) for row in rows], ensure_ascii=False) + "\n")
+                self._spool_file.flush()
+                os.fsync(self._spool_file.fileno())
+            self._batches.append(rows)
+            self._pending_points += len(rows)
+            if self._pending_points >= self.flush_points:
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        return {
+            "pending_points": self._pending_points,
+            "max_points": self.max_points,
+            "flushes": self.flushes,
+            "written_points": self.written_points,
+            "rejected_points": self.rejected_points,
+            "dropped_points": self.dropped_points,
+        }
+
+    # --- Фоновый писатель ---
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and self._pending_points < self.flush_points:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batches, segment = self._batches, self._spool_segment
+                stopping = self._stopping
+                self._batches = []
+                if batches and self._spool_file is not None and not stopping:
+                    # Новые пачки пишутся в новый сегмент, старый удаляется после коммита
+                    self._open_spool_segment()
+
+            if batches:
+                self._flush(batches)
+                with self._cond:
+                    self._pending_points -= sum(len(batch) for batch in batches)
+                if segment is not None and segment != self._spool_segment:
+                    os.remove(segment)
+            if stopping:
+                return
+
+    def _flush(self, batches: list):
+        rows = [row for batch in batches for row in batch]
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                store_rows(self._con, rows)
+                self._con.commit()
+                self.flushes += 1
+                self.written_points += len(rows)
+                publish_rows(rows)
+                return
+            except sqlite3.OperationalError as e:
+                self._con.rollback()
+                if not _is_transient(e) or attempt == MAX_RETRIES:
+                    logger.exception("Не удалось записать %d точек", len(rows))
+                    break
+                # База временно недоступна (блокировка, диск) - точки остаются в памяти и спуле
+                logger.warning("Не удалось записать %d точек (%s), повтор через %.1f с", len(rows), e, RETRY_DELAY)
+                time.sleep(RETRY_DELAY)
+            except Exception:
+                self._con.rollback()
+                logger.exception("Не удалось записать %d точек", len(rows))
+                break
+
+        # Ошибка в данных или схеме: пишем пачки по отдельности, чтобы одна плохая не блокировала остальные
+        for batch in batches:
+            try:
+                store_rows(self._con, batch)
+                self._con.commit()
+                self.flushes += 1
+                self.written_points += len(batch)
+                publish_rows(batch)
+            except Exception:
+                self._con.rollback()
+                self.dropped_points += len(batch)
+                logger.exception("Пачка из %d точек отброшена", len(batch))
+
+    # --- Спул на диске ---
+
+    def _claim_spool_dir(self):
+        """Создает подкаталог спула этого процесса; блокировка берется до создания каталога."""
+        name = f"{time.time_ns():020d}-{os.getpid()}"
+        self._spool_lock = open(os.path.join(self.spool_dir, name + SPOOL_LOCK_SUFFIX), "a")
+        if not _try_lock(self._spool_lock):
+            raise RuntimeError(f"Не удалось заблокировать спул {name}")
+        self._spool_owner_dir = os.path.join(self.spool_dir, name)
+        os.makedirs(self._spool_owner_dir)
+
+    def _release_spool_dir(self):
+        """Удаляет пустой подкаталог спула и файл блокировки (сначала каталог - его наличие и есть признак спула)."""
+        try:
+            os.rmdir(self._spool_owner_dir)
+        except OSError:
+            # Остались недописанные сегменты - каталог дозапишет следующий запуск
+            return
+        lock_path = self._spool_owner_dir + SPOOL_LOCK_SUFFIX
+        self._spool_lock.close()
+        os.remove(lock_path)
+        self._spool_owner_dir = self._spool_lock = None
+
+    def _open_spool_segment(self):
+        if self._spool_file is not None:
+            self._spool_file.close()
+        self._spool_sequence += 1
+        name = f"{time.time_ns():020d}-{self._spool_sequence:06d}{SPOOL_SUFFIX}"
+        self._spool_segment = os.path.join(self._spool_owner_dir, name)
+        self._spool_file = open(self._spool_segment, "a", encoding="utf-8")
+
+    def _replay_spool(self):
+        """Дозаписывает сегменты завершившихся процессов: подкаталоги, чью блокировку удалось захватить."""
+        for name in sorted(os.listdir(self.spool_dir)):
+            path = os.path.join(self.spool_dir, name)
+            if name.endswith(SPOOL_SUFFIX):
+                # Сегмент прежнего формата (без подкаталога процесса): забираем переименованием -
+                # из нескольких стартующих воркеров его получит ровно один
+                claimed = os.path.join(self._spool_owner_dir, name)
+                try:
+                    os.rename(path, claimed)
+                except FileNotFoundError:
+                    continue
+                self._replay_segment(claimed)
+                continue
+            if path == self._spool_owner_dir or not os.path.isdir(path):
+                continue
+            lock_path = path + SPOOL_LOCK_SUFFIX
+            with open(lock_path, "a") as lock_file:
+                if not _try_lock(lock_file):
+                    continue  # процесс-владелец работает
+                if not os.path.isdir(path):
+                    # Каталог только что дозаписал и удалил другой процесс
+                    lock_file.close()
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(lock_path)
+                    continue
+                for segment in sorted(os.listdir(path)):
+                    if segment.endswith(SPOOL_SUFFIX):
+                        self._replay_segment(os.path.join(path, segment))
+                os.rmdir(path)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(lock_path)
+
+    def _replay_segment(self, path: str):
+        batches = []
+        with open(path, encoding="utf-8") as spool_file:
+            for line in spool_file:
+                try:
+                    batches.append([tuple(row) for row in json.loads(line)])
+                except ValueError:
+                    # Недописанная последняя строка при падении - эта пачка не была подтверждена клиенту
+                    logger.warning("Пропущена поврежденная строка спула %s", path)
+        if batches:
+            logger.info("Дозапись спула %s: %d пачек", path, len(batches))
+            self._flush(batches)
+        os.remove(path)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> IngestPipeline:
+    """Писатель текущего процесса (запускается в lifespan приложения)."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = IngestPipeline()
+    return _pipeline
@@ -0,0 +1,197 @@
+# backend/app/live_updates.py
+"""
+Новые точки пациента в реальном времени (Server-Sent Events).
+
+Приемник данных после коммита вызывает publish_rows: точки группируются по пациентам, и для каждого
+пациента с подписчиками сообщение SSE собирается один раз и раздается всем его подписчикам.
+У подписчика своя ограниченная очередь asyncio (LIVE_QUEUE_SIZE сообщений); публикация из потоков
+(писатель, пул обработчиков) передается в цикл событий через call_soon_threadsafe.
+Если клиент не успевает читать и очередь переполняется, подписка закрывается событием "dropped" -
+клиент перезагружает окно графика и подписывается заново.
+
+Между поступлениями данных поток только ждет очередь; раз в LIVE_HEARTBEAT_SECONDS уходит
+комментарий-пульс, по которому обнаруживаются оборванные соединения.
+
+Брокер живет в процессе: при нескольких воркерах uvicorn подписчик видит точки,
+принятые его воркером (приемник с отложенной записью тоже работает в своем процессе).
+
+Формат событий:
+    event: points   data: {"glucose": [{"x": "<дата>", "y": ...}], "insulin": [...], "carbs": [...]}
+    event: dropped  data: {}
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Optional
+
+from app.config import LIVE_HEARTBEAT_SECONDS, LIVE_MAX_SUBSCRIBERS, LIVE_QUEUE_SIZE
+from app.time_utils import from_epoch
+from app.timeseries_store import SERIES_RECORD_TYPES
+
+logger = logging.getLogger(__name__)
+
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+# Через сколько миллисекунд EventSource-совместимый клиент переподключается после обрыва
+RECONNECT_MILLISECONDS = 5000
+HEARTBEAT_MESSAGE = ": ping\n\n"
+DROPPED_MESSAGE = "event: dropped\ndata: {}\n\n"
+
+SERIES_BY_RECORD_TYPE = {
+    record_type: series for series, record_types in SERIES_RECORD_TYPES.items() for record_type in record_types
+}
+
+
+class TooManySubscribers(Exception):
+    """Достигнут предел одновременных подписок процесса."""
+
+
+class Subscription:
+    def __init__(self, patient_id: int, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.patient_id = patient_id
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+    def _offer(self, message: str):
+        # Выполняется в цикле событий подписчика
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Медленный клиент: недоставленное выбрасывается, вместо него - признак отключения
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class LiveBroker:
+    def __init__(self, queue_size: int = LIVE_QUEUE_SIZE, max_subscribers: int = LIVE_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = defaultdict(set)
+        self._count = 0
+        self._lock = threading.Lock()
+
+        # Счетчики для мониторинга
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, patient_id: int) -> Subscription:
+        """Подписка на точки пациента; вызывается из цикла событий, в котором будут читаться сообщения."""
+        subscription = Subscription(patient_id, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers("Слишком много открытых подписок")
+            self._subscribers[patient_id].add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.patient_id)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.patient_id]
+            self._count -= 1
+        if subscription.dropped:
+            self.dropped += 1
+
+    @property
+    def full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    def watched(self, patient_ids) -> set:
+        """Пациенты из patient_ids, у которых есть подписчики."""
+        with self._lock:
+            return {patient_id for patient_id in patient_ids if patient_id in self._subscribers}
+
+    def publish(self, patient_id: int, message: str):
+        with self._lock:
+            subscribers = list(self._subscribers.get(patient_id, ()))
+        self.published += 1
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, message)
+                self.delivered += 1
+            except RuntimeError:
+                # Цикл событий подписчика уже закрыт (остановка сервера)
+                self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "patients": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+broker = LiveBroker()
+
+
+def points_message(rows: list) -> Optional[str]:
+    """Сообщение SSE с точками одного пациента в формате графика (как в comprehensive_data)."""
+    series = defaultdict(list)
+    for _, _, epoch, record_type, value, *_ in sorted(rows, key=lambda row: row[2]):
+        name = SERIES_BY_RECORD_TYPE.get(record_type)
+        if name is not None:
+            series[name].append({"x": from_epoch(epoch).isoformat(sep=" "), "y": value})
+    if not series:
+        return None
+    return f"event: points\ndata: {json.dumps(series, ensure_ascii=False)}\n\n"
+
+
+def publish_rows(rows: list):
+    """
+    Раздает записанные точки подписчикам. Вызывается после коммита;
+    rows - кортежи (patient_id, timestamp, timestamp_epoch, record_type, value, ...), как у store_rows.
+    Не бросает исключений: данные уже записаны, ошибка раздачи не должна влиять на прием.
+    """
+    try:
+        watched = broker.watched({row[0] for row in rows})
+        if not watched:
+            return
+        by_patient = defaultdict(list)
+        for row in rows:
+            if row[0] in watched:
+                by_patient[row[0]].append(row)
+        for patient_id, patient_rows in by_patient.items():
+            message = points_message(patient_rows)
+            if message is not None:
+                broker.publish(patient_id, message)
+    except Exception:
+        logger.exception("Не удалось разослать %d новых точек подписчикам", len(rows))
+
+
+async def event_stream(patient_id: int, heartbeat: float = LIVE_HEARTBEAT_SECONDS):
+    """
+    Тело ответа SSE. Подписка оформляется при начале отдачи и снимается при отключении клиента,
+    отмене или отбросе - так она не остается висеть, если ответ так и не начал отправляться.
+    """
+    try:
+        subscription = broker.subscribe(patient_id)
+    except TooManySubscribers:
+        yield DROPPED_MESSAGE
+        return
+    try:
+        yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT_MESSAGE
+                continue
+            if message is None:
+                yield DROPPED_MESSAGE
+                return
+            yield message
+    finally:
+        broker.unsubscribe(subscription)
@@ -1,8 +1,58 @@
 # backend/app/main.py
-from fastapi import FastAPI
+import sys
+import time
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse
 from app.routers import auth, patients, data_ingest, recommendations # <--- Убедитесь, что 'recommendations' импортирован
+from app.database import connection
+from app.migrations import apply_migrations
+from app.rollups import repair_rollups
+from app.ingest_pipeline import WRITE_BEHIND_ENABLED, get_pipeline
+from app.recommendation_parser import get_nlp
+from app.auth_utils import load_jwt, get_current_doctor
+from app.encryption_utils import get_fernet
+from app.cache_utils import cache_stats
+from app.config import ROLLUP_CHECK_ON_STARTUP, WARMUP_ON_STARTUP
+from app import readiness
 
-app = FastAPI(title="Medical App API")
+# Подсистемы для /api/ready. Тяжелые инициализируются лениво или в фоне после старта
+readiness.register("database")
+readiness.register("ingest_writer")
+readiness.register("encryption", get_fernet)
+readiness.register("jwt", load_jwt)
+# Без модели spaCy недоступна только интерпретация рекомендаций
+readiness.register("nlp", get_nlp, required=False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Доводим схему базы до актуальной версии перед приемом запросов
+    started = time.perf_counter()
+    with connection() as con:
+        apply_migrations(con)
+        # Данные могли быть записаны в обход приема (seed_database.py, ручная загрузка) - без агрегатов
+        # графики в разрешениях 15m/1h/1d и метрики НМГ были бы пустыми
+        if ROLLUP_CHECK_ON_STARTUP:
+            repair_rollups(con)
+    readiness.mark_ready("database", time.perf_counter() - started)
+    # Фоновый писатель входящих данных; при остановке дописывает очередь в базу
+    if WRITE_BEHIND_ENABLED:
+        get_pipeline().start()
+    readiness.mark_ready("ingest_writer")
+    # Шифрование, JWT и модель spaCy прогреваются в фоне: приложение отвечает сразу,
+    # а запрос, пришедший раньше прогрева, инициализирует нужную подсистему сам
+    if WARMUP_ON_STARTUP:
+        readiness.warm_up()
+    yield
+    get_pipeline().stop()
+    # Модуль перебора (и его пул процессов) загружается только первым запросом /simulate/sweep
+    sweeps = sys.modules.get("app.sweeps")
+    if sweeps is not None:
+        sweeps.shutdown_pool()
+
+
+app = FastAPI(title="Medical App API", lifespan=lifespan)
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
 app.include_router(patients.router, prefix="/api/patients", tags=["Patients"])
@@ -13,4 +63,15 @@ app.include_router(recommendations.router, prefix="/api/recommendations", tags=[
 
 @app.get("/")
 def read_root():
-    return {"message": "Auth Backend is running"}
\ No newline at end of file
+    return {"message": "Auth Backend is running"}
+
+@app.get("/api/ready", tags=["Service"])
+def read_readiness():
+    """Готовность подсистем процесса: 200, когда готовы все обязательные, иначе 503."""
+    report = readiness.status()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/api/cache/stats", tags=["Service"])
+def read_cache_stats(current_doctor: dict = Depends(get_current_doctor)):
+    """Размер и счетчики попаданий/промахов кэшей этого процесса."""
+    return cache_stats()
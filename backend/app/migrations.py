@@ -0,0 +1,255 @@
+# backend/app/migrations.py
+"""
+Версионные миграции схемы базы данных.
+Текущая версия схемы хранится в PRAGMA user_version; применяются только миграции с большим номером.
+
+Запуск вручную (из каталога backend):
+    python -m app.migrations
+"""
+import sqlite3
+
+from app.database import DB_NAME, create_connection
+
+# Размер пачки при заполнении новых колонок в больших таблицах
+BACKFILL_BATCH_SIZE = 50000
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    """Декоратор регистрации миграции."""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def get_schema_version(con: sqlite3.Connection) -> int:
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _column_exists(con: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in con.execute(f"PRAGMA table_info({table})"))
+
+
+def backfill_in_batches(con: sqlite3.Connection, table: str, update_sql: str, batch_size: int = BACKFILL_BATCH_SIZE):
+    """
+    Выполняет UPDATE по диапазонам rowid с коммитом после каждой пачки,
+    чтобы не держать блокировку записи на всю таблицу.
+    update_sql должен содержать условие "id > ? AND id <= ?" и быть идемпотентным.
+    """
+    max_id = con.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+    for low in range(0, max_id, batch_size):
+        con.execute(update_sql, (low, low + batch_size))
+        con.commit()
+
+
+@migration(1, "Исходная схема (doctors, patients, medical_records, timeseries_data, симулятор)")
+def _initial_schema(con: sqlite3.Connection):
+    con.executescript("""
+    CREATE TABLE IF NOT EXISTS doctors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        hashed_password TEXT NOT NULL,
+        full_name TEXT,
+        specialization TEXT,
+        is_active BOOLEAN DEFAULT TRUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS patients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        doctor_id INTEGER,
+        encrypted_full_name TEXT NOT NULL,
+        encrypted_contact_info TEXT,
+        date_of_birth DATE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (doctor_id) REFERENCES doctors (id)
+    );
+
+    CREATE TABLE IF NOT EXISTS medical_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER,
+        record_date TIMESTAMP NOT NULL,
+        encrypted_record_data TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (patient_id) REFERENCES patients (id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS timeseries_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER,
+        timestamp TIMESTAMP NOT NULL,
+        record_type TEXT NOT NULL,
+        value REAL NOT NULL,
+        encrypted_details TEXT,
+        FOREIGN KEY (patient_id) REFERENCES patients (id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS simulator_scenarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER,
+        encrypted_scenario TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (patient_id) REFERENCES patients (id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS patients_parameters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER,
+        encrypted_parameters TEXT NOT NULL,
+        FOREIGN KEY (patient_id) REFERENCES patients (id) ON DELETE CASCADE
+    );
+    """)
+
+
+@migration(2, "timeseries_data: целочисленные epoch-секунды и покрывающий индекс")
+def _timeseries_epoch_and_index(con: sqlite3.Connection):
+    if not _column_exists(con, "timeseries_data", "timestamp_epoch"):
+        con.execute("ALTER TABLE timeseries_data ADD COLUMN timestamp_epoch INTEGER")
+
+    # Старые писатели (например, seed_database.py) заполняют только TEXT timestamp -
+    # триггер досчитывает epoch для таких строк.
+    con.execute("""
+    CREATE TRIGGER IF NOT EXISTS timeseries_data_fill_epoch
+    AFTER INSERT ON timeseries_data
+    WHEN NEW.timestamp_epoch IS NULL
+    BEGIN
+        UPDATE timeseries_data
+        SET timestamp_epoch = CAST(strftime('%s', NEW.timestamp) AS INTEGER)
+        WHERE id = NEW.id;
+    END
+    """)
+
+    # Перенос существующих TEXT-отметок пачками
+    backfill_in_batches(
+        con,
+        "timeseries_data",
+        """
+        UPDATE timeseries_data
+        SET timestamp_epoch = CAST(strftime('%s', timestamp) AS INTEGER)
+        WHERE id > ? AND id <= ? AND timestamp_epoch IS NULL
+        """,
+    )
+
+    # Все выборки фильтруют по пациенту, типу записи и диапазону времени;
+    # value включен в индекс, чтобы чтение графиков не обращалось к самой таблице.
+    con.execute("""
+    CREATE INDEX IF NOT EXISTS idx_timeseries_patient_type_epoch
+    ON timeseries_data (patient_id, record_type, timestamp_epoch, value)
+    """)
+    con.execute("ANALYZE timeseries_data")
+
+
+@migration(3, "timeseries_chunks: компактное хранение высокочастотных рядов (пациент x тип x сутки)")
+def _timeseries_chunks(con: sqlite3.Connection):
+    # Обычная rowid-таблица: BLOB суток (~2 КБ для CGM) помещается в одну страницу,
+    # а в WITHOUT ROWID он ушел бы в overflow-страницы.
+    con.executescript("""
+    CREATE TABLE IF NOT EXISTS timeseries_chunks (
+        id INTEGER PRIMARY KEY,
+        patient_id INTEGER NOT NULL,
+        record_type TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        point_count INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        FOREIGN KEY (patient_id) REFERENCES patients (id) ON DELETE CASCADE
+    );
+
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_timeseries_chunks_patient_type_day
+    ON timeseries_chunks (patient_id, record_type, day);
+    """)
+
+
+@migration(4, "timeseries_rollups: агрегаты 15 мин / 1 ч / 1 сутки")
+def _timeseries_rollups(con: sqlite3.Connection):
+    con.executescript("""
+    CREATE TABLE IF NOT EXISTS timeseries_rollups (
+        patient_id INTEGER NOT NULL,
+        record_type TEXT NOT NULL,
+        resolution INTEGER NOT NULL,
+        bucket_epoch INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        sum REAL NOT NULL,
+        min REAL NOT NULL,
+        max REAL NOT NULL,
+        PRIMARY KEY (patient_id, record_type, resolution, bucket_epoch)
+    ) WITHOUT ROWID;
+    """)
+    # Заполняем агрегаты по уже накопленным данным
+    from app.rollups import rebuild_rollups
+    rebuild_rollups(con)
+
+
+@migration(5, "data_versions: счетчики версий данных для инвалидации кэшей")
+def _data_versions(con: sqlite3.Connection):
+    con.executescript("""
+    CREATE TABLE IF NOT EXISTS data_versions (
+        entity TEXT NOT NULL,
+        entity_id INTEGER NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (entity, entity_id)
+    ) WITHOUT ROWID;
+    """)
+
+
+@migration(6, "timeseries_details: дедуплицированные примечания к точкам")
+def _timeseries_details(con: sqlite3.Connection):
+    con.executescript("""
+    CREATE TABLE IF NOT EXISTS timeseries_details (
+        id INTEGER PRIMARY KEY,
+        digest TEXT NOT NULL UNIQUE,
+        encrypted_details TEXT NOT NULL
+    );
+    """)
+    if not _column_exists(con, "timeseries_data", "details_id"):
+        con.execute("ALTER TABLE timeseries_data ADD COLUMN details_id INTEGER REFERENCES timeseries_details (id)")
+
+
+@migration(7, "patient_name_index: слепой индекс для поиска пациентов по имени")
+def _patient_name_index(con: sqlite3.Connection):
+    con.executescript("""
+    CREATE TABLE IF NOT EXISTS patient_name_index (
+        doctor_id INTEGER NOT NULL,
+        token_hash BLOB NOT NULL,
+        patient_id INTEGER NOT NULL,
+        PRIMARY KEY (doctor_id, token_hash, patient_id)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_patient_name_index_patient ON patient_name_index (patient_id);
+
+    -- Постраничный вывод списка врача: WHERE doctor_id = ? AND id > ? ORDER BY id
+    CREATE INDEX IF NOT EXISTS idx_patients_doctor_id ON patients (doctor_id, id);
+    """)
+    # Индексируем уже существующих пациентов
+    from app.blind_index import rebuild_name_index
+    rebuild_name_index(con)
+
+
+@migration(8, "doctors: версия токенов для отзыва JWT")
+def _doctor_token_version(con: sqlite3.Connection):
+    # token_version попадает в JWT (claim "ver"); увеличение версии отзывает все выданные токены врача
+    if not _column_exists(con, "doctors", "token_version"):
+        con.execute("ALTER TABLE doctors ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+
+
+def apply_migrations(con: sqlite3.Connection, verbose: bool = False) -> int:
+    """Применяет все недостающие миграции и возвращает итоговую версию схемы."""
+    current = get_schema_version(con)
+    for version, description, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version <= current:
+            continue
+        if verbose:
+            print(f"Применяется миграция {version}: {description}")
+        func(con)
+        con.execute(f"PRAGMA user_version = {version}")
+        con.commit()
+        current = version
+    return current
+
+
+if __name__ == "__main__":
+    connection = create_connection(DB_NAME)
+    version = apply_migrations(connection, verbose=True)
+    connection.close()
+    print(f"Схема базы данных '{DB_NAME}' в актуальном состоянии (версия {version}).")
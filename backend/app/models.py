@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date, datetime
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 class PatientBase(BaseModel):
     full_name: str
@@ -27,6 +27,10 @@ class UserCredentials(BaseModel):
     username: str
     password: str
 
+class PasswordChange(BaseModel):
+    old_password: str
+    new_password: str = Field(min_length=8)
+
 class PatientFullData(PatientDisplay):
         records: List[MedicalRecordDisplay] = []
 
@@ -47,4 +51,34 @@ class PatientParameters(BaseModel):
 class SimulatorScenario(BaseModel):
     scenario_id: int
     patient_id: int
-    scenario_data: dict
\ No newline at end of file
+    scenario_data: dict
+
+class SimulationRequest(BaseModel):
+    scenario_id: Optional[int] = None  # По умолчанию - первый сценарий пациента
+    method: Literal["rk4", "adaptive"] = "rk4"
+    step: float = Field(1.0, gt=0, le=60)  # Шаг RK4 / начальный шаг адаптивного метода, минуты
+    output_step: float = Field(5.0, gt=0)  # Шаг выдачи траектории, минуты
+    rtol: float = Field(1e-4, gt=0, lt=1)
+    atol: float = Field(1e-6, gt=0)
+    # Замена отдельных параметров модели и сценария (например, {"ksen": 0.8}, {"M": 60});
+    # конечность и положительность объемов и скоростей проверяет simulation.input_problems (400).
+    # FiniteFloat здесь не годится: ответ 422 повторяет NaN из запроса и не сериализуется в JSON
+    parameters: Dict[str, float] = {}
+    scenario: Dict[str, float] = {}
+
+
+class SweepAxis(BaseModel):
+    name: str  # Имя параметра модели или сценария
+    values: Optional[List[float]] = None  # Абсолютные значения
+    scale: Optional[List[float]] = None   # Множители к базовому значению (0.9 = -10 %)
+    shift: Optional[List[float]] = None   # Прибавки к базовому значению (например, минуты для ti_1)
+
+class SimulationVariant(BaseModel):
+    parameters: Dict[str, float] = {}
+    scenario: Dict[str, float] = {}
+
+class SweepRequest(SimulationRequest):
+    # Варианты = variants (по умолчанию один базовый) x все комбинации осей grid
+    grid: List[SweepAxis] = []
+    variants: List[SimulationVariant] = []
+    percentiles: List[float] = [5, 25, 50, 75, 95]
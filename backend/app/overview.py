@@ -0,0 +1,184 @@
+# backend/app/overview.py
+"""
+Сводка по всем пациентам врача для стартовой страницы: последнее значение глюкозы,
+время в целевом диапазоне и число эпизодов гипогликемии за последние сутки, флаг "требует внимания".
+
+Строки timeseries_data обрабатываются одним запросом на уровне множеств:
+  * последнее значение - поиск по индексу (patient_id, record_type, timestamp_epoch, value) с конца;
+  * статистика за сутки - GROUP BY по patient_id над диапазоном того же индекса;
+  * эпизод гипогликемии - точка ниже LOW, перед которой (LAG по времени) была точка не ниже LOW или ничего.
+Глюкоза, перенесенная в timeseries_chunks, дочитывается одним дополнительным запросом на всех пациентов
+и только если такие чанки есть; для этих пациентов статистика суток пересчитывается по объединенным точкам.
+
+Флаг "требует внимания" - быстрая сортировка списка, а не вывод анализа: он считается по последним суткам
+(эпизод ниже LOW = 3.9, время в диапазоне ниже TIME_IN_RANGE_TARGET, нет данных), тогда как рекомендации
+(/{id}/recommendations, analysis_utils) смотрят 30 дней с другими порогами. Поэтому флаг и рекомендации
+могут расходиться; вывести флаг из кэша анализа значило бы читать 30 дней каждого пациента.
+"""
+import sqlite3
+from collections import defaultdict
+
+import numpy as np
+
+from app.cgm_metrics import HIGH, LOW
+from app.timeseries_store import SECONDS_PER_DAY, decode_chunk
+
+OVERVIEW_WINDOW_SECONDS = 86400
+# Ниже этой доли времени в диапазоне (%) пациент отмечается как требующий внимания
+TIME_IN_RANGE_TARGET = 70.0
+
+OVERVIEW_QUERY = """
+WITH recent AS (
+    SELECT t.patient_id, t.value,
+           LAG(t.value) OVER (PARTITION BY t.patient_id ORDER BY t.timestamp_epoch) AS previous
+    FROM patients p
+    JOIN timeseries_data t
+      ON t.patient_id = p.id AND t.record_type = 'glucose' AND t.timestamp_epoch > :since AND t.timestamp_epoch <= :now
+    WHERE p.doctor_id = :doctor_id
+),
+day_stats AS (
+    SELECT patient_id,
+           COUNT(*) AS readings,
+           SUM(value >= :low AND value <= :high) AS in_range,
+           SUM(value < :low AND (previous IS NULL OR previous >= :low)) AS hypo_events
+    FROM recent
+    GROUP BY patient_id
+)
+SELECT p.id, p.encrypted_full_name, p.date_of_birth,
+       (SELECT t.timestamp_epoch FROM timeseries_data t
+        WHERE t.patient_id = p.id AND t.record_type = 'glucose' AND t.timestamp_epoch <= :now
+        ORDER BY t.timestamp_epoch DESC LIMIT 1) AS last_epoch,
+       (SELECT t.value FROM timeseries_data t
+        WHERE t.patient_id = p.id AND t.record_type = 'glucose' AND t.timestamp_epoch <= :now
+        ORDER BY t.timestamp_epoch DESC LIMIT 1) AS last_value,
+       COALESCE(d.readings, 0) AS readings,
+       COALESCE(d.in_range, 0) AS in_range,
+       COALESCE(d.hypo_events, 0) AS hypo_events
+FROM patients p
+LEFT JOIN day_stats d ON d.patient_id = p.id
+WHERE p.doctor_id = :doctor_id
+ORDER BY p.id
+"""
+
+# Чанки глюкозы пациентов врача: все сутки окна и последние сутки с данными (для последнего значения)
+CHUNKS_QUERY = """
+WITH latest AS (
+    SELECT p.id AS patient_id,
+           (SELECT MAX(day) FROM timeseries_chunks
+            WHERE patient_id = p.id AND record_type = 'glucose' AND day <= :now_day) AS day
+    FROM patients p
+    WHERE p.doctor_id = :doctor_id
+)
+SELECT c.patient_id, c.day, c.data
+FROM latest l
+JOIN timeseries_chunks c
+  ON c.patient_id = l.patient_id AND c.record_type = 'glucose' AND c.day BETWEEN MIN(l.day, :since_day) AND :now_day
+WHERE l.day IS NOT NULL
+"""
+
+
+def _day_stats(values: np.ndarray) -> tuple:
+    """(число точек, точек в диапазоне, эпизодов гипогликемии) для отсортированного по времени ряда."""
+    below = values < LOW
+    starts = below & ~np.concatenate(([False], below[:-1]))
+    return len(values), int(np.count_nonzero((values >= LOW) & (values <= HIGH))), int(np.count_nonzero(starts))
+
+
+def _merge_chunks(con: sqlite3.Connection, params: dict, rows: dict):
+    """Дополняет строки сводки точками из чанков глюкозы (если они есть)."""
+    chunk_points = defaultdict(list)
+    for patient_id, day, blob in con.execute(CHUNKS_QUERY, params):
+        chunk_points[patient_id].append(decode_chunk(day, blob))
+    if not chunk_points:
+        return
+
+    in_window = {}
+    for patient_id, parts in chunk_points.items():
+        ts = np.concatenate([part[0] for part in parts])
+        values = np.concatenate([part[1] for part in parts])
+        mask = ts <= params["now"]
+        ts, values = ts[mask], values[mask]
+        row = rows[patient_id]
+        if len(ts):
+            last = int(ts.argmax())
+            if row["last_epoch"] is None or ts[last] > row["last_epoch"]:
+                row["last_epoch"], row["last_value"] = int(ts[last]), float(values[last])
+        window = ts > params["since"]
+        if window.any():
+            in_window[patient_id] = (ts[window], values[window])
+    if not in_window:
+        return
+
+    # Эпизоды на стыке строк и чанков не складываются - сутки этих пациентов пересчитываются целиком
+    ids = list(in_window)
+    row_points = defaultdict(lambda: ([], []))
+    cursor = con.execute(
+        f"""
+        SELECT patient_id, timestamp_epoch, value FROM timeseries_data
+        WHERE patient_id IN ({", ".join("?" * len(ids))}) AND record_type = 'glucose'
+          AND timestamp_epoch > ? AND timestamp_epoch <= ?
+        """,
+        (*ids, params["since"], params["now"]),
+    )
+    for patient_id, timestamp, value in cursor:
+        row_points[patient_id][0].append(timestamp)
+        row_points[patient_id][1].append(value)
+
+    for patient_id, (ts, values) in in_window.items():
+        extra_ts, extra_values = row_points.get(patient_id, ([], []))
+        # Как в read_series: точки чанков и строк сливаются по времени без удаления совпадающих отметок
+        ts = np.concatenate((ts, np.asarray(extra_ts, dtype=np.int64)))
+        values = np.concatenate((values, np.asarray(extra_values, dtype=np.float64)))
+        merged = values[np.argsort(ts, kind="stable")]
+        rows[patient_id]["readings"], rows[patient_id]["in_range"], rows[patient_id]["hypo_events"] = _day_stats(merged)
+
+
+def attention_reasons(readings: int, time_in_range: float, hypo_events: int) -> list:
+    """Причины флага "требует внимания" по статистике последних суток (не по правилам анализа)."""
+    reasons = []
+    if hypo_events:
+        reasons.append("hypoglycemia")
+    if readings and time_in_range < TIME_IN_RANGE_TARGET:
+        reasons.append("low_time_in_range")
+    if not readings:
+        reasons.append("no_recent_data")
+    return reasons
+
+
+def practice_overview(con: sqlite3.Connection, doctor_id: int, now_epoch: int) -> list:
+    """
+    Сводка по пациентам врача за сутки до now_epoch в порядке id.
+    Имя пациента возвращается зашифрованным (encrypted_full_name) - расшифровывает вызывающий.
+    """
+    since = now_epoch - OVERVIEW_WINDOW_SECONDS
+    params = {
+        "doctor_id": doctor_id,
+        "now": now_epoch,
+        "since": since,
+        "low": LOW,
+        "high": HIGH,
+        "now_day": now_epoch // SECONDS_PER_DAY,
+        "since_day": since // SECONDS_PER_DAY,
+    }
+    rows = {row["id"]: dict(row) for row in con.execute(OVERVIEW_QUERY, params)}
+    if rows:
+        _merge_chunks(con, params, rows)
+
+    overview = []
+    for row in rows.values():
+        readings = row["readings"]
+        time_in_range = round(row["in_range"] / readings * 100, 1) if readings else None
+        reasons = attention_reasons(readings, time_in_range, row["hypo_events"])
+        overview.append({
+            "id": row["id"],
+            "encrypted_full_name": row["encrypted_full_name"],
+            "date_of_birth": row["date_of_birth"],
+            "last_glucose_epoch": row["last_epoch"],
+            "last_glucose": row["last_value"],
+            "readings_24h": readings,
+            "time_in_range_24h": time_in_range,
+            "hypo_events_24h": row["hypo_events"],
+            "needs_attention": bool(reasons),
+            "attention_reasons": reasons,
+        })
+    return overview
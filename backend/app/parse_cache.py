@@ -0,0 +1,122 @@
+# backend/app/parse_cache.py
+"""
+Кэш результатов разбора текстовых рекомендаций.
+
+Ключ - нормализованный текст (нижний регистр, пробелы схлопнуты) и версия парсера:
+версия вычисляется из шаблонов Matcher и модели, поэтому любое изменение шаблонов
+делает старые записи недостижимыми (а из дискового уровня они удаляются при открытии).
+
+Уровни:
+  * память - LRUCache (PARSE_CACHE_SIZE записей);
+  * диск (необязательно, PARSE_CACHE_DB) - SQLite-файл, переживает перезапуск.
+    Хранится SHA-256 от текста и JSON результата (числа, сегменты времени, приемы пищи), но не сам текст.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from app.cache_utils import CACHES, LRUCache
+from app.config import PARSE_CACHE_DB, PARSE_CACHE_DISK_MAX_ROWS, PARSE_CACHE_SIZE
+
+# Как часто (в вставках) проверять размер дискового уровня
+DISK_PRUNE_EVERY = 1000
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class ParseCache:
+    def __init__(self, name: str, version: str, maxsize: int = PARSE_CACHE_SIZE,
+                 disk_path: str = PARSE_CACHE_DB, disk_max_rows: int = PARSE_CACHE_DISK_MAX_ROWS):
+        self.version = version
+        self.memory = LRUCache(name, maxsize)
+        self.disk_max_rows = disk_max_rows
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        self._inserts = 0
+        if disk_path:
+            self._open_disk(disk_path)
+            CACHES[f"{name}_disk"] = self
+
+    def _open_disk(self, path: str):
+        con = sqlite3.connect(path, check_same_thread=False)
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute("PRAGMA synchronous = NORMAL")
+        con.execute("""
+        CREATE TABLE IF NOT EXISTS parse_cache (
+            version TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY (version, text_hash)
+        ) WITHOUT ROWID
+        """)
+        # Записи прежних версий шаблонов больше никогда не понадобятся
+        con.execute("DELETE FROM parse_cache WHERE version != ?", (self.version,))
+        con.commit()
+        self._disk = con
+
+    @staticmethod
+    def _text_hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Результат разбора для нормализованного текста или None. Возвращается новая копия."""
+        cached = self.memory.get(key)
+        if cached is not None:
+            return json.loads(cached)
+        if self._disk is None:
+            return None
+
+        with self._disk_lock:
+            row = self._disk.execute(
+                "SELECT result FROM parse_cache WHERE version = ? AND text_hash = ?", (self.version, self._text_hash(key))
+            ).fetchone()
+        if row is None:
+            self.disk_misses += 1
+            return None
+        self.disk_hits += 1
+        self.memory.set(key, row[0])
+        return json.loads(row[0])
+
+    def set(self, key: str, result: dict):
+        encoded = json.dumps(result, ensure_ascii=False)
+        self.memory.set(key, encoded)
+        if self._disk is None:
+            return
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO parse_cache (version, text_hash, result, created_at) VALUES (?, ?, ?, ?)",
+                (self.version, self._text_hash(key), encoded, int(time.time())),
+            )
+            self._inserts += 1
+            if self._inserts % DISK_PRUNE_EVERY == 0:
+                self._prune_disk()
+            self._disk.commit()
+
+    def _prune_disk(self):
+        # Сверх лимита удаляются самые давно записанные результаты
+        count = self._disk.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+        if count > self.disk_max_rows:
+            self._disk.execute(
+                """
+                DELETE FROM parse_cache WHERE text_hash IN (
+                    SELECT text_hash FROM parse_cache ORDER BY created_at ASC LIMIT ?
+                )
+                """,
+                (count - self.disk_max_rows,),
+            )
+
+    def stats(self) -> dict:
+        lookups = self.disk_hits + self.disk_misses
+        return {
+            "version": self.version,
+            "hits": self.disk_hits,
+            "misses": self.disk_misses,
+            "hit_ratio": round(self.disk_hits / lookups, 4) if lookups else None,
+        }
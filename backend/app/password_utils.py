@@ -0,0 +1,75 @@
+# backend/app/password_utils.py
+"""
+Хэширование и проверка паролей (bcrypt).
+
+bcrypt намеренно медленный (десятки-сотни миллисекунд), поэтому в async-обработчиках проверка
+выполняется в отдельном пуле потоков ограниченного размера, а не в цикле событий.
+Число одновременных проверок (в работе + в очереди пула) ограничено PASSWORD_MAX_PENDING;
+если свободного места нет дольше PASSWORD_QUEUE_TIMEOUT секунд, бросается PasswordCheckBusy
+(обработчик отвечает 503) - при массовом входе запросы не копятся бесконечно.
+
+Стоимость хэша задает BCRYPT_ROUNDS; хэши с меньшей стоимостью пересчитываются при успешном входе.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import BCRYPT_ROUNDS, PASSWORD_MAX_PENDING, PASSWORD_QUEUE_TIMEOUT, PASSWORD_WORKERS
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_semaphore = None
+
+
+class PasswordCheckBusy(Exception):
+    """Все места для проверки паролей заняты дольше PASSWORD_QUEUE_TIMEOUT."""
+
+
+def load_bcrypt():
+    # bcrypt (нативное расширение) загружается при первой проверке пароля, а не при импорте приложения
+    import bcrypt
+    return bcrypt
+
+
+def hash_password(password: str) -> bytes:
+    bcrypt = load_bcrypt()
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+
+def verify_password(password: str, hashed_password) -> bool:
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
+    bcrypt = load_bcrypt()
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+
+def needs_rehash(hashed_password) -> bool:
+    """True, если хэш посчитан с меньшей стоимостью, чем BCRYPT_ROUNDS (формат $2b$12$...)."""
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode('ascii')
+    try:
+        return int(hashed_password.split("$")[2]) < BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+async def _run_limited(func, *args):
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(PASSWORD_MAX_PENDING)
+    try:
+        await asyncio.wait_for(_semaphore.acquire(), timeout=PASSWORD_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PasswordCheckBusy()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        _semaphore.release()
+
+
+async def verify_password_async(password: str, hashed_password) -> bool:
+    """verify_password в пуле bcrypt, не блокируя цикл событий."""
+    return await _run_limited(verify_password, password, hashed_password)
+
+
+async def hash_password_async(password: str) -> bytes:
+    """hash_password в пуле bcrypt, не блокируя цикл событий."""
+    return await _run_limited(hash_password, password)
@@ -0,0 +1,75 @@
+# backend/app/readiness.py
+"""
+Готовность подсистем процесса для GET /api/ready.
+
+Тяжелые подсистемы (шифрование, JWT, модель spaCy) не инициализируются при импорте:
+они регистрируются здесь и прогреваются в фоновом потоке после старта (warm_up),
+а до этого загружаются лениво при первом использовании. Приложение отвечает на "/" сразу.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PENDING, READY, FAILED = "pending", "ready", "failed"
+
+# имя -> {"loader", "required", "state", "seconds", "error"}
+_components = {}
+_lock = threading.Lock()
+
+
+def register(name: str, loader=None, required: bool = True):
+    """
+    Регистрирует подсистему. loader - функция инициализации для фонового прогрева
+    (None - подсистема отмечается готовой вручную через mark_ready).
+    Необязательные подсистемы (required=False) не влияют на общую готовность.
+    """
+    with _lock:
+        _components[name] = {"loader": loader, "required": required, "state": PENDING, "seconds": None, "error": None}
+
+
+def mark_ready(name: str, seconds: float = None):
+    with _lock:
+        _components[name].update(state=READY, seconds=seconds, error=None)
+
+
+def _run(name: str, loader):
+    started = time.perf_counter()
+    try:
+        loader()
+    except Exception as e:
+        logger.exception("Не удалось инициализировать '%s'", name)
+        with _lock:
+            _components[name].update(state=FAILED, seconds=time.perf_counter() - started, error=str(e))
+        return
+    mark_ready(name, time.perf_counter() - started)
+
+
+def warm_up() -> threading.Thread:
+    """Последовательно инициализирует зарегистрированные подсистемы в фоновом потоке."""
+    with _lock:
+        pending = [(name, c["loader"]) for name, c in _components.items() if c["loader"] and c["state"] == PENDING]
+
+    def run_all():
+        for name, loader in pending:
+            _run(name, loader)
+
+    thread = threading.Thread(target=run_all, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def status() -> dict:
+    with _lock:
+        components = {
+            name: {
+                "state": c["state"],
+                "required": c["required"],
+                "seconds": round(c["seconds"], 3) if c["seconds"] is not None else None,
+                **({"error": c["error"]} if c["error"] else {}),
+            }
+            for name, c in _components.items()
+        }
+    ready = all(c["state"] == READY for c in components.values() if c["required"])
+    return {"ready": ready, "components": components}
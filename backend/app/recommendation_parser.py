@@ -1,12 +1,26 @@
 # backend/app/recommendation_parser.py
-import spacy
-from spacy.matcher import Matcher
+"""
+Локальный парсер текстовых рекомендаций (spaCy Matcher по леммам и атрибутам токенов).
 
-# Загружаем малую русскую модель. Она быстрая и работает на CPU.
-nlp = spacy.load("ru_core_news_sm")
+Модель загружается лениво при первом разборе (или заранее в фоне - прогрев app.readiness из lifespan),
+без синтаксического парсера и NER: шаблонам нужны только леммы, а лемматизатору - морфология.
 
-# Инициализируем Matcher
-matcher = Matcher(nlp.vocab)
+Результаты кэшируются по нормализованному тексту (app.parse_cache). При изменении логики
+_parse_doc нужно увеличить PARSER_REVISION; изменения шаблонов учитываются автоматически.
+"""
+import hashlib
+import json
+import threading
+
+from app.config import NLP_BATCH_SIZE, NLP_MAX_PROCESSES, SPACY_EXCLUDE, SPACY_MODEL
+from app.parse_cache import ParseCache, normalize_text
+
+# Ревизия кода разбора - часть версии кэша
+PARSER_REVISION = 1
+
+_nlp = None
+_matcher = None
+_load_lock = threading.Lock()
 
 # --- 1. ОПРЕДЕЛЯЕМ НАШИ ШАБЛОНЫ ---
 
@@ -45,11 +59,38 @@ pattern_time_segment = [
     {"SHAPE": {"IN": ["dd:dd", "d:dd", "dd.dd", "d.dd"]}}
 ]
 
-matcher.add("TIME_SEGMENT", [pattern_time_segment])
+PATTERNS = {
+    "TIME_SEGMENT": [pattern_time_segment],
+    "BASAL_CHANGE": [pattern_basal],
+    "CARB_RATIO_CHANGE": [pattern_carb_ratio],
+}
+
+PATTERNS_VERSION = hashlib.sha256(
+    json.dumps(
+        {"model": SPACY_MODEL, "exclude": SPACY_EXCLUDE, "patterns": PATTERNS, "revision": PARSER_REVISION},
+        sort_keys=True, ensure_ascii=False,
+    ).encode("utf-8")
+).hexdigest()[:16]
+
+parse_cache = ParseCache("recommendation_parses", PATTERNS_VERSION)
+
+
+def get_nlp():
+    """Модель spaCy и Matcher с шаблонами; загружаются один раз при первом обращении."""
+    global _nlp, _matcher
+    if _nlp is None:
+        with _load_lock:
+            if _nlp is None:
+                import spacy
+                from spacy.matcher import Matcher
 
-# Добавляем шаблоны в Matcher
-matcher.add("BASAL_CHANGE", [pattern_basal])
-matcher.add("CARB_RATIO_CHANGE", [pattern_carb_ratio])
+                nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+                matcher = Matcher(nlp.vocab)
+                for rule_id, patterns in PATTERNS.items():
+                    matcher.add(rule_id, patterns)
+                _matcher = matcher
+                _nlp = nlp
+    return _nlp, _matcher
 
 
 # --- 2. ФУНКЦИЯ-ПАРСЕР ---
@@ -59,8 +100,38 @@ def parse_recommendation_text(text: str) -> dict:
     Парсит текстовую рекомендацию и возвращает структурированный JSON, 
     включая поиск временного сегмента.
     """
-    # Приводим к нижнему регистру для надежности
-    doc = nlp(text.lower()) 
+    # Приводим к нижнему регистру и схлопываем пробелы: это и ключ кэша, и текст для разбора
+    key = normalize_text(text)
+    result = parse_cache.get(key)
+    if result is None:
+        nlp, _ = get_nlp()
+        result = _parse_doc(nlp(key))
+        parse_cache.set(key, result)
+    return result
+
+
+def parse_recommendation_texts(texts: list, batch_size: int = NLP_BATCH_SIZE, n_process: int = 1) -> list:
+    """Пакетный разбор; через nlp.pipe проходят только тексты, которых нет в кэше. Порядок сохраняется."""
+    keys = [normalize_text(text) for text in texts]
+    results = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        result = parse_cache.get(key)
+        if result is None:
+            missing.append(key)
+        else:
+            results[key] = result
+
+    if missing:
+        nlp, _ = get_nlp()
+        for key, doc in zip(missing, nlp.pipe(missing, batch_size=batch_size, n_process=n_process)):
+            results[key] = _parse_doc(doc)
+            parse_cache.set(key, results[key])
+    return [results[key] for key in keys]
+
+
+def _parse_doc(doc) -> dict:
+    nlp, matcher = get_nlp()
     matches = matcher(doc)
 
     results = {
@@ -0,0 +1,225 @@
+# backend/app/rollups.py
+"""
+Предагрегированные ряды (rollups): min / max / count / sum по интервалам 15 минут, 1 час и 1 сутки
+для каждого пациента и типа записи. Среднее = sum / count.
+
+Таблица timeseries_rollups поддерживается инкрементально при приеме данных (update_rollups - для новых
+точек, refresh_days - для суток, где повторно присланная точка заменила значение в чанке), а полный пересчет существующих данных выполняет команда (из каталога backend):
+    python -m app.rollups
+Проверка согласованности с данными и пересчет только расходящихся рядов (то же выполняется при старте):
+    python -m app.rollups --check
+"""
+import argparse
+import logging
+import sqlite3
+from collections import defaultdict
+
+import numpy as np
+
+from app.database import DB_NAME, create_connection
+from app.time_utils import MAX_EPOCH
+from app.timeseries_store import SECONDS_PER_DAY, read_series
+
+logger = logging.getLogger(__name__)
+
+# Разрешение -> длина интервала в секундах
+ROLLUP_RESOLUTIONS = {
+    "15m": 15 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+# В режиме auto выбирается самое грубое разрешение, дающее не меньше стольких точек на диапазон
+AUTO_MIN_POINTS = 200
+
+UPSERT_SQL = """
+    INSERT INTO timeseries_rollups (patient_id, record_type, resolution, bucket_epoch, count, sum, min, max)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (patient_id, record_type, resolution, bucket_epoch) DO UPDATE SET
+        count = count + excluded.count,
+        sum = sum + excluded.sum,
+        min = MIN(min, excluded.min),
+        max = MAX(max, excluded.max)
+"""
+
+
+def choose_resolution(resolution: str, start_epoch: int, end_epoch: int) -> str:
+    """Разрешает "auto" в конкретное разрешение ("raw" или ключ ROLLUP_RESOLUTIONS)."""
+    if resolution != "auto":
+        return resolution
+    span = max(end_epoch - start_epoch, 0)
+    for name, seconds in sorted(ROLLUP_RESOLUTIONS.items(), key=lambda item: -item[1]):
+        if span / seconds >= AUTO_MIN_POINTS:
+            return name
+    return "raw"
+
+
+def aggregate(timestamps: np.ndarray, values: np.ndarray, bucket_seconds: int):
+    """
+    Агрегирует отсортированные по времени точки по интервалам.
+    Возвращает (начала интервалов, count, sum, min, max).
+    """
+    buckets = timestamps // bucket_seconds * bucket_seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(buckets)])
+    return (
+        buckets[starts],
+        counts,
+        np.add.reduceat(values, starts),
+        np.minimum.reduceat(values, starts),
+        np.maximum.reduceat(values, starts),
+    )
+
+
+def _upsert_series(cur: sqlite3.Cursor, patient_id: int, record_type: str, timestamps, values):
+    for seconds in ROLLUP_RESOLUTIONS.values():
+        buckets, counts, sums, mins, maxs = aggregate(timestamps, values, seconds)
+        cur.executemany(
+            UPSERT_SQL,
+            (
+                (patient_id, record_type, seconds, *bucket_row)
+                for bucket_row in zip(buckets.tolist(), counts.tolist(), sums.tolist(), mins.tolist(), maxs.tolist())
+            ),
+        )
+
+
+def update_rollups(con: sqlite3.Connection, rows: list):
+    """
+    Добавляет в агрегаты новые точки. rows - те же кортежи, что и в timeseries_store.write_points:
+    (patient_id, timestamp, timestamp_epoch, record_type, value, details).
+    Коммит выполняет вызывающий код (в той же транзакции, что и запись точек).
+    """
+    groups = defaultdict(list)
+    for patient_id, _, epoch, record_type, value, _ in rows:
+        groups[(patient_id, record_type)].append((epoch, value))
+
+    cur = con.cursor()
+    for (patient_id, record_type), points in groups.items():
+        points.sort()
+        timestamps = np.array([point[0] for point in points], dtype=np.int64)
+        values = np.array([point[1] for point in points], dtype=np.float64)
+        _upsert_series(cur, patient_id, record_type, timestamps, values)
+
+
+def refresh_days(con: sqlite3.Connection, days):
+    """
+    Пересчитывает агрегаты всех разрешений за сутки по хранимым точкам. days - (patient_id, record_type, day);
+    нужен, когда повторно присланная точка заменила значение в чанке и агрегат нельзя поправить прибавлением.
+    Коммит выполняет вызывающий код.
+    """
+    cur = con.cursor()
+    for patient_id, record_type, day in days:
+        day_start = day * SECONDS_PER_DAY
+        cur.execute(
+            """
+            DELETE FROM timeseries_rollups
+            WHERE patient_id = ? AND record_type = ? AND bucket_epoch >= ? AND bucket_epoch < ?
+            """,
+            (patient_id, record_type, day_start, day_start + SECONDS_PER_DAY),
+        )
+        timestamps, values = read_series(con, patient_id, (record_type,), day_start, day_start + SECONDS_PER_DAY - 1)
+        if len(timestamps):
+            _upsert_series(cur, patient_id, record_type, timestamps, values)
+
+
+def read_rollups(con: sqlite3.Connection, patient_id: int, record_types, resolution: str, start_epoch: int, end_epoch: int):
+    """
+    Возвращает агрегаты за [start_epoch, end_epoch] с объединением нескольких типов записей:
+    (начала интервалов int64, count, sum, min, max) в виде массивов NumPy.
+    """
+    record_types = tuple(record_types)
+    seconds = ROLLUP_RESOLUTIONS[resolution]
+    cur = con.cursor()
+    cur.row_factory = None
+    cur.execute(
+        f"""
+        SELECT bucket_epoch, SUM(count), SUM(sum), MIN(min), MAX(max) FROM timeseries_rollups
+        WHERE patient_id = ? AND record_type IN ({", ".join("?" * len(record_types))})
+          AND resolution = ? AND bucket_epoch BETWEEN ? AND ?
+        GROUP BY bucket_epoch
+        ORDER BY bucket_epoch ASC
+        """,
+        (patient_id, *record_types, seconds, start_epoch // seconds * seconds, end_epoch),
+    )
+    rows = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 5)
+    return rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64), rows[:, 2], rows[:, 3], rows[:, 4]
+
+
+def rebuild_rollups(con: sqlite3.Connection, series=None, verbose: bool = False):
+    """
+    Пересчитывает агрегаты по всем точкам (строки и чанки), по одному ряду за транзакцию.
+    series - список пар (patient_id, record_type) для частичного пересчета; None - все ряды.
+    """
+    if series is None:
+        series = con.execute(
+            """
+            SELECT DISTINCT patient_id, record_type FROM timeseries_data
+            UNION
+            SELECT DISTINCT patient_id, record_type FROM timeseries_chunks
+            ORDER BY 1, 2
+            """
+        ).fetchall()
+        con.execute("DELETE FROM timeseries_rollups")
+        con.commit()
+
+    cur = con.cursor()
+    for patient_id, record_type in series:
+        cur.execute("DELETE FROM timeseries_rollups WHERE patient_id = ? AND record_type = ?", (patient_id, record_type))
+        timestamps, values = read_series(con, patient_id, (record_type,), -MAX_EPOCH, MAX_EPOCH)
+        if len(timestamps):
+            _upsert_series(cur, patient_id, record_type, timestamps, values)
+        con.commit()
+        if verbose:
+            print(f"  Пациент {patient_id}, {record_type}: {len(timestamps)} точек")
+
+
+def find_stale_rollups(con: sqlite3.Connection) -> list:
+    """
+    Ряды (patient_id, record_type), у которых число точек в агрегатах за сутки не совпадает
+    с числом точек в timeseries_data и timeseries_chunks: данные, записанные в обход update_rollups
+    (массовая загрузка, ручные правки), и агрегаты удаленных пациентов.
+    """
+    rows = con.execute(
+        """
+        WITH points AS (
+            SELECT patient_id, record_type, COUNT(*) AS n FROM timeseries_data GROUP BY patient_id, record_type
+            UNION ALL
+            SELECT patient_id, record_type, SUM(point_count) FROM timeseries_chunks GROUP BY patient_id, record_type
+        ),
+        totals AS (
+            SELECT patient_id, record_type, SUM(n) AS points, 0 AS rolled FROM points GROUP BY patient_id, record_type
+            UNION ALL
+            SELECT patient_id, record_type, 0, SUM(count) FROM timeseries_rollups
+            WHERE resolution = ? GROUP BY patient_id, record_type
+        )
+        SELECT patient_id, record_type FROM totals
+        GROUP BY patient_id, record_type
+        HAVING SUM(points) != SUM(rolled)
+        ORDER BY 1, 2
+        """,
+        (ROLLUP_RESOLUTIONS["1d"],),
+    ).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def repair_rollups(con: sqlite3.Connection, verbose: bool = False) -> list:
+    """Находит рассогласованные ряды и пересчитывает только их. Возвращает список пересчитанных рядов."""
+    stale = find_stale_rollups(con)
+    if stale:
+        logger.warning("Агрегаты не совпадают с данными у %d рядов, пересчет", len(stale))
+        rebuild_rollups(con, stale, verbose=verbose)
+    return stale
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчет агрегатов timeseries_rollups")
+    parser.add_argument("--check", action="store_true", help="пересчитать только ряды, не совпадающие с данными")
+    args = parser.parse_args()
+
+    connection = create_connection(DB_NAME)
+    if args.check:
+        repaired = repair_rollups(connection, verbose=True)
+        print(f"Пересчитано рядов: {len(repaired)}.")
+    else:
+        rebuild_rollups(connection, verbose=True)
+        print("Агрегаты пересчитаны.")
+    connection.close()
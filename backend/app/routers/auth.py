@@ -1,41 +1,64 @@
 from fastapi import APIRouter, HTTPException, Depends
-from app.models import UserCredentials
-from app.auth_utils import create_access_token, get_current_doctor
-import sqlite3
-import bcrypt
+from starlette.concurrency import run_in_threadpool
+from app.models import UserCredentials, PasswordChange
+from app.auth_utils import bump_token_version, create_doctor_token, get_current_doctor, invalidate_doctor
+from app.database import connection
+from app.password_utils import PasswordCheckBusy, hash_password_async, needs_rehash, verify_password_async
 
 router = APIRouter()
-DB_NAME = "medical_app.db"
+
+def _find_doctor(username: str):
+    # Соединение из пула берется только на время запроса, а не на все время проверки bcrypt
+    with connection() as con:
+        return con.execute("SELECT * FROM doctors WHERE username = ?", (username,)).fetchone()
+
+def _update_password_hash(doctor_id: int, new_hash: bytes):
+    with connection() as con:
+        con.execute("UPDATE doctors SET hashed_password = ? WHERE id = ?", (new_hash, doctor_id))
+        con.commit()
+
+def _find_password_hash(doctor_id: int):
+    with connection() as con:
+        return con.execute("SELECT hashed_password FROM doctors WHERE id = ?", (doctor_id,)).fetchone()["hashed_password"]
+
+def _replace_password(doctor_id: int, new_hash: bytes):
+    """Сохраняет новый хэш и отзывает все токены врача; возвращает строку для нового токена."""
+    with connection() as con:
+        con.execute("UPDATE doctors SET hashed_password = ? WHERE id = ?", (new_hash, doctor_id))
+        bump_token_version(con, doctor_id)
+        con.commit()
+        # Сброс кэша - только после коммита, иначе старая версия токенов может попасть в кэш снова
+        invalidate_doctor(doctor_id)
+        return con.execute("SELECT id, username, token_version FROM doctors WHERE id = ?", (doctor_id,)).fetchone()
 
 @router.post("/login")
 async def login_for_access_token(credentials: UserCredentials):
-    # Подключаемся к базе данных
-    con = sqlite3.connect(DB_NAME)
-    # Устанавливаем row_factory, чтобы получать результаты в виде словарей
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-
-    # 1. Ищем пользователя по имени
-    cur.execute("SELECT * FROM doctors WHERE username = ?", (credentials.username,))
-    user_record = cur.fetchone()
-    con.close()
+    # 1. Ищем пользователя по имени (sqlite3 - блокирующий, поэтому в пуле потоков)
+    user_record = await run_in_threadpool(_find_doctor, credentials.username)
 
     if not user_record:
         raise HTTPException(status_code=401, detail="Неверное имя пользователя или пароль")
 
-    # 2. Сравниваем хэши паролей
-    stored_hashed_password = user_record["hashed_password"]
-    password_bytes = credentials.password.encode('utf-8')
+    # 2. Сравниваем хэши паролей в ограниченном пуле bcrypt, цикл событий не блокируется
+    try:
+        if not await verify_password_async(credentials.password, user_record["hashed_password"]):
+            raise HTTPException(status_code=401, detail="Неверное имя пользователя или пароль")
 
-    # bcrypt.checkpw сама сравнивает введенный пароль с хэшем из БД
-    if not bcrypt.checkpw(password_bytes, stored_hashed_password):
-        raise HTTPException(status_code=401, detail="Неверное имя пользователя или пароль")
+        # Хэши со стоимостью ниже BCRYPT_ROUNDS пересчитываются, пока известен пароль
+        if needs_rehash(user_record["hashed_password"]):
+            new_hash = await hash_password_async(credentials.password)
+            await run_in_threadpool(_update_password_hash, user_record["id"], new_hash)
+    except PasswordCheckBusy:
+        raise HTTPException(
+            status_code=503, detail="Сервер перегружен, повторите вход позже", headers={"Retry-After": "5"}
+        )
+
+    if user_record["is_active"] == 0:
+        raise HTTPException(status_code=403, detail="Учетная запись отключена")
     
      # --- ГЕНЕРАЦИЯ JWT-ТОКЕНА ---
-    # Создаем токен, содержащий имя пользователя
-    access_token = create_access_token(
-        data={"sub": user_record["username"]}
-    )
+    # Токен содержит имя, id врача и версию токенов (для проверки без обращения к базе)
+    access_token = create_doctor_token(user_record)
     
     # Возвращаем токен вместо заглушки
     return {"access_token": access_token, "token_type": "bearer"}
@@ -50,4 +73,23 @@ def read_users_me(current_doctor: dict = Depends(get_current_doctor)):
         "username": current_doctor["username"],
         "full_name": current_doctor["full_name"],
         "specialization": current_doctor["specialization"]
-    }
\ No newline at end of file
+    }
+
+@router.post("/change-password")
+async def change_password(payload: PasswordChange, current_doctor: dict = Depends(get_current_doctor)):
+    """
+    Меняет пароль врача. Все ранее выданные токены отзываются, в ответе - новый токен.
+    bcrypt выполняется в том же ограниченном пуле, что и при входе (503, если он занят).
+    """
+    hashed_password = await run_in_threadpool(_find_password_hash, current_doctor["id"])
+    try:
+        if not await verify_password_async(payload.old_password, hashed_password):
+            raise HTTPException(status_code=400, detail="Неверный текущий пароль")
+        new_hash = await hash_password_async(payload.new_password)
+    except PasswordCheckBusy:
+        raise HTTPException(
+            status_code=503, detail="Сервер перегружен, повторите попытку позже", headers={"Retry-After": "5"}
+        )
+
+    doctor = await run_in_threadpool(_replace_password, current_doctor["id"], new_hash)
+    return {"access_token": create_doctor_token(doctor), "token_type": "bearer"}
@@ -1,30 +1,54 @@
-from fastapi import APIRouter, HTTPException, status
-import sqlite3
+from fastapi import APIRouter, Depends, HTTPException, status
 from app.models import TimeSeriesDataIngest
-from app.encryption_utils import encrypt_data
+from app.details_store import encrypt_details
+from app.database import connection
+from app.time_utils import to_epoch
+from app.ingest_pipeline import IngestQueueFull, get_pipeline, store_rows
+from app.auth_utils import get_current_doctor
+from app.live_updates import broker, publish_rows
 
 router = APIRouter()
-DB_NAME = "medical_app.db"
+
+# Через сколько секунд клиенту стоит повторить запрос, если очередь записи заполнена
+RETRY_AFTER_SECONDS = 5
 
 @router.post("/", status_code=status.HTTP_202_ACCEPTED)
 def ingest_timeseries_data(payload: TimeSeriesDataIngest):
     """
     Принимает пачку временных данных (глюкоза, инсулин) от устройства/приложения.
+    Точки ставятся в очередь фонового писателя (app.ingest_pipeline) и записываются в базу
+    общей транзакцией с другими запросами; без запущенного писателя запись идет сразу.
     """
-    records_to_insert = []
-    for point in payload.data_points:
-        details = encrypt_data(point.details) if point.details else None
-        records_to_insert.append(
-            (payload.patient_id, point.timestamp, point.record_type, point.value, details)
+    # Каждое уникальное примечание пачки шифруется один раз (большие пачки - в пуле потоков)
+    details_refs = encrypt_details(point.details for point in payload.data_points if point.details)
+    records_to_insert = [
+        (
+            payload.patient_id, point.timestamp, to_epoch(point.timestamp), point.record_type, point.value,
+            details_refs[point.details] if point.details else None,
         )
+        for point in payload.data_points
+    ]
+
+    pipeline = get_pipeline()
+    if pipeline.running:
+        try:
+            pipeline.submit(records_to_insert)
+        except IngestQueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Сервер перегружен входящими данными, повторите попытку позже",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+    else:
+        with connection() as con:
+            store_rows(con, records_to_insert)
+            con.commit()
+        publish_rows(records_to_insert)
+
+    return {"message": f"{len(records_to_insert)} записей успешно принято."}
 
-    con = sqlite3.connect(DB_NAME)
-    cur = con.cursor()
-    cur.executemany(
-        "INSERT INTO timeseries_data (patient_id, timestamp, record_type, value, encrypted_details) VALUES (?, ?, ?, ?, ?)",
-        records_to_insert
-    )
-    con.commit()
-    con.close()
 
-    return {"message": f"len(records_to_insert) записей успешно принято."}
\ No newline at end of file
+@router.get("/stats")
+def ingest_queue_stats(current_doctor: dict = Depends(get_current_doctor)):
+    """Состояние очереди отложенной записи и подписок на новые точки этого процесса."""
+    return {**get_pipeline().stats(), "live": broker.stats()}
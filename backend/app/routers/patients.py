@@ -1,21 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
-import sqlite3
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
 import sqlite3
 import json
-from app.models import PatientCreate, PatientDisplay, MedicalRecordCreate, SimulatorScenario
+from app.models import PatientCreate, PatientDisplay, MedicalRecordCreate, SimulatorScenario, SimulationRequest, SweepRequest
 from app.auth_utils import get_current_doctor
-from app.encryption_utils import encrypt_data, decrypt_data
-from app.analysis_utils import analyze_patient_data
+from app.database import connection, get_db
+from app.encryption_utils import encrypt_data, decrypt_cached, invalidate_decrypted, prime_decryption_cache
+from app.analysis_utils import analyze_series
+from app.time_utils import to_epoch, from_epoch, MAX_EPOCH
+from app.timeseries_store import SERIES_RECORD_TYPES, iter_series, read_series
+from app.rollups import choose_resolution, read_rollups
+from app.downsampling import lttb_indices
+from app.cache_utils import LRUCache
+from app.data_versions import MEDICAL_RECORDS, PARAMETERS, PATIENTS, SCENARIOS, TIMESERIES, bump_versions, get_version
+from app.etags import etag_matches, make_etag, not_modified, set_etag
+from app.series_format import SERIES_MEDIA_TYPE, encode_series
+from app.blind_index import index_patient, query_hashes, unindex_patient
+from app.cgm_metrics import window_metrics
+from app.overview import practice_overview
+from app.live_updates import EVENT_STREAM_MEDIA_TYPE, RECONNECT_MILLISECONDS, broker, event_stream
 from datetime import datetime, timedelta, time
 
 router = APIRouter()
-DB_NAME = "medical_app.db"
+
+# Какое значение агрегата отдавать как "y" при resolution != raw:
+# для глюкозы - среднее, для доз инсулина и углеводов - сумма за интервал
+SERIES_ROLLUP_VALUE = {
+    "glucose": "mean",
+    "insulin": "sum",
+    "carbs": "sum",
+}
+Resolution = Literal["raw", "15m", "1h", "1d", "auto"]
+# Число точек в одной строке NDJSON при потоковой отдаче
+STREAM_BATCH_SIZE = 2000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Кэш рекомендаций: ключ - (пациент, версии его данных, начало окна анализа)
+recommendations_cache = LRUCache("recommendations", maxsize=2048)
+# Начало 30-дневного окна округляется до часа, чтобы ключ кэша не менялся с каждой секундой
+RECOMMENDATIONS_WINDOW_ALIGN = 3600
+# Окно графика по умолчанию (последние 7 дней); начало округляется до минуты,
+# чтобы ETag повторных обновлений совпадал
+DEFAULT_WINDOW_DAYS = 7
+DEFAULT_WINDOW_ALIGN = 60
+
+# Максимальный размер страницы списка пациентов; id последнего пациента страницы
+# возвращается в заголовке NEXT_PAGE_HEADER и передается как after_id для следующей
+MAX_PAGE_SIZE = 500
+NEXT_PAGE_HEADER = "X-Next-After-Id"
+
+# Окно метрик НМГ по умолчанию (стандартный отчет AGP - 14 дней)
+METRICS_DEFAULT_DAYS = 14
+
+# Предел числа шагов одной симуляции (интервал / шаг), чтобы запрос не занимал поток надолго
+MAX_SIMULATION_STEPS = 100000
+
+
+def _rollup_values(series: str, counts, sums):
+    values = sums / counts if SERIES_ROLLUP_VALUE[series] == "mean" else sums
+    return values.round(2)
+
+
+def _downsample(max_points: Optional[int], timestamps, values, *extra):
+    """Прореживает ряд LTTB до max_points; extra - сопутствующие массивы (min/max), берутся по тем же индексам."""
+    if max_points is None or len(timestamps) <= max_points:
+        return (timestamps, values, *extra)
+    indices = lttb_indices(timestamps, values, max_points)
+    return tuple(array[indices] for array in (timestamps, values, *extra))
+
+
+def _chart_points(timestamps, values, mins=None, maxs=None) -> list:
+    """Точки в формате Chart.js: {"x": "<дата>", "y": значение} (+ min/max для агрегатов)."""
+    if mins is None:
+        return [
+            {"x": from_epoch(ts).isoformat(sep=" "), "y": value}
+            for ts, value in zip(timestamps.tolist(), values.tolist())
+        ]
+    return [
+        {"x": from_epoch(ts).isoformat(sep=" "), "y": value, "min": low, "max": high}
+        for ts, value, low, high in zip(timestamps.tolist(), values.tolist(), mins.tolist(), maxs.tolist())
+    ]
+
+
+def _iter_chart_points(con, patient_id: int, series: str, start_epoch: int, end_epoch: int,
+                       resolution: str, max_points: Optional[int]):
+    """Отдает точки серии пачками не больше STREAM_BATCH_SIZE."""
+    record_types = SERIES_RECORD_TYPES[series]
+    if resolution == "raw" and max_points is None:
+        # Без прореживания ряд не собирается целиком - идем по курсору
+        for timestamps, values in iter_series(con, patient_id, record_types, start_epoch, end_epoch, STREAM_BATCH_SIZE):
+            yield _chart_points(timestamps, values)
+        return
+
+    arrays = _series_arrays(con, patient_id, series, start_epoch, end_epoch, resolution, max_points)
+    for offset in range(0, len(arrays[0]), STREAM_BATCH_SIZE):
+        yield _chart_points(*(array[offset:offset + STREAM_BATCH_SIZE] for array in arrays))
+
+
+def _series_arrays(con, patient_id: int, series: str, start_epoch: int, end_epoch: int,
+                   resolution: str, max_points: Optional[int]) -> tuple:
+    """Серия целиком массивами NumPy: (отметки, значения) для raw, (отметки, значения, min, max) для агрегатов."""
+    record_types = SERIES_RECORD_TYPES[series]
+    if resolution == "raw":
+        timestamps, values = read_series(con, patient_id, record_types, start_epoch, end_epoch)
+        return _downsample(max_points, timestamps, values)
+    timestamps, counts, sums, mins, maxs = read_rollups(
+        con, patient_id, record_types, resolution, start_epoch, end_epoch
+    )
+    return _downsample(max_points, timestamps, _rollup_values(series, counts, sums), mins, maxs)
+
+
+def _wants_binary(request: Request, binary: bool) -> bool:
+    return binary or SERIES_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _binary_response(resolution: str, series: dict, etag: str) -> Response:
+    response = Response(encode_series(resolution, series), media_type=SERIES_MEDIA_TYPE)
+    set_etag(response, etag)
+    response.headers["Vary"] = "Accept"
+    return response
+
+def _patient_versions(con: sqlite3.Connection, patient_id: int, doctor_id: int, *entities) -> tuple:
+    """Проверяет, что пациент принадлежит врачу, и тем же запросом возвращает версии его данных."""
+    version_columns = ", ".join(["(SELECT version FROM data_versions WHERE entity = ? AND entity_id = p.id)"] * len(entities))
+    row = con.execute(
+        f"SELECT p.id, {version_columns} FROM patients p WHERE p.id = ? AND p.doctor_id = ?",
+        (*entities, patient_id, doctor_id)
+    ).fetchone()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
+    return tuple(version or 0 for version in row[1:])
+
+
+def _default_window_start() -> int:
+    start_epoch = to_epoch(datetime.utcnow() - timedelta(days=DEFAULT_WINDOW_DAYS))
+    return start_epoch - start_epoch % DEFAULT_WINDOW_ALIGN
+
 
 @router.post("/", response_model=PatientDisplay, status_code=status.HTTP_201_CREATED)
-def create_patient(patient: PatientCreate, current_doctor: dict = Depends(get_current_doctor)):
-    con = sqlite3.connect(DB_NAME)
+def create_patient(patient: PatientCreate, current_doctor: dict = Depends(get_current_doctor), con: sqlite3.Connection = Depends(get_db)):
     cur = con.cursor()
 
     encrypted_name = encrypt_data(patient.full_name)
@@ -30,73 +155,140 @@ def create_patient(patient: PatientCreate, current_doctor: dict = Depends(get_cu
     )
 
     new_patient_id = cur.lastrowid
+    index_patient(con, current_doctor["id"], new_patient_id, patient.full_name)
+    bump_versions(con, PATIENTS, [current_doctor["id"]])
     con.commit()
-    con.close()
+
+    # Список пациентов сразу после создания не будет расшифровывать новую строку
+    prime_decryption_cache(encrypted_name, patient.full_name)
+    if encrypted_contact:
+        prime_decryption_cache(encrypted_contact, patient.contact_info)
 
     return PatientDisplay(
         id = new_patient_id,
         doctor_id = current_doctor["id"],
         created_at = datetime.now(),
-        **patient.dict()
+        **patient.model_dump()
     )
 
 @router.get("/", response_model=List[PatientDisplay])
-def get_my_patients(current_doctor: dict = Depends(get_current_doctor)):
-    """Возвращает список всех пациентов для текущего врача."""
-    con = sqlite3.connect(DB_NAME)
-    con.row_factory = sqlite3.Row
+def get_my_patients(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, max_length=200, description="Поиск по началу слов ФИО"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after_id: int = Query(0, ge=0),
+    current_doctor: dict = Depends(get_current_doctor),
+    con: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Возвращает пациентов текущего врача в порядке id.
+    Без limit - весь список; с limit - страница, следующая запрашивается с after_id из заголовка X-Next-After-Id.
+    q ищет по префиксам слов ФИО через слепой индекс, без расшифровки таблицы.
+    ETag - версия списка пациентов врача и параметры запроса; при совпадении - 304 без чтения и расшифровки.
+    """
     cur = con.cursor()
-    
-    cur.execute("SELECT * FROM patients WHERE doctor_id = ?", (current_doctor["id"],))
+
+    hashes = query_hashes(q) if q is not None else None
+    if q is not None and not hashes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Поисковый запрос должен содержать слово не короче 2 букв")
+
+    etag = make_etag("patients", current_doctor["id"], get_version(con, PATIENTS, current_doctor["id"]),
+                     sorted(hashes) if hashes else None, limit, after_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+
+    if q is None:
+        cur.execute(
+            "SELECT * FROM patients WHERE doctor_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (current_doctor["id"], after_id, limit or -1)
+        )
+    else:
+        # Пациент подходит, если каждое слово запроса - префикс какого-то слова его имени
+        cur.execute(
+            f"""
+            SELECT * FROM patients WHERE id IN (
+                SELECT patient_id FROM patient_name_index
+                WHERE doctor_id = ? AND token_hash IN ({", ".join("?" * len(hashes))}) AND patient_id > ?
+                GROUP BY patient_id HAVING COUNT(*) = ?
+            )
+            ORDER BY id LIMIT ?
+            """,
+            (current_doctor["id"], *hashes, after_id, len(hashes), limit or -1)
+        )
     patients_records = cur.fetchall()
-    con.close()
-    
+
+    if limit is not None and len(patients_records) == limit:
+        response.headers[NEXT_PAGE_HEADER] = str(patients_records[-1]["id"])
+
     patients_list = []
     for record in patients_records:
         patients_list.append(PatientDisplay(
             id=record["id"],
             doctor_id=record["doctor_id"],
-            full_name=decrypt_data(record["encrypted_full_name"]),
-            contact_info=decrypt_data(record["encrypted_contact_info"]) if record["encrypted_contact_info"] else None,
+            full_name=decrypt_cached(record["encrypted_full_name"]),
+            contact_info=decrypt_cached(record["encrypted_contact_info"]) if record["encrypted_contact_info"] else None,
             date_of_birth=record["date_of_birth"],
             created_at=record["created_at"]
         ))
     return patients_list
 
+@router.get("/overview")
+def get_practice_overview(current_doctor: dict = Depends(get_current_doctor), con: sqlite3.Connection = Depends(get_db)):
+    """
+    Сводка по всем пациентам врача одним запросом к БД: последнее значение глюкозы, время в диапазоне
+    и эпизоды гипогликемии за последние сутки, флаг needs_attention с причинами.
+    needs_attention считается по тем же суткам (гипогликемия, TIR < 70 %, нет данных) и не совпадает
+    с /{patient_id}/recommendations, который анализирует 30 дней своими правилами.
+    """
+    overview = practice_overview(con, current_doctor["id"], to_epoch(datetime.utcnow()))
+    for item in overview:
+        item["full_name"] = decrypt_cached(item.pop("encrypted_full_name"))
+        epoch = item.pop("last_glucose_epoch")
+        item["last_glucose_at"] = from_epoch(epoch).isoformat() if epoch is not None else None
+    return overview
+
 @router.post("/{patient_id}/records", status_code=status.HTTP_201_CREATED)
-def add_medical_record(patient_id: int, record: MedicalRecordCreate, current_doctor: dict = Depends(get_current_doctor)):
+def add_medical_record(patient_id: int, record: MedicalRecordCreate, current_doctor: dict = Depends(get_current_doctor), con: sqlite3.Connection = Depends(get_db)):
     """Добавляет новую медицинскую запись для указанного пациента."""
-    # Здесь нужна проверка, что врач имеет право добавлять запись для этого пациента
-    encrypted_data = encrypt_data(record.record_data)
-    con = sqlite3.connect(DB_NAME)
     cur = con.cursor()
+    # Запись добавляется и версия записей меняется только для своего пациента
+    cur.execute("SELECT 1 FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, current_doctor["id"]))
+    if cur.fetchone() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
+    encrypted_data = encrypt_data(record.record_data)
     cur.execute(
         "INSERT INTO medical_records (patient_id, record_date, encrypted_record_data) VALUES (?, ?, ?)",
         (patient_id, record.record_date, encrypted_data)
     )
+    bump_versions(con, MEDICAL_RECORDS, [patient_id])
     con.commit()
-    con.close()
     return {"message": "Запись успешно добавлена"}
 
 @router.delete("/{patient_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_patient(patient_id: int, current_doctor: dict = Depends(get_current_doctor)):
+def delete_patient(patient_id: int, current_doctor: dict = Depends(get_current_doctor), con: sqlite3.Connection = Depends(get_db)):
     """Удаляет пациента и все его медицинские записи."""
     # Важно: проверить, что врач-владелец удаляет своего пациента
-    con = sqlite3.connect(DB_NAME)
     cur = con.cursor()
-    cur.execute("DELETE FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, current_doctor["id"]))
+    cur.execute(
+        "DELETE FROM patients WHERE id = ? AND doctor_id = ? RETURNING encrypted_full_name, encrypted_contact_info",
+        (patient_id, current_doctor["id"])
+    )
+    deleted = cur.fetchone()
+    if deleted is not None:
+        unindex_patient(con, patient_id)
+        bump_versions(con, PATIENTS, [current_doctor["id"]])
     con.commit()
-    if cur.rowcount == 0:
-        con.close()
+    if deleted is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден или у вас нет прав на его удаление")
-    con.close()
+    # Открытые данные удаленного пациента не должны оставаться в памяти
+    invalidate_decrypted(*deleted)
     return
 
 @router.get("/{patient_id}", response_model=PatientDisplay) # Для простоты пока оставим PatientDisplay
-def get_patient_details(patient_id: int, current_doctor: dict = Depends(get_current_doctor)):
+def get_patient_details(patient_id: int, current_doctor: dict = Depends(get_current_doctor), con: sqlite3.Connection = Depends(get_db)):
     """Возвращает детальную информацию о конкретном пациенте и его мед. записи."""
-    con = sqlite3.connect(DB_NAME)
-    con.row_factory = sqlite3.Row
     cur = con.cursor()
 
     # Проверяем, существует ли пациент и принадлежит ли он этому врачу
@@ -104,20 +296,18 @@ def get_patient_details(patient_id: int, current_doctor: dict = Depends(get_curr
     patient_record = cur.fetchone()
 
     if not patient_record:
-        con.close()
-        raise HTTPException(status_code=status.HTTP_4_NOT_FOUND, detail="Пациент не найден")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
 
     # Получаем медицинские записи для этого пациента
     cur.execute("SELECT * FROM medical_records WHERE patient_id = ? ORDER BY record_date DESC", (patient_id,))
     medical_records = cur.fetchall()
-    con.close()
 
     # Дешифруем данные пациента
     patient_details = PatientDisplay(
         id=patient_record["id"],
         doctor_id=patient_record["doctor_id"],
-        full_name=decrypt_data(patient_record["encrypted_full_name"]),
-        contact_info=decrypt_data(patient_record["encrypted_contact_info"]) if patient_record["encrypted_contact_info"] else None,
+        full_name=decrypt_cached(patient_record["encrypted_full_name"]),
+        contact_info=decrypt_cached(patient_record["encrypted_contact_info"]) if patient_record["encrypted_contact_info"] else None,
         date_of_birth=patient_record["date_of_birth"],
         created_at=patient_record["created_at"]
     )
@@ -130,48 +320,50 @@ def get_patient_details(patient_id: int, current_doctor: dict = Depends(get_curr
 @router.get("/{patient_id}/glucose_data")
 def get_patient_glucose_data(
     patient_id: int, 
+    request: Request,
+    response: Response,
     current_doctor: dict = Depends(get_current_doctor),
     start_datetime: Optional[datetime] = None, # <--- Принимаем полную дату и время
-    end_datetime: Optional[datetime] = None
+    end_datetime: Optional[datetime] = None,
+    resolution: Resolution = "raw",
+    max_points: Optional[int] = Query(None, ge=3),
+    binary: bool = False,
+    con: sqlite3.Connection = Depends(get_db)
 ):
     """
     Возвращает данные о глюкозе. По умолчанию за последние 7 дней.
     Если даты и время указаны, фильтрует по ним.
+    resolution: raw - все точки, 15m/1h/1d - средние из агрегатов, auto - выбор по длине диапазона.
+    max_points: прореживание ряда LTTB до заданного числа точек.
+    При binary=true или Accept: application/x-glukoze-series - двоичный колоночный формат
+    (app.series_format) с одной серией "glucose" вместо подписей и значений в JSON.
+    Поддерживает If-None-Match: ETag - версия временных рядов пациента, параметры окна и формат.
     """
-    # ... (проверка доступа врача остается без изменений) ...
-    con = sqlite3.connect(DB_NAME)
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute("SELECT id FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, current_doctor["id"]))
-    if cur.fetchone() is None:
-        con.close()
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
+    # Проверка доступа врача и версия данных - одним запросом
+    (timeseries_version,) = _patient_versions(con, patient_id, current_doctor["id"], TIMESERIES)
 
     if start_datetime and end_datetime:
-        query = """
-            SELECT timestamp, value FROM timeseries_data 
-            WHERE patient_id = ? AND record_type = 'glucose' AND timestamp BETWEEN ? AND ?
-            ORDER BY timestamp ASC
-        """
-        params = (patient_id, start_datetime, end_datetime)
+        start_epoch, end_epoch = to_epoch(start_datetime), to_epoch(end_datetime)
     else:
         # --- ЛОГИКА ПО УМОЛЧАНИЮ (ПОСЛЕДНИЕ 7 ДНЕЙ) ---
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        query = """
-            SELECT timestamp, value FROM timeseries_data 
-            WHERE patient_id = ? AND record_type = 'glucose' AND timestamp >= ?
-            ORDER BY timestamp ASC
-        """
-        params = (patient_id, seven_days_ago)
-        
-    cur.execute(query, params)
-    glucose_records = cur.fetchall()
-    con.close()
+        start_epoch, end_epoch = _default_window_start(), MAX_EPOCH
+
+    resolution = choose_resolution(resolution, start_epoch, min(end_epoch, to_epoch(datetime.utcnow())))
+    as_binary = _wants_binary(request, binary)
+    etag = make_etag("glucose_data", patient_id, timeseries_version, start_epoch, end_epoch, resolution, max_points, as_binary)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    timestamps, values, *_ = _series_arrays(con, patient_id, "glucose", start_epoch, end_epoch, resolution, max_points)
+    if as_binary:
+        return _binary_response(resolution, {"glucose": (timestamps, values)}, etag)
+    set_etag(response, etag)
+    response.headers["Vary"] = "Accept"
 
-    labels = [datetime.fromisoformat(rec["timestamp"]).strftime('%d.%m %H:%M') for rec in glucose_records]
-    data = [rec["value"] for rec in glucose_records]
+    labels = [from_epoch(ts).strftime('%d.%m %H:%M') for ts in timestamps.tolist()]
+    data = values.tolist()
 
-    return {"labels": labels, "data": data}
+    return {"labels": labels, "data": data, "resolution": resolution}
 
  # backend/app/routers/patients.py
 # ...
@@ -179,149 +371,227 @@ def get_patient_glucose_data(
 @router.get("/{patient_id}/comprehensive_data")
 def get_patient_comprehensive_data(
     patient_id: int, 
+    request: Request,
+    response: Response,
     current_doctor: dict = Depends(get_current_doctor),
     start_datetime: Optional[datetime] = None,
-    end_datetime: Optional[datetime] = None
+    end_datetime: Optional[datetime] = None,
+    resolution: Resolution = "raw",
+    max_points: Optional[int] = Query(None, ge=3),
+    stream: bool = False,
+    binary: bool = False
 ):
     """
     Возвращает полный набор данных (глюкоза, инсулин, углеводы) за период.
-    """
-    # ... (проверка доступа врача остается без изменений) ...
-    con = sqlite3.connect(DB_NAME)
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    # Проверяем, существует ли пациент и принадлежит ли он этому врачу
-    cur.execute("SELECT * FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, current_doctor["id"]))
-    patient_record = cur.fetchone()
+    При resolution != raw точки берутся из агрегатов и дополнительно содержат min/max интервала.
+    max_points прореживает каждую серию независимо (LTTB).
 
-    if not patient_record:
-        con.close()
-        raise HTTPException(status_code=status.HTTP_4_NOT_FOUND, detail="Пациент не найден")
-    
-    if not (start_datetime and end_datetime):
-        end_datetime = datetime.utcnow()
-        start_datetime = end_datetime - timedelta(days=7)
+    При stream=true или Accept: application/x-ndjson ответ отдается потоком NDJSON:
+    первая строка {"resolution": ...}, затем строки {"series": "glucose", "points": [...]}
+    по STREAM_BATCH_SIZE точек, последняя строка {"done": true}.
+    При binary=true или Accept: application/x-glukoze-series - двоичный колоночный формат
+    (app.series_format) с сериями glucose, insulin, carbs; он имеет приоритет над потоком NDJSON.
 
-    cur.execute(
-        """
-        SELECT timestamp, record_type, value FROM timeseries_data 
-        WHERE patient_id = ? AND timestamp BETWEEN ? AND ?
-        ORDER BY timestamp ASC
-        """,
-        (patient_id, start_datetime, end_datetime)
-    )
-    records = cur.fetchall()
-    con.close()
-
-    # Форматируем данные в удобную для Chart.js структуру
-    response_data = {
-        "glucose": [],
-        "insulin": [],
-        "carbs": []
-    }
-    for rec in records:
-        point = {"x": rec["timestamp"], "y": rec["value"]}
-        if rec["record_type"] == 'glucose':
-            response_data["glucose"].append(point)
-        elif 'insulin' in rec["record_type"]:
-            response_data["insulin"].append(point)
-        elif rec["record_type"] == 'carbs':
-            response_data["carbs"].append(point)
+    Поддерживает If-None-Match: ETag - версия временных рядов пациента, окно и формат ответа.
+    Окно по умолчанию - с начала минуты 7 дней назад без верхней границы (как в glucose_data).
 
-    return response_data
+    Соединение берется из пула явно, а не через get_db: зависимость с yield освобождается только
+    после отправки ответа, и поток NDJSON держал бы два соединения - запроса и свое.
+    """
+    if start_datetime and end_datetime:
+        start_epoch, end_epoch = to_epoch(start_datetime), to_epoch(end_datetime)
+    else:
+        start_epoch, end_epoch = _default_window_start(), MAX_EPOCH
+    resolution = choose_resolution(resolution, start_epoch, min(end_epoch, to_epoch(datetime.utcnow())))
+
+    as_binary = _wants_binary(request, binary)
+    as_stream = not as_binary and (stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""))
+
+    with connection() as con:
+        # Проверка доступа врача и версия данных - одним запросом
+        (timeseries_version,) = _patient_versions(con, patient_id, current_doctor["id"], TIMESERIES)
+        etag = make_etag(
+            "comprehensive_data", patient_id, timeseries_version, start_epoch, end_epoch, resolution, max_points,
+            "binary" if as_binary else "ndjson" if as_stream else "json",
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        if as_binary:
+            return _binary_response(resolution, {
+                series: _series_arrays(con, patient_id, series, start_epoch, end_epoch, resolution, max_points)
+                for series in SERIES_RECORD_TYPES
+            }, etag)
+
+        if not as_stream:
+            # Форматируем данные в удобную для Chart.js структуру
+            response_data = {}
+            for series in SERIES_RECORD_TYPES:
+                response_data[series] = [
+                    point
+                    for points in _iter_chart_points(con, patient_id, series, start_epoch, end_epoch, resolution, max_points)
+                    for point in points
+                ]
+            response_data["resolution"] = resolution
+
+            set_etag(response, etag)
+            response.headers["Vary"] = "Accept"
+            return response_data
+
+    # Соединение проверки уже вернулось в пул; поток берет свое ровно на время отдачи
+    def generate():
+        yield json.dumps({"resolution": resolution}) + "\n"
+        with connection() as stream_con:
+            for series in SERIES_RECORD_TYPES:
+                for points in _iter_chart_points(stream_con, patient_id, series, start_epoch, end_epoch, resolution, max_points):
+                    yield json.dumps({"series": series, "points": points}, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True}) + "\n"
+
+    stream_response = StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+    set_etag(stream_response, etag)
+    stream_response.headers["Vary"] = "Accept"
+    return stream_response
+
+def _owns_patient(patient_id: int, doctor_id: int) -> bool:
+    with connection() as con:
+        return con.execute("SELECT 1 FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, doctor_id)).fetchone() is not None
+
+@router.get("/{patient_id}/live")
+async def stream_patient_updates(patient_id: int, current_doctor: dict = Depends(get_current_doctor)):
+    """
+    Поток Server-Sent Events с новыми точками пациента (формат точек - как в comprehensive_data).
+    Клиент загружает окно графика обычным запросом и дальше получает только добавленные точки.
+    """
+    # Соединение из пула берется только на проверку владельца, а не на все время потока
+    if not await run_in_threadpool(_owns_patient, patient_id, current_doctor["id"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
+    if broker.full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Слишком много открытых подписок, повторите попытку позже",
+            headers={"Retry-After": str(RECONNECT_MILLISECONDS // 1000)},
+        )
+    return StreamingResponse(
+        event_stream(patient_id),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        # Прокси не должны буферизовать и кэшировать поток
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{patient_id}/recommendations")
-def get_patient_recommendations(patient_id: int, current_doctor: dict = Depends(get_current_doctor)):
+def get_patient_recommendations(patient_id: int, current_doctor: dict = Depends(get_current_doctor), con: sqlite3.Connection = Depends(get_db)):
     """
     Анализирует данные пациента за последние 30 дней и возвращает рекомендации.
     """
-    con = sqlite3.connect(DB_NAME)
-    con.row_factory = sqlite3.Row
     cur = con.cursor()
 
-    # Проверяем, принадлежит ли пациент врачу
-    cur.execute("SELECT id FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, current_doctor["id"]))
-    if cur.fetchone() is None:
-        con.close()
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
-
-    # Загружаем ВСЕ данные за месяц
-    month_ago = datetime.utcnow() - timedelta(days=30)
+    # Проверяем, принадлежит ли пациент врачу, и одним запросом получаем версии его данных
     cur.execute(
-        "SELECT timestamp, record_type, value FROM timeseries_data WHERE patient_id = ? AND timestamp >= ?",
-        (patient_id, month_ago)
+        """
+        SELECT p.id,
+               (SELECT version FROM data_versions WHERE entity = ? AND entity_id = p.id) AS timeseries_version,
+               (SELECT version FROM data_versions WHERE entity = ? AND entity_id = p.id) AS records_version
+        FROM patients p WHERE p.id = ? AND p.doctor_id = ?
+        """,
+        (TIMESERIES, MEDICAL_RECORDS, patient_id, current_doctor["id"])
     )
+    patient_record = cur.fetchone()
+    if patient_record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
 
-    # Преобразуем строки в словари
-    records = [
-        {
-            "timestamp": datetime.fromisoformat(rec["timestamp"]),
-            "record_type": rec["record_type"],
-            "value": rec["value"]
-        }
-        for rec in cur.fetchall()
-    ]
+    # Загружаем данные за месяц (анализ использует только глюкозу и углеводы)
+    month_ago = to_epoch(datetime.utcnow() - timedelta(days=30))
+    month_ago -= month_ago % RECOMMENDATIONS_WINDOW_ALIGN
+
+    cache_key = (patient_id, patient_record["timeseries_version"], patient_record["records_version"], month_ago)
+    recommendations = recommendations_cache.get(cache_key)
+    if recommendations is None:
+        glucose_ts, glucose_values = read_series(con, patient_id, ("glucose",), month_ago, MAX_EPOCH)
+        carbs_ts, carbs_values = read_series(con, patient_id, ("carbs",), month_ago, MAX_EPOCH)
+
+        # Ряды передаются в движок анализа как есть, без построчных словарей и разбора дат
+        recommendations = analyze_series(glucose_ts, glucose_values, carbs_ts, carbs_values)
+        recommendations_cache.set(cache_key, recommendations)
+    return {"recommendations": list(recommendations)}
+
+@router.get("/{patient_id}/metrics")
+def get_patient_metrics(
+    patient_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_doctor: dict = Depends(get_current_doctor),
+    con: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Метрики НМГ за окно [start, end] (по умолчанию - последние 14 дней): время в диапазонах, среднее,
+    SD, коэффициент вариации, GMI и профиль AGP (перцентили 5/25/50/75/95 по получасам суток).
+    """
+    if con.execute("SELECT 1 FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, current_doctor["id"])).fetchone() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
 
-    con.close()
-    recommendations = analyze_patient_data(records)
-    return {"recommendations": recommendations}
-    con.close()
-    recommendations = analyze_patient_data(records)
-    return {"recommendations": recommendations}
+    end_epoch = to_epoch(end) if end else to_epoch(datetime.utcnow())
+    start_epoch = to_epoch(start) if start else end_epoch - METRICS_DEFAULT_DAYS * 86400
+    if start_epoch > end_epoch:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Начало окна позже его конца")
+
+    return {
+        "patient_id": patient_id,
+        "start": from_epoch(start_epoch).isoformat(),
+        "end": from_epoch(end_epoch).isoformat(),
+        **window_metrics(con, patient_id, start_epoch, end_epoch),
+    }
 
 @router.get("/{patient_id}/parameters")
-def get_patient_parameters(patient_id: int, current_doctor: dict = Depends(get_current_doctor)):
+def get_patient_parameters(patient_id: int, request: Request, response: Response, current_doctor: dict = Depends(get_current_doctor), con: sqlite3.Connection = Depends(get_db)):
     """
     Возвращает расшифрованные параметры симуляции пациента.
+    Поддерживает If-None-Match: при неизменной версии параметров - 304 без расшифровки.
     """
-    con = sqlite3.connect(DB_NAME)
-    con.row_factory = sqlite3.Row
     cur = con.cursor()
 
-    # Проверка доступа
-    cur.execute("SELECT id FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, current_doctor["id"]))
-    if cur.fetchone() is None:
-        con.close()
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
+    # Проверка доступа и версия параметров
+    (parameters_version,) = _patient_versions(con, patient_id, current_doctor["id"], PARAMETERS)
+    etag = make_etag("parameters", patient_id, parameters_version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
 
     cur.execute("SELECT encrypted_parameters FROM patients_parameters WHERE patient_id = ?", (patient_id,))
     record = cur.fetchone()
-    con.close()
 
     if not record:
         return {} # Или ошибка, если параметры обязательны
 
+    # Модули симуляции (numpy, пул перебора) импортируются при первом обращении, а не при старте приложения
+    from app.simulation_cache import decode_cached
     try:
-        decrypted_json_str = decrypt_data(record["encrypted_parameters"])
-        import json
-        return json.loads(decrypted_json_str)
+        return decode_cached(record["encrypted_parameters"])
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Ошибка дешифровки параметров: {str(e)}")
 
 @router.get("/{patient_id}/scenarios", response_model=List[SimulatorScenario])
-def get_simulator_scenarios(patient_id: int, current_doctor: dict = Depends(get_current_doctor)):
+def get_simulator_scenarios(patient_id: int, request: Request, response: Response, current_doctor: dict = Depends(get_current_doctor), con: sqlite3.Connection = Depends(get_db)):
     """
     Возвращает список сценариев симуляции для конкретного пациента.
+    Поддерживает If-None-Match: при неизменной версии сценариев - 304 без расшифровки.
     """
-    con = sqlite3.connect(DB_NAME)
-    con.row_factory = sqlite3.Row
     cur = con.cursor()
 
-    # Проверка доступа
-    cur.execute("SELECT id FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, current_doctor["id"]))
-    if cur.fetchone() is None:
-        con.close()
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
+    # Проверка доступа и версия сценариев
+    (scenarios_version,) = _patient_versions(con, patient_id, current_doctor["id"], SCENARIOS)
+    etag = make_etag("scenarios", patient_id, scenarios_version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
 
     cur.execute("SELECT id, patient_id, encrypted_scenario FROM simulator_scenarios WHERE patient_id = ?", (patient_id,))
     records = cur.fetchall()
-    con.close()
 
+    from app.simulation_cache import decode_cached
     scenarios = []
     for rec in records:
         try:
-            decrypted_str = decrypt_data(rec["encrypted_scenario"])
-            scenario_json = json.loads(decrypted_str)
+            scenario_json = decode_cached(rec["encrypted_scenario"])
             scenarios.append(SimulatorScenario(
                 scenario_id=rec["id"],
                 patient_id=rec["patient_id"],
@@ -333,3 +603,145 @@ def get_simulator_scenarios(patient_id: int, current_doctor: dict = Depends(get_
              continue
     
     return scenarios
+
+
+def _load_simulation_inputs(con: sqlite3.Connection, patient_id: int, scenario_id: Optional[int]):
+    """Расшифрованные параметры модели и сценарий пациента (id сценария, словарь)."""
+    from app.simulation import DEFAULT_SCENARIO
+    from app.simulation_cache import decode_cached
+    record = con.execute(
+        "SELECT encrypted_parameters FROM patients_parameters WHERE patient_id = ?", (patient_id,)
+    ).fetchone()
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Параметры симуляции не найдены")
+
+    if scenario_id is None:
+        scenario_record = con.execute(
+            "SELECT id, encrypted_scenario FROM simulator_scenarios WHERE patient_id = ? ORDER BY id LIMIT 1", (patient_id,)
+        ).fetchone()
+    else:
+        scenario_record = con.execute(
+            "SELECT id, encrypted_scenario FROM simulator_scenarios WHERE id = ? AND patient_id = ?", (scenario_id, patient_id)
+        ).fetchone()
+        if scenario_record is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Сценарий не найден")
+
+    try:
+        parameters = decode_cached(record["encrypted_parameters"])
+        if scenario_record is None:
+            return parameters, None, dict(DEFAULT_SCENARIO)
+        return parameters, scenario_record["id"], decode_cached(scenario_record["encrypted_scenario"])
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Ошибка дешифровки параметров: {str(e)}")
+
+
+def _check_overrides(overrides: dict, names: tuple, what: str):
+    unknown = sorted(set(overrides) - set(names))
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Неизвестные {what}: {', '.join(unknown)}")
+
+
+def _simulation_duration(scenario: dict) -> float:
+    from app.simulation import DEFAULT_SCENARIO
+    return float(scenario.get("t1", DEFAULT_SCENARIO["t1"])) - float(scenario.get("t0", DEFAULT_SCENARIO["t0"]))
+
+
+def _prepare_simulation(con: sqlite3.Connection, patient_id: int, current_doctor: dict, request: SimulationRequest):
+    """Проверка доступа и запроса; базовые параметры и сценарий с заменами из запроса."""
+    from app.simulation import PARAMETER_NAMES, SCENARIO_NAMES
+    if con.execute("SELECT 1 FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, current_doctor["id"])).fetchone() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пациент не найден")
+    _check_overrides(request.parameters, PARAMETER_NAMES, "параметры модели")
+    _check_overrides(request.scenario, SCENARIO_NAMES, "параметры сценария")
+
+    parameters, scenario_id, scenario = _load_simulation_inputs(con, patient_id, request.scenario_id)
+    parameters.update(request.parameters)
+    scenario.update(request.scenario)
+
+    duration = _simulation_duration(scenario)
+    if duration / request.step > MAX_SIMULATION_STEPS or duration / request.output_step > MAX_SIMULATION_STEPS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Слишком много шагов симуляции: увеличьте шаг")
+    return parameters, scenario_id, scenario
+
+
+def _integration_options(request: SimulationRequest) -> dict:
+    return {
+        "method": request.method, "step": request.step, "output_step": request.output_step,
+        "rtol": request.rtol, "atol": request.atol,
+    }
+
+
+@router.post("/{patient_id}/simulate")
+def simulate_patient(
+    patient_id: int,
+    request: SimulationRequest,
+    current_doctor: dict = Depends(get_current_doctor),
+    con: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Симуляция глюкозы по сохраненным параметрам пациента и сценарию на интервале [t0, t1] сценария.
+    parameters / scenario в запросе заменяют отдельные значения. Глюкоза - в ммоль/л, время - в минутах.
+    """
+    from app.simulation import parameter_matrix, scenario_matrix, simulate
+    from app.simulation_cache import cached_run
+
+    parameters, scenario_id, scenario = _prepare_simulation(con, patient_id, current_doctor, request)
+    P, S = parameter_matrix([parameters]), scenario_matrix([scenario])
+    try:
+        times, glucose, stats, cached = cached_run("simulate", simulate, P, S, **_integration_options(request))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {
+        "patient_id": patient_id,
+        "scenario_id": scenario_id,
+        "method": request.method,
+        "t": times.round(3).tolist(),
+        "glucose": glucose[:, 0].round(2).tolist(),
+        "stats": {**stats, "cached": cached},
+    }
+
+
+@router.post("/{patient_id}/simulate/sweep")
+def sweep_patient_simulation(
+    patient_id: int,
+    request: SweepRequest,
+    current_doctor: dict = Depends(get_current_doctor),
+    con: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Перечисление вариантов "что если" для одного пациента: сетка grid и/или список variants
+    поверх сохраненных параметров и сценария. Для каждого варианта - итоговые значения измененных величин
+    и сводка (min/max глюкозы, минуты ниже 3.9 и выше 10 ммоль/л); по всем вариантам - огибающие-перцентили.
+    Вариант с некорректными значениями или расходящимся решением получает "error" вместо сводки
+    и не входит в огибающие; 400 - только если не удался ни один вариант.
+    """
+    from app.simulation_cache import cached_run
+    from app.sweeps import batch_limit, build_variants, run_sweep, summarize
+
+    parameters, scenario_id, scenario = _prepare_simulation(con, patient_id, current_doctor, request)
+    try:
+        P, S, labels = build_variants(
+            parameters, scenario,
+            [variant.model_dump() for variant in request.variants],
+            [axis.model_dump() for axis in request.grid],
+            # Предел вариантов зависит от шагов: ограничивается объем всей пачки, а не одного варианта
+            max_variants=batch_limit(_simulation_duration(scenario), request.step, request.output_step),
+        )
+        times, glucose, stats, cached = cached_run("sweep", run_sweep, P, S, **_integration_options(request))
+        summaries, envelopes = summarize(times, glucose, request.percentiles)
+        errors = dict(stats.get("errors", []))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {
+        "patient_id": patient_id,
+        "scenario_id": scenario_id,
+        "method": request.method,
+        "variants": [
+            {**label, **summary} if summary else {**label, "error": errors[index]}
+            for index, (label, summary) in enumerate(zip(labels, summaries))
+        ],
+        "envelope": {"t": times.round(3).tolist(), **envelopes},
+        "stats": {**{k: v for k, v in stats.items() if k != "errors"}, "failed": len(errors), "cached": cached},
+    }
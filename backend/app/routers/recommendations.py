@@ -1,18 +1,34 @@
 # backend/app/routers/recommendations.py
+from typing import List, Optional
+
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.auth_utils import get_current_doctor
-# Импортируем наш новый локальный парсер
-from app.recommendation_parser import parse_recommendation_text
+# Импортируем наш новый локальный парсер (модель загружается при первом разборе)
+from app.recommendation_parser import (
+    NLP_BATCH_SIZE, NLP_MAX_PROCESSES, parse_recommendation_text, parse_recommendation_texts
+)
 
 router = APIRouter()
 
+# Максимум текстов в одном пакетном запросе
+MAX_BATCH_TEXTS = 1000
+
 class RecommendationText(BaseModel):
     text: str
 
+class RecommendationTextBatch(BaseModel):
+    texts: List[str] = Field(max_length=MAX_BATCH_TEXTS)
+    batch_size: Optional[int] = Field(None, ge=1, le=MAX_BATCH_TEXTS)
+    # Число процессов nlp.pipe; ограничено NLP_MAX_PROCESSES (по умолчанию 1)
+    n_process: Optional[int] = Field(None, ge=1)
+
+# Обработчики синхронные: разбор spaCy нагружает CPU и выполняется в пуле потоков FastAPI,
+# не блокируя цикл событий
+
 @router.post("/interpret")
-async def interpret_recommendation(
+def interpret_recommendation(
     recommendation: RecommendationText,
     current_doctor: dict = Depends(get_current_doctor)
 ):
@@ -24,4 +40,19 @@ async def interpret_recommendation(
         parsed_json = parse_recommendation_text(recommendation.text)
         return parsed_json
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка при парсинге текста: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Ошибка при парсинге текста: {e}")
+
+@router.post("/interpret/batch")
+def interpret_recommendations_batch(
+    batch: RecommendationTextBatch,
+    current_doctor: dict = Depends(get_current_doctor)
+):
+    """
+    Пакетная интерпретация: тексты проходят через nlp.pipe, результаты - в том же порядке.
+    """
+    n_process = min(batch.n_process or 1, NLP_MAX_PROCESSES)
+    try:
+        results = parse_recommendation_texts(batch.texts, batch_size=batch.batch_size or NLP_BATCH_SIZE, n_process=n_process)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при парсинге текста: {e}")
+    return {"results": results}
@@ -0,0 +1,69 @@
+# backend/app/series_format.py
+"""
+Компактный двоичный колоночный формат серий графика (ответ на Accept: application/x-glukoze-series).
+
+Массивы пишутся напрямую из массивов NumPy, без объектов Python на каждую точку;
+клиент читает их как типизированные массивы без разбора. Все числа - little-endian.
+
+    Заголовок, 16 байт             <4s B B 2x 4s 4x>
+        магия b"GTSB", версия формата, число серий n,
+        разрешение ASCII ("raw", "15m", "1h", "1d"), дополненное нулями до 4 байт
+    Описатели серий, n x 16 байт   <8s I B 3x>
+        имя серии ASCII, дополненное нулями до 8 байт, число точек count,
+        флаги (бит 0 - после значений идут min и max интервала агрегата)
+    Данные серий подряд, в порядке описателей:
+        отметки времени  count x int64   - epoch-миллисекунды UTC
+        значения         count x float32
+        min, max         count x float32 каждое (только с флагом FLAG_MIN_MAX)
+        нули до границы 8 байт
+
+Каждый массив int64 начинается со смещения, кратного 8, а float32 - кратного 4,
+так что в браузере массивы открываются как BigInt64Array / Int32Array / Float32Array над тем же буфером.
+"""
+import struct
+
+import numpy as np
+
+SERIES_MEDIA_TYPE = "application/x-glukoze-series"
+MAGIC = b"GTSB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBB2x4s4x")
+DESCRIPTOR = struct.Struct("<8sIB3x")
+FLAG_MIN_MAX = 1
+
+
+def encode_series(resolution: str, series: dict) -> bytes:
+    """
+    series - {имя: (отметки epoch-секунды, значения[, min, max])} в порядке вывода.
+    Возвращает тело ответа в формате GTSB.
+    """
+    header = [HEADER.pack(MAGIC, FORMAT_VERSION, len(series), resolution.encode("ascii"))]
+    body = []
+    for name, (timestamps, values, *extra) in series.items():
+        count = len(timestamps)
+        header.append(DESCRIPTOR.pack(name.encode("ascii"), count, FLAG_MIN_MAX if extra else 0))
+        body.append((np.asarray(timestamps, dtype="<i8") * 1000).tobytes())
+        for array in (values, *extra):
+            body.append(np.asarray(array, dtype="<f4").tobytes())
+        body.append(b"\0" * (-4 * count * (1 + len(extra)) % 8))
+    return b"".join(header + body)
+
+
+def decode_series(payload: bytes):
+    """Обратное преобразование (для проверок и клиентов на Python): (разрешение, {имя: (мс int64, значения, ...)})."""
+    magic, version, count, resolution = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Неизвестный формат серий: {magic!r} версии {version}")
+    descriptors = [DESCRIPTOR.unpack_from(payload, HEADER.size + i * DESCRIPTOR.size) for i in range(count)]
+    offset = HEADER.size + count * DESCRIPTOR.size
+    series = {}
+    for name, points, flags in descriptors:
+        timestamps = np.frombuffer(payload, dtype="<i8", count=points, offset=offset)
+        offset += 8 * points
+        arrays = [timestamps]
+        for _ in range(3 if flags & FLAG_MIN_MAX else 1):
+            arrays.append(np.frombuffer(payload, dtype="<f4", count=points, offset=offset))
+            offset += 4 * points
+        offset += -offset % 8
+        series[name.rstrip(b"\0").decode("ascii")] = tuple(arrays)
+    return resolution.rstrip(b"\0").decode("ascii"), series
@@ -0,0 +1,446 @@
+# backend/app/simulation.py
+"""
+Симуляция глюкозы и инсулина по параметрам пациента (patients_parameters) и сценарию (simulator_scenarios).
+
+Модель - компартментная, в духе симулятора UVA/Padova (время в минутах):
+  * желудок и кишечник: fsol -> fliq -> fgut, скорость опорожнения kempt зависит от наполнения желудка
+    (kmin..kmax), всасывание kgabs, доля всосавшейся глюкозы delth_g;
+  * подкожный инсулин: Ii -> It (k1abs, k2abs, пмоль), плазма и печень: Ip, Il (ki1, ki2, ki3, di, пмоль/кг),
+    концентрация в плазме Ip / Vi (пмоль/л), отложенное действие Xt (kres) относительно базального ib;
+  * глюкоза: плазма g и ткани gt (мг/дл), обмен k1gg / k2gg, потребление мозгом ucns,
+    инсулинозависимое потребление тканями (vidb + vid * ksen * Xt) * Gt / (Kidb + Gt),
+    почечная экскреция k1e * (g - k2e) выше порога k2e;
+  * глюкагон Hp (dh) и его секреция SRsh, растущая при g ниже порога gth (ks);
+  * продукция глюкозы печенью EGP: базальная (баланс в начальном состоянии), подавляется глюкозой
+    и инсулином, усиливается глюкагоном.
+Начальное состояние - параметры с суффиксом 0 (g0, Ip0, ...). Параметры печеночного гликогена
+и ферментов (yg0, Pha10, PCa0, kh1..kh6, ...) хранятся и передаются, но в правых частях пока не участвуют.
+
+Сценарий: прием M граммов углеводов в момент tm длительностью Tm, базальная скорость Vbas (ЕД/ч)
+и два болюса Dbol_1 / Dbol_2 (ЕД) в моменты ti_1 / ti_2 длительностью Ti_1 / Ti_2, интервал [t0, t1].
+
+Параметры и состояние - массивы NumPy формы (число параметров, B) и (число состояний, B):
+правая часть вычисляется сразу для B наборов параметров без словарей и циклов Python.
+Интеграторы: RK4 с постоянным шагом и адаптивный Дорманд - Принс 5(4).
+"""
+import numpy as np
+
+# Параметры модели по умолчанию; недостающие в сохраненном наборе параметры берутся отсюда
+DEFAULT_PARAMETERS = {
+    "mt": 79.7963,
+    "Vi": 0.05,
+    "ki1": 0.19,
+    "ki2": 0.27,
+    "ki3": 0.3484,
+    "kgabs": 0.057,
+    "kgri": 0.056,
+    "kmin": 0.008,
+    "kmax": 0.056,
+    "k1gg": 0.065,
+    "k2gg": 0.079,
+    "ucns": 0.35,
+    "vidb": 1.0,
+    "kres": 0.0731,
+    "k1e": 0.05,
+    "k2e": 188.333,
+    "k1abs": 0.0297,
+    "k2abs": 0.0113,
+    "ks": 0.2,
+    "kd": 1.0,
+    "ksen": 1.0,
+    "lbh": 5.0,
+    "gth": 199.08,
+    "kh1": 0.001,
+    "kh2": 0.001,
+    "kh3": 0.001,
+    "kh4": 0.001,
+    "k1gl": 0.02,
+    "k2gl": 0.1,
+    "kh5": 0.001,
+    "kh6": 0.001,
+    "k1gng": 0.0084,
+    "k2gng": 0.0048,
+    "kKc": 0.0035,
+    "ib": 104.08,
+    "gb": 199.08,
+    "g0": 210.24,
+    "Il0": 2.61,
+    "Ip0": 5.2045,
+    "fgut0": 0.0,
+    "fliq0": 0.0,
+    "fsol0": 0.0,
+    "gt0": 210.0,
+    "Xt0": 0.0,
+    "Ii0": 4120.5,
+    "It0": 10830.0,
+    "Hp0": 50.2757,
+    "SRsh0": 5.0276,
+    "gl0": 210.0,
+    "Phn10": 0.4932,
+    "Pha10": 9.5018,
+    "Phn20": 5.7039,
+    "Pha20": 0.2961,
+    "yg0": 20000.0,
+    "PCa0": 0.9887,
+    "PCn0": 0.0513,
+    "pyr0": 0.0,
+    "Er0": 10.0,
+    "Er10": 10.0,
+    "kret": 0.13,
+    "kdec": 0.68,
+    "delth_g": 0.9,
+    "vid": 0.087,
+    "Kidb": 205.59,
+    "vgg": 0.5,
+    "vgl": 0.25,
+    "Kgl": 75,
+    "Kgn": 432,
+    "Ki": 2.5,
+    "vgng": 2,
+    "Kgng": 0.5,
+    "k1i": 0.19,
+    "k2i": 0.27,
+    "k3i": 0.3484,
+    "di": 0.12,
+    "dh": 0.1
+}
+
+# Сценарий по умолчанию. Di = OB * M * kbol - суммарная доза, Dbol_1 = kw * Di, Dbol_2 = (1 - kw) * Di;
+# симулятор использует уже рассчитанные Dbol_1, Dbol_2
+DEFAULT_SCENARIO = {
+    "M": 90.0,
+    "tm": 60.0,
+    "Tm": 20.0,
+    "kbol": 1.4,
+    "kw": 0.4,
+    "t0": 0,
+    "t1": 720,
+    "ti_1": 30.0,
+    "ti_2": 60.0,
+    "Ti_1": 10.0,
+    "Ti_2": 10.0,
+    "OB": 0.05263157894736842,
+    "Di": 6.63157894736842,
+    "Dbol_1": 2.6526315789473682,
+    "Dbol_2": 3.978947368421052,
+    "Vbas": 1.2237
+}
+
+# Версия движка входит в ключ кэша траекторий: увеличивается при любом изменении модели или интеграторов
+ENGINE_VERSION = 1
+
+PARAMETER_NAMES = tuple(DEFAULT_PARAMETERS)
+SCENARIO_NAMES = tuple(DEFAULT_SCENARIO)
+STATE_NAMES = ("fsol", "fliq", "fgut", "Ii", "It", "Ip", "Il", "Xt", "g", "gt", "Hp", "SRsh")
+GLUCOSE_STATE = STATE_NAMES.index("g")
+
+# Константы, которых нет среди параметров пациента (средние значения для взрослых из UVA/Padova)
+GLUCOSE_VOLUME = 1.88        # Объем распределения глюкозы в плазме, дл/кг
+EMPTYING_B = 0.82            # Доля дозы, при которой опорожнение желудка начинает замедляться
+EMPTYING_C = 0.01            # ... и при которой возвращается к максимальному
+EGP_GLUCOSE_EFFECT = 0.0021  # Подавление EGP глюкозой, 1/мин
+EGP_INSULIN_EFFECT = 0.009   # Подавление EGP инсулином, мг/кг/мин на пмоль/л
+EGP_GLUCAGON_EFFECT = 0.01   # Усиление EGP глюкагоном, мг/кг/мин на нг/л
+GLUCAGON_SENSITIVITY = 0.01  # Прирост секреции глюкагона на мг/дл ниже gth, нг/л/мин
+
+PMOL_PER_UNIT = 6000.0       # 1 ЕД инсулина = 6000 пмоль
+MG_DL_PER_MMOL_L = 18.0      # Пересчет глюкозы мг/дл -> ммоль/л (единицы рядов в базе)
+
+METHODS = ("rk4", "adaptive")
+
+# Объемы и константы скоростей: на них делится правая часть, ноль или отрицательное значение
+# дают бесконечности или неустойчивую систему
+POSITIVE_PARAMETERS = (
+    "mt", "Vi", "Kidb", "ki1", "ki2", "ki3", "di", "kgri", "kgabs", "kmin", "kmax",
+    "k1gg", "k2gg", "kres", "k1abs", "k2abs", "k1e", "ks", "dh",
+)
+_POSITIVE_ROWS = [PARAMETER_NAMES.index(name) for name in POSITIVE_PARAMETERS]
+
+# Бюджет адаптивного метода: попытки шага (принятые и отклоненные) и минимальный шаг, минуты.
+# Без них жесткая или испорченная система дробит шаг бесконечно, и запрос не завершается
+MAX_ADAPTIVE_ATTEMPTS = 100000
+MIN_ADAPTIVE_STEP = 1e-6
+
+# Коэффициенты Дорманда - Принса 5(4)
+DP_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+# Разность весов решений 5-го и 4-го порядка - оценка локальной ошибки
+DP_E = (71 / 57600, 0.0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+
+
+def _matrix(values: list, names: tuple, defaults: dict) -> np.ndarray:
+    """Список словарей -> массив (len(names), len(values)); отсутствующие ключи берутся из defaults."""
+    return np.array([[float(v.get(name, defaults[name])) for v in values] for name in names], dtype=np.float64)
+
+
+def parameter_matrix(parameter_sets: list) -> np.ndarray:
+    return _matrix(parameter_sets, PARAMETER_NAMES, DEFAULT_PARAMETERS)
+
+
+def scenario_matrix(scenarios: list) -> np.ndarray:
+    return _matrix(scenarios, SCENARIO_NAMES, DEFAULT_SCENARIO)
+
+
+def input_problems(P: np.ndarray, S: np.ndarray) -> list:
+    """
+    Проверка наборов P (n_params, B) и S (n_scenario, B): для каждого набора - описание
+    первой найденной ошибки или None. Все значения должны быть конечными, объемы и константы скоростей - положительными.
+    """
+    problems = [None] * P.shape[1]
+    checks = (
+        (~np.isfinite(P), PARAMETER_NAMES, "Параметр модели {} должен быть конечным числом"),
+        (~np.isfinite(S), SCENARIO_NAMES, "Параметр сценария {} должен быть конечным числом"),
+        (P[_POSITIVE_ROWS] <= 0, POSITIVE_PARAMETERS, "Параметр модели {} должен быть положительным"),
+    )
+    for bad, names, message in checks:
+        for row, column in zip(*np.nonzero(bad)):
+            if problems[column] is None:
+                problems[column] = message.format(names[row])
+    return problems
+
+
+def _check_finite(y: np.ndarray, t: float):
+    if not np.isfinite(y).all():
+        raise ValueError(f"Решение расходится (t = {t:g} мин): проверьте параметры модели")
+
+
+def initial_state(P: np.ndarray) -> np.ndarray:
+    index = {name: i for i, name in enumerate(PARAMETER_NAMES)}
+    return np.array([P[index[name + "0"]] for name in STATE_NAMES])
+
+
+def make_rhs(P: np.ndarray, S: np.ndarray):
+    """
+    Правая часть для B наборов параметров P (n_params, B) и сценариев S (n_scenario, B).
+    Возвращает (rhs(y, meal, insulin) -> dy/dt, inputs(times) -> (meal, insulin)):
+    входы кусочно-постоянны и считаются интегратором заранее для всех нужных моментов.
+    Все величины, не зависящие от состояния, вычисляются здесь один раз.
+    """
+    p = dict(zip(PARAMETER_NAMES, P))
+    s = dict(zip(SCENARIO_NAMES, S))
+
+    mt, Vi, ib = p["mt"], p["Vi"], p["ib"]
+    ki1, ki2, ki3, di = p["ki1"], p["ki2"], p["ki3"], p["di"]
+    k1abs, k2abs, kres = p["k1abs"], p["k2abs"], p["kres"]
+    kgri, kgabs, kmin = p["kgri"], p["kgabs"], p["kmin"]
+    k1gg, k2gg, ucns = p["k1gg"], p["k2gg"], p["ucns"]
+    vidb, vid_sen, Kidb = p["vidb"], p["vid"] * p["ksen"], p["Kidb"]
+    k1e, k2e, gth, dh, ks = p["k1e"], p["k2e"], p["gth"], p["dh"], p["ks"]
+    half_range = (p["kmax"] - kmin) / 2
+    absorbed = p["delth_g"] * kgabs / mt
+    insulin_appearance = k2abs / mt
+    insulin_effect = EGP_INSULIN_EFFECT * p["ksen"]
+    # Ткани обмениваются с плазмой по разности концентраций: k1gg * VG = k2gg * VT
+    tissue_volume = GLUCOSE_VOLUME * k1gg / k2gg
+
+    # Прием пищи (мг глюкозы) и введение инсулина (пмоль) - кусочно-постоянные входы
+    dose = s["M"] * 1000.0
+    tm, meal_end = s["tm"], s["tm"] + np.maximum(s["Tm"], 1.0)
+    meal_rate = dose / np.maximum(s["Tm"], 1.0)
+    safe_dose = np.maximum(dose, 1.0)
+    alpha = 5 / (2 * safe_dose * (1 - EMPTYING_B))
+    beta = 5 / (2 * safe_dose * EMPTYING_C)
+    b_dose, c_dose = EMPTYING_B * safe_dose, EMPTYING_C * safe_dose
+    basal = s["Vbas"] * PMOL_PER_UNIT / 60
+    boluses = [
+        (s[f"ti_{k}"], s[f"ti_{k}"] + np.maximum(s[f"Ti_{k}"], 1.0),
+         s[f"Dbol_{k}"] * PMOL_PER_UNIT / np.maximum(s[f"Ti_{k}"], 1.0))
+        for k in (1, 2)
+    ]
+
+    def tissue_uptake(gt, Xt):
+        Gt = tissue_volume * gt
+        return np.maximum(vidb + vid_sen * Xt, 0.0) * Gt / (Kidb + Gt)
+
+    def excretion(g):
+        return k1e * np.maximum(g - k2e, 0.0)
+
+    # Базальная продукция глюкозы уравновешивает потребление в начальном состоянии
+    g0, gt0, Xt0 = p["g0"], p["gt0"], p["Xt0"]
+    Hb, SRHb, I0 = p["Hp0"], p["SRsh0"], p["Ip0"] / Vi
+    egp_basal = ucns + excretion(g0) + tissue_uptake(gt0, Xt0)
+
+    def inputs(times: np.ndarray):
+        """Скорости поступления глюкозы с едой (мг/мин) и инсулина (пмоль/мин) в моменты times."""
+        t = times[:, None] if np.ndim(tm) else times
+        meal = np.where((t >= tm) & (t < meal_end), meal_rate, 0.0)
+        insulin = basal + np.zeros_like(meal)
+        for start, end, rate in boluses:
+            insulin = insulin + np.where((t >= start) & (t < end), rate, 0.0)
+        return meal, insulin
+
+    def rhs(y: np.ndarray, meal, insulin) -> np.ndarray:
+        fsol, fliq, fgut, Ii, It, Ip, Il, Xt, g, gt, Hp, SRsh = y
+
+        qsto = fsol + fliq
+        kempt = kmin + half_range * (np.tanh(alpha * (qsto - b_dose)) - np.tanh(beta * (qsto - c_dose)) + 2.0)
+        d_fsol = meal - kgri * fsol
+        d_fliq = kgri * fsol - kempt * fliq
+        d_fgut = kempt * fliq - kgabs * fgut
+        ra = absorbed * fgut
+
+        d_Ii = insulin - k1abs * Ii
+        d_It = k1abs * Ii - k2abs * It
+        d_Ip = insulin_appearance * It + ki1 * Il - (ki2 + di) * Ip
+        d_Il = ki2 * Ip - (ki1 + ki3) * Il
+        plasma_insulin = Ip / Vi
+        d_Xt = kres * (plasma_insulin - ib - Xt)
+
+        egp = np.maximum(
+            egp_basal
+            - EGP_GLUCOSE_EFFECT * GLUCOSE_VOLUME * (g - g0)
+            - insulin_effect * (plasma_insulin - I0)
+            + EGP_GLUCAGON_EFFECT * (Hp - Hb),
+            0.0,
+        )
+        exchange = g - gt
+        d_g = (egp + ra - ucns - excretion(g)) / GLUCOSE_VOLUME - k1gg * exchange
+        d_gt = k2gg * exchange - tissue_uptake(gt, Xt) / tissue_volume
+
+        d_Hp = SRsh - dh * Hp
+        d_SRsh = -ks * (SRsh - np.maximum(SRHb + GLUCAGON_SENSITIVITY * (gth - g), 0.0))
+
+        return np.array([d_fsol, d_fliq, d_fgut, d_Ii, d_It, d_Ip, d_Il, d_Xt, d_g, d_gt, d_Hp, d_SRsh])
+
+    return rhs, inputs
+
+
+def breakpoints(S: np.ndarray) -> np.ndarray:
+    """Моменты включения и выключения входов (еда, болюсы) всех сценариев пачки."""
+    s = dict(zip(SCENARIO_NAMES, S))
+    points = [s["tm"], s["tm"] + np.maximum(s["Tm"], 1.0)]
+    for k in (1, 2):
+        points += [s[f"ti_{k}"], s[f"ti_{k}"] + np.maximum(s[f"Ti_{k}"], 1.0)]
+    return np.unique(np.hstack(points))
+
+
+def _output_times(t0: float, t1: float, output_step: float) -> np.ndarray:
+    return np.append(np.arange(t0, t1 - 1e-9, output_step), t1)
+
+
+def _rk4(rhs, inputs, y, outputs: np.ndarray, step: float):
+    # Каждый интервал между моментами вывода делится на равные шаги не длиннее step
+    lengths = np.diff(outputs)
+    counts = np.maximum(np.ceil(lengths / step - 1e-6), 1).astype(np.int64)
+    h_steps = np.repeat(lengths / counts, counts)
+    first_step = np.repeat(np.cumsum(counts) - counts, counts)
+    starts = np.repeat(outputs[:-1], counts) + (np.arange(len(h_steps)) - first_step) * h_steps
+    # Входы во всех узлах и серединах шагов считаются одним векторным вызовом
+    meal, insulin = inputs(np.concatenate([starts, starts + h_steps / 2, starts + h_steps]))
+    n = len(h_steps)
+    is_output = np.zeros(n, dtype=bool)
+    is_output[np.cumsum(counts) - 1] = True
+
+    glucose = [y[GLUCOSE_STATE].copy()]
+    for i, (h, output) in enumerate(zip(h_steps.tolist(), is_output.tolist())):
+        start, mid, end = i, n + i, 2 * n + i
+        k1 = rhs(y, meal[start], insulin[start])
+        k2 = rhs(y + (h / 2) * k1, meal[mid], insulin[mid])
+        k3 = rhs(y + (h / 2) * k2, meal[mid], insulin[mid])
+        k4 = rhs(y + h * k3, meal[end], insulin[end])
+        y = y + (h / 6) * (k1 + 2 * k2 + 2 * k3 + k4)
+        if output:
+            # NaN и бесконечности не исчезают на следующих шагах, поэтому достаточно проверять моменты вывода
+            _check_finite(y, starts[i] + h)
+            glucose.append(y[GLUCOSE_STATE].copy())
+    return glucose, {"steps": n, "rejected": 0, "rhs_evaluations": 4 * n}
+
+
+def _dormand_prince(rhs, inputs, y, outputs: np.ndarray, step: float, rtol: float, atol: float, stops: np.ndarray):
+    # Шаги не перешагивают моменты вывода и разрывы входов: между ними входы постоянны, правая часть гладкая
+    t0, t1 = outputs[0], outputs[-1]
+    targets = np.union1d(outputs[1:], stops[(stops > t0) & (stops < t1)])
+    output_set = set(outputs.tolist())
+    starts = np.r_[t0, targets[:-1]]
+    meal, insulin = inputs((starts + targets) / 2)
+
+    glucose = [y[GLUCOSE_STATE].copy()]
+    t, h = float(t0), step
+    steps = rejected = evaluations = 0
+    f = None
+    for segment, target in enumerate(targets.tolist()):
+        u = (meal[segment], insulin[segment])
+        # Правая часть разрывна на границе сегмента, поэтому FSAL-значение прошлого сегмента не годится
+        f = rhs(y, *u)
+        evaluations += 1
+        while t < target:
+            if steps + rejected >= MAX_ADAPTIVE_ATTEMPTS:
+                raise ValueError(
+                    f"Адаптивный метод не уложился в {MAX_ADAPTIVE_ATTEMPTS} шагов (t = {t:g} мин): "
+                    "ослабьте допуски или используйте rk4"
+                )
+            h = min(h, target - t)
+            k = [f]
+            for a in DP_A[1:]:
+                y_stage = y + h * sum(coef * ki for coef, ki in zip(a, k) if coef)
+                k.append(rhs(y_stage, *u))
+            evaluations += 6
+            y_new = y_stage  # последняя стадия - решение 5-го порядка (FSAL)
+            error = h * sum(coef * ki for coef, ki in zip(DP_E, k) if coef)
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+            # Общий шаг для всей пачки - по худшему набору параметров
+            norm = float(np.max(np.sqrt(np.mean((error / scale) ** 2, axis=0))))
+            if not np.isfinite(norm):
+                _check_finite(y_new, t + h)
+                raise ValueError(f"Оценка ошибки не является конечным числом (t = {t:g} мин): проверьте параметры модели")
+            if norm <= 1.0:
+                t = target if target - (t + h) < 1e-9 else t + h
+                y, f = y_new, k[-1]
+                steps += 1
+                h *= min(5.0, 0.9 * norm ** -0.2) if norm > 0 else 5.0
+            else:
+                rejected += 1
+                h *= max(0.2, 0.9 * norm ** -0.2)
+                if h < MIN_ADAPTIVE_STEP:
+                    raise ValueError(f"Шаг адаптивного метода стал меньше {MIN_ADAPTIVE_STEP:g} мин (t = {t:g} мин): система слишком жесткая")
+        if target in output_set:
+            glucose.append(y[GLUCOSE_STATE].copy())
+    return glucose, {"steps": steps, "rejected": rejected, "rhs_evaluations": evaluations}
+
+
+def simulate(P: np.ndarray, S: np.ndarray, method: str = "rk4", step: float = 1.0, output_step: float = 5.0,
+             rtol: float = 1e-4, atol: float = 1e-6):
+    """
+    Интегрирует модель на [t0, t1] сценария для B наборов (P: (n_params, B), S: (n_scenario, B)).
+    t0 и t1 должны совпадать у всех сценариев пачки.
+    Глюкоза возвращается в моменты t0, t0 + output_step, ..., t1.
+    method: "rk4" - постоянный шаг не длиннее step; "adaptive" - Дорманд - Принс с начальным шагом step и допусками rtol/atol.
+    Возвращает (моменты времени (T,), глюкоза в ммоль/л (T, B), статистика интегрирования).
+    Некорректные входы (input_problems), расходящееся решение и исчерпанный бюджет адаптивного метода - ValueError.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Неизвестный метод: {method}")
+    problem = next((problem for problem in input_problems(P, S) if problem), None)
+    if problem:
+        raise ValueError(problem)
+    t0s, t1s = S[SCENARIO_NAMES.index("t0")], S[SCENARIO_NAMES.index("t1")]
+    if np.ptp(t0s) or np.ptp(t1s):
+        raise ValueError("Интервал [t0, t1] должен совпадать у всех сценариев")
+    t0, t1 = float(t0s[0]), float(t1s[0])
+    if t1 <= t0:
+        raise ValueError("t1 должно быть больше t0")
+    if step <= 0 or output_step <= 0:
+        raise ValueError("Шаг интегрирования и шаг вывода должны быть положительными")
+
+    batch = P.shape[1]
+    if batch == 1:
+        # Один набор: строки параметров - скаляры NumPy, арифметика над ними в разы дешевле, чем над массивами из одного элемента
+        P, S = P[:, 0], S[:, 0]
+    rhs, inputs = make_rhs(P, S)
+    y = initial_state(P)
+    times = _output_times(t0, t1, output_step)
+    # Переполнение проверяется явно (_check_finite), предупреждения NumPy не нужны
+    with np.errstate(over="ignore", invalid="ignore"):
+        if method == "rk4":
+            glucose, stats = _rk4(rhs, inputs, y, times, step)
+        else:
+            glucose, stats = _dormand_prince(rhs, inputs, y, times, step, rtol, atol, breakpoints(S))
+    glucose = np.array(glucose).reshape(len(times), batch)
+    return times, glucose / MG_DL_PER_MMOL_L, stats
@@ -0,0 +1,160 @@
+# backend/app/simulation_cache.py
+"""
+Кэш симуляций с адресацией по содержимому.
+
+  * Расшифрованные параметры и сценарии (decode_cached): ключ - SHA-256 зашифрованного блоба.
+    Fernet шифрует со случайным IV, поэтому любая запись параметров или сценария дает новый блоб
+    и новый ключ; старая запись больше не запрашивается и уходит из кэша по LRU / TTL.
+  * Траектории (cached_run): ключ - SHA-256 от (версия движка, вид расчета, векторы параметров
+    и сценариев после всех замен, настройки решателя). Изменение параметров, сценария, настроек
+    или движка дает другой ключ, так что отдельная инвалидация при записи не нужна.
+    Уровни: память - LRU, ограниченный числом записей и суммарным размером массивов;
+    диск (необязательно, SIMULATION_CACHE_DIR) - сжатые .npz, переживают перезапуск.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+
+import numpy as np
+
+from app.cache_utils import CACHES, LRUCache
+from app.config import (
+    DECRYPT_CACHE_TTL,
+    SIMULATION_CACHE_DIR,
+    SIMULATION_CACHE_DISK_MAX_FILES,
+    SIMULATION_CACHE_MAX_BYTES,
+    SIMULATION_CACHE_SIZE,
+    SIMULATION_INPUTS_CACHE_SIZE,
+)
+from app.encryption_utils import decrypt_data
+from app.simulation import ENGINE_VERSION
+
+# Как часто (в записях) проверять число файлов дискового уровня
+DISK_PRUNE_EVERY = 500
+
+inputs_cache = LRUCache("simulation_inputs", maxsize=SIMULATION_INPUTS_CACHE_SIZE, ttl=DECRYPT_CACHE_TTL)
+
+
+def decode_cached(encrypted: str) -> dict:
+    """Расшифрованный JSON параметров или сценария. Возвращается новая копия - ее можно изменять."""
+    key = hashlib.sha256(encrypted.encode("utf-8")).hexdigest()
+    decoded = inputs_cache.get(key)
+    if decoded is None:
+        decoded = json.loads(decrypt_data(encrypted))
+        inputs_cache.set(key, decoded)
+    return dict(decoded)
+
+
+def simulation_key(kind: str, P: np.ndarray, S: np.ndarray, options: dict) -> str:
+    digest = hashlib.sha256(f"{ENGINE_VERSION}:{kind}:{P.shape}:{S.shape}".encode("utf-8"))
+    digest.update(np.ascontiguousarray(P, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(S, dtype=np.float64).tobytes())
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _result_bytes(result) -> int:
+    times, glucose, _ = result
+    return times.nbytes + glucose.nbytes
+
+
+class SimulationCache:
+    def __init__(self, name: str, maxsize: int = SIMULATION_CACHE_SIZE, maxbytes: int = SIMULATION_CACHE_MAX_BYTES,
+                 disk_dir: str = SIMULATION_CACHE_DIR, disk_max_files: int = SIMULATION_CACHE_DISK_MAX_FILES):
+        self.memory = LRUCache(name, maxsize, weigher=_result_bytes, maxweight=maxbytes)
+        self.disk_dir = disk_dir
+        self.disk_max_files = disk_max_files
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._writes = 0
+        self._disk_lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            CACHES[f"{name}_disk"] = self
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npz")
+
+    def get(self, key: str):
+        """(моменты времени, глюкоза, статистика) или None. Массивы только для чтения."""
+        result = self.memory.get(key)
+        if result is not None or not self.disk_dir:
+            return result
+        try:
+            with np.load(self._path(key)) as archive:
+                result = _freeze(archive["times"], archive["glucose"], json.loads(str(archive["stats"])))
+        except (OSError, KeyError, ValueError):
+            # Нет файла или он поврежден (например, запись прервалась) - считаем промахом
+            self.disk_misses += 1
+            return None
+        self.disk_hits += 1
+        self.memory.set(key, result)
+        return result
+
+    def set(self, key: str, times: np.ndarray, glucose: np.ndarray, stats: dict):
+        result = _freeze(times, glucose, stats)
+        self.memory.set(key, result)
+        if self.disk_dir:
+            self._write_disk(key, result)
+        return result
+
+    def _write_disk(self, key: str, result):
+        times, glucose, stats = result
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, times=times, glucose=glucose, stats=np.array(json.dumps(stats)))
+        path = self._path(key)
+        # Запись во временный файл и атомарная замена: читатель не увидит недописанный архив
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temporary, path)
+        with self._disk_lock:
+            self._writes += 1
+            if self._writes % DISK_PRUNE_EVERY == 0:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        # Сверх лимита удаляются самые давно записанные траектории
+        entries = [entry for entry in os.scandir(self.disk_dir) if entry.name.endswith(".npz")]
+        if len(entries) <= self.disk_max_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.disk_max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.disk_hits + self.disk_misses
+        return {
+            "hits": self.disk_hits,
+            "misses": self.disk_misses,
+            "hit_ratio": round(self.disk_hits / lookups, 4) if lookups else None,
+        }
+
+
+def _freeze(times: np.ndarray, glucose: np.ndarray, stats: dict):
+    # Массивы из кэша разделяются между запросами - запрещаем их изменение
+    times, glucose = np.array(times), np.array(glucose)
+    times.flags.writeable = False
+    glucose.flags.writeable = False
+    return times, glucose, stats
+
+
+simulation_cache = SimulationCache("simulations")
+
+
+def cached_run(kind: str, runner, P: np.ndarray, S: np.ndarray, **options):
+    """
+    runner(P, S, **options) -> (times, glucose, stats) через кэш траекторий.
+    Возвращает (times, glucose, stats, взят ли результат из кэша).
+    """
+    key = simulation_key(kind, P, S, options)
+    cached = simulation_cache.get(key)
+    if cached is not None:
+        return (*cached, True)
+    times, glucose, stats = runner(P, S, **options)
+    return (*simulation_cache.set(key, times, glucose, stats), False)
@@ -0,0 +1,242 @@
+# backend/app/sweeps.py
+"""
+Перечисление вариантов симуляции ("что если"): сетка и/или список замен параметров модели и сценария.
+
+Варианты собираются в матрицы (n_params, B) и (n_scenario, B) и интегрируются одной векторной пачкой
+(app.simulation.simulate). Если вариантов больше SWEEP_POOL_THRESHOLD и SWEEP_WORKERS > 1, пачка делится
+на части между процессами ProcessPoolExecutor (правая часть нагружает CPU и держит GIL).
+
+Оси сетки задают для одного имени ровно одно из:
+  values - абсолютные значения, scale - множители к базовому значению (0.9 = -10 %),
+  shift - прибавки к базовому значению (например, сдвиг болюса ti_1 на 15 минут).
+
+Неудачный вариант (некорректные значения - simulation.input_problems, расходящееся решение) не отменяет
+перечисление: он получает описание ошибки, а остальные варианты считаются. Шаг интегрирования общий для пачки,
+поэтому пачка с расходящимся вариантом делится пополам, пока ошибка не сведется к отдельным вариантам.
+"""
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.config import (
+    SWEEP_MAX_OUTPUT_VALUES, SWEEP_MAX_STEP_VALUES, SWEEP_MAX_VARIANTS, SWEEP_POOL_THRESHOLD, SWEEP_WORKERS,
+)
+from app.simulation import PARAMETER_NAMES, SCENARIO_NAMES, input_problems, parameter_matrix, scenario_matrix, simulate
+
+# Пороги сводки по вариантам, ммоль/л
+LOW_GLUCOSE = 3.9
+HIGH_GLUCOSE = 10.0
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+# Оси сетки не могут менять интервал: все варианты пачки интегрируются на общей сетке времени
+FIXED_NAMES = ("t0", "t1")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, а не fork: процесс сервера многопоточный (пул соединений, писатель, bcrypt)
+            _pool = ProcessPoolExecutor(max_workers=SWEEP_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _axis_values(axis: dict) -> tuple:
+    given = [mode for mode in ("values", "scale", "shift") if axis.get(mode) is not None]
+    if len(given) != 1:
+        raise ValueError(f"Для оси '{axis['name']}' нужно задать ровно одно из: values, scale, shift")
+    values = axis[given[0]]
+    if not values:
+        raise ValueError(f"Ось '{axis['name']}' не содержит значений")
+    return given[0], np.asarray(values, dtype=np.float64)
+
+
+def batch_limit(duration: float, step: float, output_step: float) -> int:
+    """
+    Наибольшее число вариантов пачки на интервале duration минут: не больше SWEEP_MAX_VARIANTS
+    и в пределах бюджетов SWEEP_MAX_OUTPUT_VALUES (точки вывода x варианты) и SWEEP_MAX_STEP_VALUES (шаги x варианты).
+    """
+    outputs = math.ceil(duration / output_step) + 1
+    # RK4 делает не меньше одного шага на интервал вывода; для адаптивного метода это оценка снизу
+    steps = max(math.ceil(duration / step), outputs - 1, 1)
+    return min(SWEEP_MAX_VARIANTS, SWEEP_MAX_OUTPUT_VALUES // outputs, SWEEP_MAX_STEP_VALUES // steps)
+
+
+def build_variants(base_parameters: dict, base_scenario: dict, variants: list, grid: list,
+                   max_variants: int = SWEEP_MAX_VARIANTS):
+    """
+    Матрицы P, S для всех вариантов: каждый элемент variants ({"parameters": ..., "scenario": ...})
+    комбинируется с каждой точкой сетки grid ([{"name", "values"|"scale"|"shift"}]).
+    max_variants - предел числа вариантов (см. batch_limit); проверяется до построения матриц.
+    Возвращает (P, S, описания вариантов - итоговые значения измененных величин).
+    """
+    variants = variants or [{}]
+    for variant in variants:
+        unknown = sorted(set(variant.get("parameters", {})) - set(PARAMETER_NAMES))
+        unknown += sorted(set(variant.get("scenario", {})) - set(SCENARIO_NAMES))
+        if unknown:
+            raise ValueError(f"Неизвестные имена в варианте: {', '.join(unknown)}")
+        if set(variant.get("scenario", {})) & set(FIXED_NAMES):
+            raise ValueError("Варианты не могут менять t0 и t1")
+
+    axes = []
+    for axis in grid:
+        name = axis["name"]
+        if name in FIXED_NAMES:
+            raise ValueError("Варианты не могут менять t0 и t1")
+        if name in PARAMETER_NAMES:
+            axes.append((name, 0, PARAMETER_NAMES.index(name), *_axis_values(axis)))
+        elif name in SCENARIO_NAMES:
+            axes.append((name, 1, SCENARIO_NAMES.index(name), *_axis_values(axis)))
+        else:
+            raise ValueError(f"Неизвестное имя оси: {name}")
+
+    total = len(variants) * int(np.prod([len(values) for *_, values in axes]))
+    if total > max_variants:
+        hint = " при таком шаге: увеличьте step или output_step" if max_variants < SWEEP_MAX_VARIANTS else ""
+        raise ValueError(f"Слишком много вариантов: {total} (максимум {max_variants}{hint})")
+
+    base_P = parameter_matrix([{**base_parameters, **v.get("parameters", {})} for v in variants])
+    base_S = scenario_matrix([{**base_scenario, **v.get("scenario", {})} for v in variants])
+
+    # Индексы (вариант, точка оси 1, точка оси 2, ...) для всех комбинаций
+    index = np.meshgrid(np.arange(len(variants)), *[np.arange(len(values)) for *_, values in axes], indexing="ij")
+    index = [i.ravel() for i in index]
+    P, S = base_P[:, index[0]], base_S[:, index[0]]
+    matrices = (P, S)
+    for (name, which, row, mode, values), points in zip(axes, index[1:]):
+        target = matrices[which]
+        if mode == "values":
+            target[row] = values[points]
+        elif mode == "scale":
+            target[row] *= values[points]
+        else:
+            target[row] += values[points]
+
+    labels = []
+    for column in range(total):
+        label = {"variant": int(index[0][column])}
+        for name, which, row, *_ in axes:
+            value = float(matrices[which][row, column])
+            label[name] = round(value, 6) if math.isfinite(value) else None
+        labels.append(label)
+    return P, S, labels
+
+
+def _simulate_split(P: np.ndarray, S: np.ndarray, columns: list, options: dict, parts: list, errors: dict):
+    try:
+        parts.append((columns, *simulate(P[:, columns], S[:, columns], **options)))
+    except ValueError as e:
+        if len(columns) == 1:
+            errors[columns[0]] = str(e)
+            return
+        middle = len(columns) // 2
+        _simulate_split(P, S, columns[:middle], options, parts, errors)
+        _simulate_split(P, S, columns[middle:], options, parts, errors)
+
+
+def _simulate_chunk(P: np.ndarray, S: np.ndarray, options: dict):
+    """
+    Симулирует часть вариантов. Возвращает (моменты времени или None, если не удался ни один вариант,
+    глюкоза (T, B) с NaN у неудавшихся вариантов, статистика, {индекс варианта: ошибка}).
+    """
+    errors = {column: problem for column, problem in enumerate(input_problems(P, S)) if problem}
+    parts = []
+    valid = [column for column in range(P.shape[1]) if column not in errors]
+    if valid:
+        _simulate_split(P, S, valid, options, parts, errors)
+    stats = {
+        "steps": max((s["steps"] for *_, s in parts), default=0),
+        "rejected": sum(s["rejected"] for *_, s in parts),
+        "rhs_evaluations": sum(s["rhs_evaluations"] for *_, s in parts),
+    }
+    if not parts:
+        return None, None, stats, errors
+    times = parts[0][1]
+    glucose = np.full((len(times), P.shape[1]), np.nan)
+    for columns, _, part, _ in parts:
+        glucose[:, columns] = part
+    return times, glucose, stats, errors
+
+
+def run_sweep(P: np.ndarray, S: np.ndarray, **options):
+    """
+    Симулирует все варианты. Возвращает (моменты времени, глюкоза (T, B), статистика).
+    Столбцы неудавшихся вариантов заполнены NaN, их ошибки - в stats["errors"] ([[индекс, описание], ...]).
+    Если не удался ни один вариант, бросает ValueError с первой ошибкой.
+    Большие пачки делятся на SWEEP_WORKERS частей и считаются в процессах.
+    """
+    batch = P.shape[1]
+    if batch <= SWEEP_POOL_THRESHOLD or SWEEP_WORKERS <= 1:
+        chunks = [np.arange(batch)]
+        results = [_simulate_chunk(P, S, options)]
+    else:
+        chunks = np.array_split(np.arange(batch), SWEEP_WORKERS)
+        pool = _get_pool()
+        futures = [pool.submit(_simulate_chunk, P[:, chunk], S[:, chunk], options) for chunk in chunks]
+        results = [future.result() for future in futures]
+
+    errors = sorted((int(chunk[column]), error) for chunk, (*_, chunk_errors) in zip(chunks, results)
+                    for column, error in chunk_errors.items())
+    # Моменты вывода у всех частей одинаковые
+    times = next((times for times, *_ in results if times is not None), None)
+    if times is None:
+        raise ValueError(errors[0][1])
+    glucose = np.concatenate([
+        part if part is not None else np.full((len(times), len(chunk)), np.nan)
+        for chunk, (_, part, _, _) in zip(chunks, results)
+    ], axis=1)
+    stats = {
+        "steps": max(s["steps"] for _, _, s, _ in results),
+        "rejected": sum(s["rejected"] for _, _, s, _ in results),
+        "rhs_evaluations": sum(s["rhs_evaluations"] for _, _, s, _ in results),
+        "workers": len(chunks),
+        "errors": [list(error) for error in errors],
+    }
+    return times, glucose, stats
+
+
+def summarize(times: np.ndarray, glucose: np.ndarray, percentiles=DEFAULT_PERCENTILES):
+    """
+    Сводка по вариантам (векторно по оси B): минимум, максимум, минуты ниже LOW_GLUCOSE и выше HIGH_GLUCOSE;
+    и огибающие - перцентили глюкозы по вариантам в каждый момент времени.
+    Неудавшиеся варианты (столбцы с NaN) получают сводку None и не входят в огибающие.
+    """
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise ValueError("Перцентили должны быть в диапазоне 0..100")
+    # Вес точки - половина соседних интервалов (правило трапеций)
+    dt = np.diff(times)
+    weights = np.zeros(len(times))
+    weights[:-1] += dt / 2
+    weights[1:] += dt / 2
+
+    succeeded = np.isfinite(glucose).all(axis=0)
+    minimum = glucose.min(axis=0)
+    maximum = glucose.max(axis=0)
+    below = weights @ (glucose < LOW_GLUCOSE)
+    above = weights @ (glucose > HIGH_GLUCOSE)
+    summaries = [
+        {
+            "min": round(lo, 2),
+            "max": round(hi, 2),
+            "minutes_below_3_9": round(b, 1),
+            "minutes_above_10": round(a, 1),
+        } if ok else None
+        for lo, hi, b, a, ok in zip(minimum.tolist(), maximum.tolist(), below.tolist(), above.tolist(), succeeded.tolist())
+    ]
+    envelope = np.percentile(glucose[:, succeeded], percentiles, axis=1).round(2)
+    envelopes = {f"p{p:g}": row.tolist() for p, row in zip(percentiles, envelope)}
+    return summaries, envelopes
@@ -0,0 +1,21 @@
+# backend/app/time_utils.py
+import calendar
+from datetime import datetime, timezone
+
+# В базе хранятся "наивные" отметки времени. Для целочисленных epoch-секунд
+# (колонка timestamp_epoch) они трактуются как UTC - так же, как это делает strftime('%s', ...) в SQLite.
+
+# Верхняя граница для открытых справа диапазонов ("с даты X и до конца")
+MAX_EPOCH = 2**53
+
+
+def to_epoch(value: datetime) -> int:
+    """Переводит datetime в целые epoch-секунды."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return calendar.timegm(value.timetuple())
+
+
+def from_epoch(value: int) -> datetime:
+    """Обратное преобразование: epoch-секунды -> наивный datetime."""
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
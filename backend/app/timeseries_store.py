@@ -0,0 +1,315 @@
+# backend/app/timeseries_store.py
+"""
+Хранилище временных рядов: общий API чтения/записи для роутеров.
+
+Данные лежат в двух местах:
+  * timeseries_data - одна строка на точку (все типы записей, точки с примечаниями);
+  * timeseries_chunks - компактные "чанки" для высокочастотных рядов (например, CGM-глюкоза):
+    один BLOB на пациента, тип записи и сутки.
+
+Какие типы записей пишутся чанками, задает переменная окружения CHUNKED_RECORD_TYPES
+(через запятую, например "glucose"). По умолчанию чанки выключены.
+Чтение всегда объединяет оба источника, поэтому включение и перенос данных (compact) можно делать постепенно.
+
+Перенос существующих строк в чанки (из каталога backend):
+    CHUNKED_RECORD_TYPES=glucose python -m app.timeseries_store
+
+Формат чанка (little-endian):
+    заголовок  <B B I>  версия формата, размер дельты в байтах (2 или 4), число точек n
+    дельты     n x uint16/uint32  первая - смещение от начала суток, далее разности соседних отметок (сек)
+    значения   n x float32
+"""
+import sqlite3
+import struct
+from collections import defaultdict
+
+import numpy as np
+
+from app.config import CHUNKED_RECORD_TYPES
+from app.database import DB_NAME, create_connection
+from app.details_store import store_details
+
+SECONDS_PER_DAY = 86400
+CHUNK_FORMAT_VERSION = 1
+CHUNK_HEADER = struct.Struct("<BBI")
+# float32 хранит ~7 значащих цифр; округление при чтении возвращает исходные значения вида 5.1
+VALUE_DECIMALS = 4
+# Размер пачки строк при потоковом чтении курсора
+READ_BATCH_SIZE = 5000
+# Серии графика и типы записей, из которых они собираются.
+# Перечисляются явно, чтобы выборка шла по индексу (patient_id, record_type, timestamp_epoch, value).
+SERIES_RECORD_TYPES = {
+    "glucose": ("glucose",),
+    "insulin": ("insulin", "insulin_bolus", "insulin_basal"),
+    "carbs": ("carbs",),
+}
+
+
+# --- КОДИРОВАНИЕ ЧАНКОВ ---
+
+def encode_chunk(day: int, timestamps: np.ndarray, values: np.ndarray) -> bytes:
+    """Кодирует отсортированные уникальные отметки одних суток и значения в BLOB."""
+    offsets = timestamps.astype(np.int64) - day * SECONDS_PER_DAY
+    deltas = np.diff(offsets, prepend=0)
+    delta_dtype = "<u2" if deltas.max(initial=0) <= 0xFFFF else "<u4"
+    header = CHUNK_HEADER.pack(CHUNK_FORMAT_VERSION, np.dtype(delta_dtype).itemsize, len(offsets))
+    return header + deltas.astype(delta_dtype).tobytes() + values.astype("<f4").tobytes()
+
+
+def decode_chunk(day: int, blob: bytes):
+    """Декодирует BLOB в массивы (epoch-секунды int64, значения float64) без поэлементного разбора."""
+    version, delta_size, count = CHUNK_HEADER.unpack_from(blob)
+    if version != CHUNK_FORMAT_VERSION:
+        raise ValueError(f"Неизвестная версия формата чанка: {version}")
+    offset = CHUNK_HEADER.size
+    delta_dtype = "<u2" if delta_size == 2 else "<u4"
+    deltas = np.frombuffer(blob, dtype=delta_dtype, count=count, offset=offset)
+    values = np.frombuffer(blob, dtype="<f4", count=count, offset=offset + count * delta_size)
+    timestamps = np.cumsum(deltas, dtype=np.int64) + day * SECONDS_PER_DAY
+    return timestamps, values.astype(np.float64).round(VALUE_DECIMALS)
+
+
+def _merge_points(timestamps: np.ndarray, values: np.ndarray):
+    """Сортирует точки и оставляет для повторяющихся отметок последнее записанное значение."""
+    order = np.argsort(timestamps, kind="stable")
+    timestamps, values = timestamps[order], values[order]
+    keep = np.append(timestamps[1:] != timestamps[:-1], True)
+    return timestamps[keep], values[keep]
+
+
+# --- ЧТЕНИЕ ---
+
+def _placeholders(items) -> str:
+    return ", ".join("?" * len(items))
+
+
+def _take_before(pending, limit: int):
+    """Делит пачку (ts, values) на точки с ts < limit и остаток."""
+    split = int(np.searchsorted(pending[0], limit, side="left"))
+    head = (pending[0][:split], pending[1][:split])
+    tail = (pending[0][split:], pending[1][split:])
+    return head, tail
+
+
+def iter_series(con: sqlite3.Connection, patient_id: int, record_types, start_epoch: int, end_epoch: int,
+                batch_size: int = READ_BATCH_SIZE):
+    """
+    Потоково отдает точки ряда пациента за [start_epoch, end_epoch] пачками
+    (epoch-секунды int64, значения float64) в порядке времени.
+    Строки читаются курсором по batch_size, чанки - по одним суткам, поэтому память не зависит от диапазона.
+    """
+    record_types = tuple(record_types)
+    row_cur = con.cursor()
+    row_cur.row_factory = None
+    row_cur.execute(
+        f"""
+        SELECT timestamp_epoch, value FROM timeseries_data
+        WHERE patient_id = ? AND record_type IN ({_placeholders(record_types)})
+          AND timestamp_epoch BETWEEN ? AND ?
+        ORDER BY timestamp_epoch ASC
+        """,
+        (patient_id, *record_types, start_epoch, end_epoch),
+    )
+    # Чанки читаются независимо от CHUNKED_RECORD_TYPES: отключение настройки не "прячет" уже перенесенные данные
+    chunk_cur = con.cursor()
+    chunk_cur.row_factory = None
+    chunk_cur.execute(
+        f"""
+        SELECT day, data FROM timeseries_chunks
+        WHERE patient_id = ? AND record_type IN ({_placeholders(record_types)})
+          AND day BETWEEN ? AND ?
+        ORDER BY day ASC
+        """,
+        (patient_id, *record_types, start_epoch // SECONDS_PER_DAY, end_epoch // SECONDS_PER_DAY),
+    )
+
+    def next_row_batch():
+        rows = row_cur.fetchmany(batch_size)
+        if not rows:
+            return None
+        rows = np.array(rows, dtype=np.float64)
+        return rows[:, 0].astype(np.int64), rows[:, 1]
+
+    pending = next_row_batch()
+
+    # Сливаем два упорядоченных потока: строки и чанки (по суткам)
+    for day, blob in chunk_cur:
+        day_start, day_end = day * SECONDS_PER_DAY, (day + 1) * SECONDS_PER_DAY
+
+        # Строки до начала суток чанка отдаем как есть
+        while pending is not None:
+            head, pending = _take_before(pending, day_start)
+            if len(head[0]):
+                yield head
+            if len(pending[0]):
+                break
+            pending = next_row_batch()
+
+        # Строки тех же суток объединяем с точками чанка
+        day_parts = []
+        while pending is not None:
+            head, pending = _take_before(pending, day_end)
+            day_parts.append(head)
+            if len(pending[0]):
+                break
+            pending = next_row_batch()
+
+        chunk_ts, chunk_values = decode_chunk(day, blob)
+        mask = (chunk_ts >= start_epoch) & (chunk_ts <= end_epoch)
+        timestamps = np.concatenate([chunk_ts[mask], *(part[0] for part in day_parts)])
+        values = np.concatenate([chunk_values[mask], *(part[1] for part in day_parts)])
+        if len(timestamps):
+            order = np.argsort(timestamps, kind="stable")
+            yield timestamps[order], values[order]
+
+    while pending is not None:
+        if len(pending[0]):
+            yield pending
+        pending = next_row_batch()
+
+
+def read_series(con: sqlite3.Connection, patient_id: int, record_types, start_epoch: int, end_epoch: int):
+    """
+    Возвращает точки ряда пациента за [start_epoch, end_epoch] в виде
+    (epoch-секунды int64, значения float64), отсортированные по времени.
+    """
+    batches = list(iter_series(con, patient_id, record_types, start_epoch, end_epoch))
+    if not batches:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    if len(batches) == 1:
+        return batches[0]
+    return np.concatenate([batch[0] for batch in batches]), np.concatenate([batch[1] for batch in batches])
+
+
+# --- ЗАПИСЬ ---
+
+def _write_chunk_points(cur: sqlite3.Cursor, patient_id: int, record_type: str, day: int, timestamps, values):
+    """
+    Дописывает точки в чанк суток. Возвращает (новые отметки, их значения, изменились ли существующие точки):
+    повторно присланные отметки с тем же значением ничего не меняют и в агрегаты не попадают.
+    """
+    timestamps, values = _merge_points(timestamps, values)
+    cur.execute(
+        "SELECT data FROM timeseries_chunks WHERE patient_id = ? AND record_type = ? AND day = ?",
+        (patient_id, record_type, day),
+    )
+    existing = cur.fetchone()
+    new_ts, new_values, changed = timestamps, values, False
+    if existing is not None:
+        old_ts, old_values = decode_chunk(day, existing[0])
+        is_old = np.isin(timestamps, old_ts)
+        # Значения сравниваются после того же округления float32, что и при чтении чанка
+        resent = values[is_old].astype(np.float32).astype(np.float64).round(VALUE_DECIMALS)
+        changed = bool(np.any(old_values[np.searchsorted(old_ts, timestamps[is_old])] != resent))
+        new_ts, new_values = timestamps[~is_old], values[~is_old]
+        timestamps, values = _merge_points(np.concatenate([old_ts, timestamps]), np.concatenate([old_values, values]))
+
+    cur.execute(
+        """
+        INSERT INTO timeseries_chunks (patient_id, record_type, day, point_count, data)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (patient_id, record_type, day)
+        DO UPDATE SET point_count = excluded.point_count, data = excluded.data
+        """,
+        (patient_id, record_type, day, len(timestamps), encode_chunk(day, timestamps, values)),
+    )
+    return new_ts, new_values, changed
+
+
+def write_points(con: sqlite3.Connection, rows: list):
+    """
+    Записывает точки. rows - кортежи
+    (patient_id, timestamp, timestamp_epoch, record_type, value, details),
+    где details - None или пара (digest, шифротекст) из details_store.encrypt_details.
+    Точки чанкованных типов без примечаний попадают в чанки, остальные - в timeseries_data.
+    Коммит выполняет вызывающий код.
+
+    Возвращает (строки для инкрементального обновления агрегатов, сутки для пересчета агрегатов):
+    в чанке отметка уникальна, поэтому повторно присланные точки в агрегаты не добавляются,
+    а сутки, где повтор изменил значение, - множество (patient_id, record_type, day) для rollups.refresh_days.
+    """
+    plain_rows = []
+    chunk_groups = defaultdict(lambda: ([], []))
+    for row in rows:
+        patient_id, _, epoch, record_type, value, details = row
+        if record_type in CHUNKED_RECORD_TYPES and details is None:
+            group = chunk_groups[(patient_id, record_type, epoch // SECONDS_PER_DAY)]
+            group[0].append(epoch)
+            group[1].append(value)
+        else:
+            plain_rows.append(row)
+
+    cur = con.cursor()
+    if plain_rows:
+        # Каждое уникальное примечание хранится один раз, строка ссылается на него по id
+        details_ids = store_details(con, (row[5] for row in plain_rows if row[5] is not None))
+        cur.executemany(
+            "INSERT INTO timeseries_data (patient_id, timestamp, timestamp_epoch, record_type, value, details_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (*row[:5], details_ids[row[5][0]] if row[5] is not None else None)
+                for row in plain_rows
+            ),
+        )
+    rollup_rows = list(plain_rows)
+    stale_days = set()
+    for (patient_id, record_type, day), (timestamps, values) in chunk_groups.items():
+        new_ts, new_values, changed = _write_chunk_points(
+            cur, patient_id, record_type, day,
+            np.array(timestamps, dtype=np.int64), np.array(values, dtype=np.float64),
+        )
+        if changed:
+            stale_days.add((patient_id, record_type, day))
+        else:
+            rollup_rows.extend(
+                (patient_id, None, epoch, record_type, value, None)
+                for epoch, value in zip(new_ts.tolist(), new_values.tolist())
+            )
+    return rollup_rows, stale_days
+
+
+def compact(con: sqlite3.Connection, record_types=CHUNKED_RECORD_TYPES, verbose: bool = False) -> int:
+    """
+    Переносит строки timeseries_data указанных типов (без примечаний) в чанки.
+    Работает по одному пациенту за транзакцию; повторный запуск безопасен.
+    """
+    moved = 0
+    for record_type in record_types:
+        patient_ids = [
+            row[0] for row in con.execute(
+                "SELECT DISTINCT patient_id FROM timeseries_data WHERE record_type = ?", (record_type,)
+            )
+        ]
+        for patient_id in patient_ids:
+            cur = con.cursor()
+            cur.row_factory = None
+            cur.execute(
+                """
+                SELECT id, timestamp_epoch, value FROM timeseries_data
+                WHERE patient_id = ? AND record_type = ? AND encrypted_details IS NULL AND details_id IS NULL
+                ORDER BY timestamp_epoch ASC, id ASC
+                """,
+                (patient_id, record_type),
+            )
+            rows = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 3)
+            if not len(rows):
+                continue
+            ids, timestamps, values = rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64), rows[:, 2]
+            days = timestamps // SECONDS_PER_DAY
+            boundaries = np.flatnonzero(np.diff(days)) + 1
+            for day_ts, day_values in zip(np.split(timestamps, boundaries), np.split(values, boundaries)):
+                _write_chunk_points(cur, patient_id, record_type, int(day_ts[0] // SECONDS_PER_DAY), day_ts, day_values)
+            cur.executemany("DELETE FROM timeseries_data WHERE id = ?", ((int(i),) for i in ids))
+            con.commit()
+            moved += len(ids)
+            if verbose:
+                print(f"  Пациент {patient_id}, {record_type}: перенесено {len(ids)} точек")
+    return moved
+
+
+if __name__ == "__main__":
+    # Перенос существующих строк в чанки: CHUNKED_RECORD_TYPES=glucose python -m app.timeseries_store
+    connection = create_connection(DB_NAME)
+    total = compact(connection, verbose=True)
+    connection.execute("VACUUM")
+    connection.close()
+    print(f"Перенесено в чанки точек: {total}")
@@ -0,0 +1,109 @@
+# backend/benchmarks/bench_analysis.py
+"""
+Масштабирование анализа рекомендаций: прежний построчный алгоритм (O(приемы пищи x показания))
+против векторного движка app.analysis_utils на 30, 90 и 365 днях данных.
+Заодно проверяется, что оба возвращают одинаковые рекомендации.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_analysis --days 30 90 365
+"""
+import argparse
+import random
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+
+from app.analysis_utils import analyze_series
+from app.time_utils import to_epoch
+
+
+def legacy_analyze_patient_data(all_records: list) -> list:
+    """Прежняя реализация analyze_patient_data (для сравнения)."""
+    recommendations = []
+    glucose_records = [r for r in all_records if r['record_type'] == 'glucose']
+    carb_records = [r for r in all_records if r['record_type'] == 'carbs']
+
+    night_lows = 0
+    for record in glucose_records:
+        record_time = record["timestamp"].time()
+        if dt_time(0, 0) <= record_time < dt_time(6, 0):
+            if record["value"] < 4.0:
+                night_lows += 1
+    if night_lows > 2:
+        recommendations.append(
+            "⚠️ Обнаружены повторяющиеся ночные гипогликемии. "
+            "Рекомендуется рассмотреть коррекцию вечерней дозы базального инсулина."
+        )
+
+    for meal in carb_records:
+        two_hours_after = meal['timestamp'] + timedelta(hours=2)
+        relevant_glucose_readings = [
+            g['value'] for g in glucose_records
+            if meal['timestamp'] < g['timestamp'] <= two_hours_after
+        ]
+        if relevant_glucose_readings:
+            peak_glucose = max(relevant_glucose_readings)
+            if peak_glucose > 10.0:
+                meal_time = meal['timestamp'].strftime('%d.%m %H:%M')
+                recommendations.append(
+                    f"📈 Обнаружен высокий пик глюкозы ({peak_glucose} ммоль/л) после приема пищи в {meal_time}. "
+                    "Возможно, углеводный коэффициент для этого приема пищи нуждается в коррекции."
+                )
+                break
+
+    if not recommendations:
+        recommendations.append("✅ Комплексный анализ не выявил явных отклонений.")
+    return recommendations
+
+
+def generate(days: int, spike_day: int):
+    """CGM каждые 5 минут и три приема пищи в день; единственный пик после еды - в день spike_day."""
+    start = datetime(2025, 1, 1)
+    records = []
+    for minute in range(0, days * 24 * 60, 5):
+        moment = start + timedelta(minutes=minute)
+        value = round(random.uniform(4.2, 9.5), 1)
+        if (moment - start).days == spike_day and moment.hour == 14:
+            value = 12.4
+        records.append({"timestamp": moment, "record_type": "glucose", "value": value})
+    for day in range(days):
+        for hour in (8, 13, 19):
+            moment = start + timedelta(days=day, hours=hour)
+            records.append({"timestamp": moment, "record_type": "carbs", "value": random.randint(30, 80)})
+    return records
+
+
+def to_arrays(records, record_type):
+    points = [(to_epoch(r["timestamp"]), r["value"]) for r in records if r["record_type"] == record_type]
+    return np.array([p[0] for p in points], dtype=np.int64), np.array([p[1] for p in points], dtype=np.float64)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 90, 365])
+    parser.add_argument("--skip-legacy-above", type=int, default=365,
+                        help="не запускать прежний алгоритм для более длинных периодов")
+    args = parser.parse_args()
+
+    for days in args.days:
+        # Пик в самом конце периода - худший случай для раннего выхода прежнего алгоритма
+        records = generate(days, spike_day=days - 1)
+        glucose_ts, glucose_values = to_arrays(records, "glucose")
+        carbs_ts, carbs_values = to_arrays(records, "carbs")
+
+        started = time.perf_counter()
+        result = analyze_series(glucose_ts, glucose_values, carbs_ts, carbs_values)
+        new_ms = (time.perf_counter() - started) * 1000
+
+        line = f"{days:>4} дн. ({len(glucose_ts):>6} показаний): движок {new_ms:8.2f} мс"
+        if days <= args.skip_legacy_above:
+            started = time.perf_counter()
+            legacy = legacy_analyze_patient_data(records)
+            legacy_ms = (time.perf_counter() - started) * 1000
+            line += f", прежний алгоритм {legacy_ms:10.1f} мс, результаты совпадают: {legacy == result}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# backend/benchmarks/bench_auth.py
+"""
+Накладные расходы авторизации на один запрос (мкс):
+
+  "до":    декодирование JWT + соединение из пула + SELECT * FROM doctors WHERE username = ?
+  "после": app.auth_utils.get_current_doctor - декодирование JWT + кэш врачей по id из токена
+
+Запуск из каталога backend (нужны SECRET_KEY/ENCRYPTION_KEY и база с врачом 'doctor'):
+    python -m benchmarks.bench_auth --requests 20000
+"""
+import argparse
+import time
+
+from jose import jwt
+
+from app.auth_utils import ALGORITHM, SECRET_KEY, create_doctor_token, get_current_doctor
+from app.database import connection
+
+
+def legacy_get_current_doctor(token: str):
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    with connection() as con:
+        return con.execute("SELECT * FROM doctors WHERE username = ?", (payload["sub"],)).fetchone()
+
+
+def measure(label, func, token, requests):
+    for _ in range(min(200, requests)):  # прогрев
+        func(token)
+    started = time.perf_counter()
+    for _ in range(requests):
+        func(token)
+    per_request = (time.perf_counter() - started) / requests * 1e6
+    print(f"{label:<34} {per_request:8.1f} мкс/запрос")
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--username", default="doctor")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    with connection() as con:
+        doctor = con.execute("SELECT id, username, token_version FROM doctors WHERE username = ?", (args.username,)).fetchone()
+    token = create_doctor_token(doctor)
+
+    decode_only = measure("только jwt.decode", lambda t: jwt.decode(t, SECRET_KEY, algorithms=[ALGORITHM]), token, args.requests)
+    before = measure("до: JWT + запрос к doctors", legacy_get_current_doctor, token, args.requests)
+    after = measure("после: JWT + кэш врачей", get_current_doctor, token, args.requests)
+    print(f"Накладные расходы сверх декодирования: {before - decode_only:.1f} -> {after - decode_only:.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# backend/benchmarks/bench_chunked_storage.py
+"""
+Строки timeseries_data против чанков timeseries_chunks для CGM-глюкозы:
+размер базы и время чтения 90 дней через read_series.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_chunked_storage --patients 20 --days 365
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app import timeseries_store
+from app.database import create_connection
+from app.migrations import apply_migrations
+from app.timeseries_store import SECONDS_PER_DAY, read_series, write_points
+
+START_EPOCH = 1_700_006_400  # полночь UTC
+
+
+def fill(con, patients, days):
+    for patient_id in range(1, patients + 1):
+        timestamps = START_EPOCH + np.arange(days * 288) * 300
+        rows = [
+            (patient_id, "", int(ts), "glucose", round(random.uniform(3, 15), 1), None)
+            for ts in timestamps
+        ]
+        write_points(con, rows)
+        con.commit()
+
+
+def measure(db_path, patients, days, repeats):
+    con = create_connection(db_path)
+    window = 90 * SECONDS_PER_DAY
+    started = time.perf_counter()
+    for _ in range(repeats):
+        start = START_EPOCH + random.randint(0, (days - 90) * SECONDS_PER_DAY)
+        read_series(con, random.randint(1, patients), ("glucose",), start, start + window)
+    elapsed = (time.perf_counter() - started) / repeats * 1000
+    con.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeats", type=int, default=100)
+    args = parser.parse_args()
+
+    for label, chunked in (("строки", frozenset()), ("чанки", frozenset({"glucose"}))):
+        timeseries_store.CHUNKED_RECORD_TYPES = chunked
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "bench.db")
+            con = create_connection(db_path)
+            apply_migrations(con)
+            fill(con, args.patients, args.days)
+            con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            con.execute("VACUUM")
+            con.close()
+            size_mb = os.path.getsize(db_path) / 2**20
+            latency = measure(db_path, args.patients, args.days, args.repeats)
+        points = args.patients * args.days * 288
+        print(f"{label:<8} {size_mb:8.1f} МБ ({size_mb * 2**20 / points:6.1f} байт/точку), "
+              f"чтение 90 дней: {latency:7.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# backend/benchmarks/bench_conditional_get.py
+"""
+Повторное обновление данных пациента (мс на запрос): полный ответ 200 и ответ 304
+на запрос с If-None-Match из предыдущего ответа (версии данных не менялись).
+
+Запуск из каталога backend (нужны SECRET_KEY/ENCRYPTION_KEY и база с данными):
+    python -m benchmarks.bench_conditional_get --patient 1 --repeat 50
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from app.auth_utils import create_doctor_token
+from app.database import connection
+from app.main import app
+
+ENDPOINTS = [
+    "/api/patients/",
+    "/api/patients/{patient_id}/glucose_data",
+    "/api/patients/{patient_id}/comprehensive_data",
+    "/api/patients/{patient_id}/parameters",
+    "/api/patients/{patient_id}/scenarios",
+]
+
+
+def measure(client, path, headers, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(path, headers=headers)
+    return (time.perf_counter() - started) / repeat * 1000, response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patient", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with connection() as con:
+        doctor = con.execute(
+            "SELECT d.id, d.username, d.token_version FROM doctors d JOIN patients p ON p.doctor_id = d.id WHERE p.id = ?",
+            (args.patient,),
+        ).fetchone()
+    headers = {"Authorization": f"Bearer {create_doctor_token(doctor)}"}
+
+    with TestClient(app) as client:
+        for template in ENDPOINTS:
+            path = template.format(patient_id=args.patient)
+            client.get(path, headers=headers)  # прогрев
+            full, response = measure(client, path, headers, args.repeat)
+            conditional, revalidated = measure(
+                client, path, {**headers, "If-None-Match": response.headers["etag"]}, args.repeat
+            )
+            print(f"{path:<42} 200: {full:7.2f} мс ({len(response.content):8d} Б)   "
+                  f"{revalidated.status_code}: {conditional:6.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# backend/benchmarks/bench_db_pool.py
+"""
+Сравнение пропускной способности (запросов/с) доступа к БД для типичного
+авторизованного запроса графика: поиск врача + проверка пациента + выборка глюкозы за 7 дней.
+
+  "до":    sqlite3.connect() на каждую зависимость, как было в роутерах
+  "после": соединения из пула app.database (WAL, PRAGMA, кэш выражений)
+
+Запуск из каталога backend на засеянной базе:
+    python -m benchmarks.bench_db_pool --requests 2000 --threads 8
+Бенчмарк работает на временной копии базы, исходный файл не изменяется.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app.database import ConnectionPool
+
+DOCTOR_QUERY = "SELECT * FROM doctors WHERE username = ?"
+OWNER_QUERY = "SELECT id FROM patients WHERE id = ? AND doctor_id = ?"
+GLUCOSE_QUERY = """
+    SELECT timestamp, value FROM timeseries_data
+    WHERE patient_id = ? AND record_type = 'glucose' AND timestamp BETWEEN ? AND ?
+    ORDER BY timestamp ASC
+"""
+
+
+def chart_request(get_con, put_con, patient_id, start, end):
+    # Зависимость get_current_doctor
+    con = get_con()
+    doctor = con.execute(DOCTOR_QUERY, ("doctor",)).fetchone()
+    put_con(con)
+    # Обработчик get_patient_glucose_data
+    con = get_con()
+    con.execute(OWNER_QUERY, (patient_id, doctor["id"])).fetchone()
+    rows = con.execute(GLUCOSE_QUERY, (patient_id, start, end)).fetchall()
+    put_con(con)
+    return len(rows)
+
+
+def run(label, get_con, put_con, args, patient_id, start, end):
+    def one(_):
+        return chart_request(get_con, put_con, patient_id, start, end)
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(one, range(min(50, args.requests))))  # прогрев
+        started = time.perf_counter()
+        list(executor.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - started
+    print(f"{label:<28} {args.requests / elapsed:10.1f} запросов/с")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="medical_app.db")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "bench.db")
+    shutil.copy(args.db, db_path)
+
+    con = sqlite3.connect(db_path)
+    patient_id, last_ts = con.execute(
+        "SELECT patient_id, MAX(timestamp) FROM timeseries_data WHERE record_type = 'glucose'"
+    ).fetchone()
+    con.close()
+    end = datetime.fromisoformat(last_ts)
+    start = end - timedelta(days=7)
+
+    def connect_fresh():
+        con = sqlite3.connect(db_path)
+        con.row_factory = sqlite3.Row
+        return con
+
+    run("до: connect() на запрос", connect_fresh, lambda con: con.close(), args, patient_id, start, end)
+
+    pool = ConnectionPool(db_path, size=args.threads)
+    run("после: пул соединений", pool.acquire, pool.release, args, patient_id, start, end)
+    pool.close()
+
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
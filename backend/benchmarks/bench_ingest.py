@@ -0,0 +1,131 @@
+# backend/benchmarks/bench_ingest.py
+"""
+Нагрузочный тест приема данных устройств: точек/с при записи каждой пачки своей транзакцией
+(как раньше в обработчике) и через фоновый писатель app.ingest_pipeline, объединяющий пачки.
+
+Каждый "загрузчик" - поток, отправляющий пачки по 12 точек CGM (час данных с шагом 5 минут).
+Время для писателя включает полный сброс очереди в базу (stop()).
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_ingest --uploaders 200 --batches 20
+    python -m benchmarks.bench_ingest --spool   # то же со спулом на диске
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database import ConnectionPool, create_connection
+from app.ingest_pipeline import IngestPipeline, IngestQueueFull, store_rows
+from app.migrations import apply_migrations
+
+START_EPOCH = 1_700_006_400
+POINTS_PER_BATCH = 12
+
+
+def make_batches(uploaders, batches):
+    """Для каждого загрузчика (пациента) - его пачки в порядке отправки, по часу данных в пачке."""
+    return [
+        [
+            [
+                (patient_id, "", START_EPOCH + hour * 3600 + 300 * i, "glucose", round(random.uniform(3, 15), 1), None)
+                for i in range(POINTS_PER_BATCH)
+            ]
+            for hour in range(batches)
+        ]
+        for patient_id in range(1, uploaders + 1)
+    ]
+
+
+def run_sync(db_path, per_uploader, threads):
+    pool = ConnectionPool(db_path, size=threads)
+
+    def upload(batches):
+        for rows in batches:
+            con = pool.acquire()
+            try:
+                store_rows(con, rows)
+                con.commit()
+            finally:
+                pool.release(con)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(upload, per_uploader))
+    elapsed = time.perf_counter() - started
+    pool.close()
+    return elapsed
+
+
+def run_pipeline(db_path, per_uploader, threads, spool_dir):
+    pipeline = IngestPipeline(db_path, spool_dir=spool_dir)
+    pipeline.start()
+    rejected = 0
+
+    def upload(batches):
+        nonlocal rejected
+        for rows in batches:
+            while True:
+                try:
+                    pipeline.submit(rows)
+                    break
+                except IngestQueueFull:
+                    # Клиент получил бы 429 и повторил позже
+                    rejected += 1
+                    time.sleep(0.01)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(upload, per_uploader))
+    pipeline.stop()
+    elapsed = time.perf_counter() - started
+    return elapsed, rejected, pipeline.flushes
+
+
+def fresh_db(tmp_dir, name):
+    db_path = os.path.join(tmp_dir, name)
+    con = create_connection(db_path)
+    apply_migrations(con)
+    con.close()
+    return db_path
+
+
+def count_points(db_path):
+    con = create_connection(db_path)
+    total = con.execute("SELECT COUNT(*) FROM timeseries_data").fetchone()[0]
+    con.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploaders", type=int, default=200)
+    parser.add_argument("--batches", type=int, default=20, help="пачек на одного загрузчика")
+    parser.add_argument("--threads", type=int, default=16, help="параллельных потоков-клиентов")
+    parser.add_argument("--spool", action="store_true", help="включить спул на диске для писателя")
+    args = parser.parse_args()
+
+    per_uploader = make_batches(args.uploaders, args.batches)
+    total_batches = args.uploaders * args.batches
+    total_points = total_batches * POINTS_PER_BATCH
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = fresh_db(tmp_dir, "sync.db")
+        elapsed = run_sync(db_path, per_uploader, args.threads)
+        assert count_points(db_path) == total_points
+        print(f"транзакция на пачку   {total_points / elapsed:10.0f} точек/с "
+              f"({total_batches} транзакций, {elapsed:.2f} с)")
+
+        db_path = fresh_db(tmp_dir, "pipeline.db")
+        spool_dir = os.path.join(tmp_dir, "spool") if args.spool else None
+        elapsed, rejected, flushes = run_pipeline(db_path, per_uploader, args.threads, spool_dir)
+        assert count_points(db_path) == total_points
+        label = "писатель + спул" if args.spool else "фоновый писатель"
+        print(f"{label:<21} {total_points / elapsed:10.0f} точек/с "
+              f"({flushes} транзакций, {elapsed:.2f} с, отказов 429: {rejected})")
+
+
+if __name__ == "__main__":
+    main()
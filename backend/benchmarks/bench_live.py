@@ -0,0 +1,73 @@
+# backend/benchmarks/bench_live.py
+"""
+Раздача новых точек подписчикам SSE (app.live_updates) в процессе, без HTTP:
+  * время от publish_rows в потоке писателя до получения сообщения всеми подписчиками;
+  * процессорное время, которое открытые потоки тратят между поступлениями данных.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_live --subscribers 1000 --patients 100 --idle 5 --heartbeat 1
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from app.live_updates import broker, event_stream, publish_rows
+
+
+async def consume(patient_id: int, heartbeat: float, received: list, ready: asyncio.Event, total: int, counter: list):
+    async for message in event_stream(patient_id, heartbeat=heartbeat):
+        if message.startswith("event: points"):
+            received.append(time.perf_counter())
+            counter[0] += 1
+            if counter[0] == total:
+                ready.set()
+
+
+async def main_async(args):
+    received = []
+    counter = [0]
+    ready = asyncio.Event()
+    tasks = [
+        asyncio.create_task(consume(i % args.patients, args.heartbeat, received, ready, args.subscribers, counter))
+        for i in range(args.subscribers)
+    ]
+    await asyncio.sleep(0.5)
+    print(f"подписчиков {broker.stats()['subscribers']}, пациентов {broker.stats()['patients']}")
+
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    await asyncio.sleep(args.idle)
+    idle_cpu = time.process_time() - cpu_started
+    print(f"простой {args.idle:.0f} с: процессорное время {idle_cpu * 1000:.1f} мс "
+          f"({idle_cpu / (time.perf_counter() - wall_started) * 100:.2f} % ядра, пульс раз в {args.heartbeat:g} с)")
+
+    # Одна пачка приемника: по точке глюкозы на каждого пациента
+    rows = [(patient_id, None, int(time.time()), "glucose", 5.5) for patient_id in range(args.patients)]
+    published = time.perf_counter()
+    thread = threading.Thread(target=publish_rows, args=(rows,))
+    thread.start()
+    thread.join()
+    publish_done = time.perf_counter()
+    await asyncio.wait_for(ready.wait(), 10)
+    print(f"publish_rows {(publish_done - published) * 1000:.2f} мс, "
+          f"доставка всем {(max(received) - published) * 1000:.2f} мс")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    print(f"после отключения подписчиков: {broker.stats()['subscribers']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--idle", type=float, default=5.0)
+    parser.add_argument("--heartbeat", type=float, default=1.0)
+    args = parser.parse_args()
+    broker.max_subscribers = max(broker.max_subscribers, args.subscribers)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# backend/benchmarks/bench_login_storm.py
+"""
+"Пересменка": много одновременных входов и задержка (p50/p99) несвязанного запроса GET /api/auth/me.
+
+  без нагрузки    - только зондирующие запросы /api/auth/me
+  до              - вход с bcrypt.checkpw прямо в async-обработчике (как было)
+  после           - POST /api/auth/login (bcrypt в ограниченном пуле app.password_utils)
+
+Приложение запускается в процессе через httpx.ASGITransport (один цикл событий, как у воркера uvicorn).
+Запуск из каталога backend (нужны SECRET_KEY/ENCRYPTION_KEY и база с врачом 'doctor'):
+    python -m benchmarks.bench_login_storm --logins 40 --concurrency 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import bcrypt
+import httpx
+from fastapi import FastAPI, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.auth_utils import create_doctor_token
+from app.models import UserCredentials
+from app.routers import auth
+from app.routers.auth import _find_doctor
+
+PASSWORD = "supersecretpassword123"
+
+app = FastAPI()
+app.include_router(auth.router, prefix="/api/auth")
+
+
+@app.post("/legacy/login")
+async def legacy_login(credentials: UserCredentials):
+    user_record = await run_in_threadpool(_find_doctor, credentials.username)
+    if not user_record or not bcrypt.checkpw(credentials.password.encode('utf-8'), user_record["hashed_password"]):
+        raise HTTPException(status_code=401)
+    return {"access_token": create_doctor_token(user_record), "token_type": "bearer"}
+
+
+async def probe(client, headers, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/auth/me", headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.005)
+
+
+async def storm(client, path, username, logins, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    statuses = []
+
+    async def one():
+        async with limit:
+            response = await client.post(path, json={"username": username, "password": PASSWORD})
+            statuses.append(response.status_code)
+
+    await asyncio.gather(*(one() for _ in range(logins)))
+    return statuses
+
+
+async def scenario(client, headers, label, path, args):
+    latencies = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(client, headers, stop, latencies))
+    started = time.perf_counter()
+    if path is None:
+        await asyncio.sleep(1.0)
+        statuses = []
+    else:
+        statuses = await storm(client, path, args.username, args.logins, args.concurrency)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+    logins = f", входов {statuses.count(200)}/{len(statuses)} за {elapsed:.1f} с" if statuses else ""
+    print(f"{label:<16} /api/auth/me p50 {statistics.median(latencies):7.1f} мс, p99 {p99:8.1f} мс "
+          f"({len(latencies)} запросов{logins})")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--username", default="doctor")
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/api/auth/login", json={"username": args.username, "password": PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        await scenario(client, headers, "без нагрузки", None, args)
+        await scenario(client, headers, "до", "/legacy/login", args)
+        await scenario(client, headers, "после", "/api/auth/login", args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
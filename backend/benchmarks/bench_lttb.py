@@ -0,0 +1,37 @@
+# backend/benchmarks/bench_lttb.py
+"""
+Пропускная способность LTTB-прореживания (app.downsampling) на больших рядах.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_lttb --sizes 1000000 5000000 --max-points 1000 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.downsampling import lttb_indices
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    parser.add_argument("--max-points", type=int, nargs="+", default=[500, 1000, 2000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        x = 1_700_000_000 + np.arange(size, dtype=np.int64) * 300
+        y = np.clip(7 + rng.normal(0, 0.15, size).cumsum() % 12, 2.2, 22.0)
+        for max_points in args.max_points:
+            started = time.perf_counter()
+            for _ in range(args.repeats):
+                lttb_indices(x, y, max_points)
+            elapsed = (time.perf_counter() - started) / args.repeats
+            print(f"{size:>10} -> {max_points:>5} точек: {elapsed * 1000:8.1f} мс "
+                  f"({size / elapsed / 1e6:6.1f} млн точек/с)")
+
+
+if __name__ == "__main__":
+    main()
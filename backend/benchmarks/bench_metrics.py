@@ -0,0 +1,50 @@
+# backend/benchmarks/bench_metrics.py
+"""
+Метрики НМГ за окно пациента (мс на запрос):
+  "сырые точки":   чтение всех точек окна и расчет суточных сумм заново (холодный кэш)
+  "из кэша суток": app.cgm_metrics.window_metrics при прогретом кэше частичных сумм
+
+Запуск из каталога backend (нужны SECRET_KEY/ENCRYPTION_KEY и база с данными):
+    python -m benchmarks.bench_metrics --patient 1 --days 90 --repeat 50
+"""
+import argparse
+import time
+
+from app.cgm_metrics import compute_metrics, day_partials_cache, partials_from_points, window_metrics
+from app.database import connection
+from app.timeseries_store import read_series
+
+
+def raw_metrics(con, patient_id, start_epoch, end_epoch):
+    return compute_metrics(list(partials_from_points(*read_series(con, patient_id, ("glucose",), start_epoch, end_epoch)).values()))
+
+
+def measure(label, func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    print(f"{label:<16} {(time.perf_counter() - started) / repeat * 1000:8.2f} мс  точек {result['readings']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patient", type=int, default=1)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with connection() as con:
+        last = con.execute(
+            "SELECT MAX(timestamp_epoch) FROM timeseries_data WHERE patient_id = ? AND record_type = 'glucose'", (args.patient,)
+        ).fetchone()[0] or 0
+        end_epoch = last // 86400 * 86400 + 86399
+        start_epoch = end_epoch + 1 - args.days * 86400
+
+        measure("сырые точки", lambda: raw_metrics(con, args.patient, start_epoch, end_epoch), args.repeat)
+        day_partials_cache.clear()
+        window_metrics(con, args.patient, start_epoch, end_epoch)
+        measure("из кэша суток", lambda: window_metrics(con, args.patient, start_epoch, end_epoch), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# backend/benchmarks/bench_nlp.py
+"""
+Разбор текстовых рекомендаций: время загрузки модели, RSS процесса и тексты/с.
+
+  до:    spacy.load(SPACY_MODEL) с полным конвейером, nlp(text) на каждый текст
+  после: без parser/ner/senter (как app.recommendation_parser) - по одному тексту и пакетно через nlp.pipe
+
+Каждый вариант измеряется в отдельном процессе, чтобы RSS не смешивались.
+RSS загрузки - прирост после импорта spaCy и загрузки модели; пиковый RSS включает и активации при разборе пачки.
+Запуск из каталога backend (нужна модель: python -m spacy download ru_core_news_sm):
+    python -m benchmarks.bench_nlp --texts 2000 --batch-size 64
+
+Без доступа к модели можно собрать необученную замену с теми же компонентами и размерами слоев
+(веса случайные, поэтому измеряется только стоимость конвейера, а не качество разбора):
+    python -m benchmarks.bench_nlp --build-stand-in /tmp/ru_stand_in
+    SPACY_MODEL=/tmp/ru_stand_in python -m benchmarks.bench_nlp
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+# Компоненты ru_core_news_sm, от которых зависит стоимость разбора (attribute_ruler и lemmatizer
+# в замену не входят: лемматизатору нужен pymorphy3, а их стоимость одинакова до и после)
+STAND_IN_PIPELINE = ["tok2vec", "morphologizer", "parser", "ner", "senter"]
+# Вариант -> (исключать ли SPACY_EXCLUDE, разбор через nlp.pipe)
+MODES = {
+    "full": (False, False),
+    "trimmed": (True, False),
+    "trimmed-pipe": (True, True),
+}
+
+SAMPLE_TEXTS = [
+    "Снизить базу на 10 % с 23.00 до 6:00",
+    "Повысить базальный на 15 %",
+    "УК на завтрак 1:10",
+    "Коэффициент на ужин 1:12, уменьшить базу на 5 % с 2:00 до 5:00",
+    "Контроль гликемии перед сном, при необходимости увеличить базу на 20 %",
+    "Пациенту рекомендовано вести дневник питания и продолжить текущую терапию",
+]
+
+
+def build_stand_in(path: str):
+    """Необученный русский конвейер с компонентами и размерами слоев конфигурации efficiency (как у *_sm)."""
+    from spacy.cli.init_config import init_config
+    from spacy.training import Example
+    from spacy.util import load_model_from_config
+
+    nlp = load_model_from_config(init_config(lang="ru", pipeline=STAND_IN_PIPELINE, optimize="efficiency"), auto_fill=True)
+    examples = []
+    for text in SAMPLE_TEXTS:
+        doc = nlp.make_doc(text)
+        tail = len(doc) - 1
+        # Минимальная разметка, чтобы компоненты узнали метки и создали слои
+        examples.append(Example.from_dict(doc, {
+            "heads": [0] * len(doc), "deps": ["ROOT"] + ["dep"] * tail, "morphs": ["POS=NOUN"] * len(doc),
+            "sent_starts": [1] + [0] * tail, "entities": ["U-NUM"] + ["O"] * tail,
+        }))
+    nlp.initialize(lambda: examples)
+    nlp.to_disk(path)
+    print(f"Замена модели сохранена в {path}: {', '.join(nlp.pipe_names)}")
+
+
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return float("nan")
+
+
+def child(mode: str, texts: int, batch_size: int, n_process: int):
+    from app import recommendation_parser
+
+    trimmed, batched = MODES[mode]
+    exclude = recommendation_parser.SPACY_EXCLUDE if trimmed else []
+    rss_before = _current_rss_mb()
+    started = time.perf_counter()
+    import spacy
+    nlp = spacy.load(recommendation_parser.SPACY_MODEL, exclude=exclude)
+    load_seconds = time.perf_counter() - started
+    load_rss = _current_rss_mb() - rss_before
+
+    sample = [random.choice(SAMPLE_TEXTS).lower() for _ in range(texts)]
+    started = time.perf_counter()
+    if batched:
+        for _ in nlp.pipe(sample, batch_size=batch_size, n_process=n_process):
+            pass
+    else:
+        for text in sample:
+            nlp(text)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "pipeline": nlp.pipe_names,
+        "load_seconds": load_seconds,
+        "texts_per_second": texts / elapsed,
+        "load_rss_mb": load_rss,
+        # ru_maxrss в Linux - в килобайтах
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-process", type=int, default=1)
+    parser.add_argument("--build-stand-in", metavar="PATH", help="собрать необученную замену модели и выйти")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build_stand_in:
+        build_stand_in(args.build_stand_in)
+        return
+    if args.child:
+        child(args.child, args.texts, args.batch_size, args.n_process)
+        return
+
+    labels = {"full": "до (полный, nlp())", "trimmed": "после (урезанный, nlp())", "trimmed-pipe": "после (урезанный, pipe)"}
+    for mode, label in labels.items():
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_nlp", "--child", mode, "--texts", str(args.texts),
+             "--batch-size", str(args.batch_size), "--n-process", str(args.n_process)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{label:<26} загрузка {result['load_seconds']:5.2f} с, {result['texts_per_second']:8.1f} текстов/с, "
+              f"RSS загрузки {result['load_rss_mb']:6.1f} МБ, пиковый RSS {result['peak_rss_mb']:6.1f} МБ, "
+              f"компоненты: {', '.join(result['pipeline'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# backend/benchmarks/bench_overview.py
+"""
+Сводка по всем пациентам врача (мс на сводку):
+  "по пациенту": как делала стартовая страница - проверка владельца и чтение суток глюкозы
+                 отдельными запросами для каждого пациента (N+1)
+  "одним запросом": app.overview.practice_overview
+
+Запуск из каталога backend (нужны SECRET_KEY/ENCRYPTION_KEY и база с данными):
+    python -m benchmarks.bench_overview --doctor 1 --repeat 20
+"""
+import argparse
+import time
+
+from app.database import connection
+from app.overview import OVERVIEW_WINDOW_SECONDS, _day_stats, practice_overview
+from app.timeseries_store import read_series
+
+
+def per_patient_overview(con, doctor_id, now_epoch):
+    overview = []
+    for (patient_id,) in con.execute("SELECT id FROM patients WHERE doctor_id = ?", (doctor_id,)).fetchall():
+        con.execute("SELECT * FROM patients WHERE id = ? AND doctor_id = ?", (patient_id, doctor_id)).fetchone()
+        _, values = read_series(con, patient_id, ("glucose",), now_epoch - OVERVIEW_WINDOW_SECONDS + 1, now_epoch)
+        last = con.execute(
+            "SELECT MAX(timestamp_epoch) FROM timeseries_data WHERE patient_id = ? AND record_type = 'glucose' AND timestamp_epoch <= ?",
+            (patient_id, now_epoch),
+        ).fetchone()
+        overview.append((patient_id, last[0], *_day_stats(values)))
+    return overview
+
+
+def measure(label, func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    print(f"{label:<16} {(time.perf_counter() - started) / repeat * 1000:8.2f} мс  пациентов {len(result)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doctor", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with connection() as con:
+        now_epoch = con.execute("SELECT MAX(timestamp_epoch) FROM timeseries_data").fetchone()[0] or int(time.time())
+        measure("по пациенту", lambda: per_patient_overview(con, args.doctor, now_epoch), args.repeat)
+        measure("одним запросом", lambda: practice_overview(con, args.doctor, now_epoch), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# backend/benchmarks/bench_series_format.py
+"""
+Ответ с сериями графика в JSON и в двоичном колоночном формате (app.series_format):
+время ответа сервера (мс на запрос) и размер тела для нескольких окон и разрешений.
+
+Запуск из каталога backend (нужны SECRET_KEY/ENCRYPTION_KEY и база с данными):
+    python -m benchmarks.bench_series_format --patient 1 --repeat 20
+"""
+import argparse
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.auth_utils import create_doctor_token
+from app.database import connection
+from app.main import app
+from app.series_format import SERIES_MEDIA_TYPE, decode_series
+
+QUERIES = [
+    "",
+    "?resolution=15m",
+    "?resolution=1h",
+    "?max_points=500",
+]
+
+
+def measure(client, path, headers, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(path, headers=headers)
+    return (time.perf_counter() - started) / repeat * 1000, response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patient", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with connection() as con:
+        doctor = con.execute(
+            "SELECT d.id, d.username, d.token_version FROM doctors d JOIN patients p ON p.doctor_id = d.id WHERE p.id = ?",
+            (args.patient,),
+        ).fetchone()
+    headers = {"Authorization": f"Bearer {create_doctor_token(doctor)}"}
+    binary_headers = {**headers, "Accept": SERIES_MEDIA_TYPE}
+
+    with TestClient(app) as client:
+        for query in QUERIES:
+            path = f"/api/patients/{args.patient}/comprehensive_data{query}"
+            client.get(path, headers=headers)  # прогрев
+            json_ms, json_response = measure(client, path, headers, args.repeat)
+            binary_ms, binary_response = measure(client, path, binary_headers, args.repeat)
+
+            # Разбор на стороне клиента: json.loads против открытия массивов над буфером
+            started = time.perf_counter()
+            points = sum(len(value) for value in json.loads(json_response.content).values() if isinstance(value, list))
+            parse_json = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            _, series = decode_series(binary_response.content)
+            parse_binary = (time.perf_counter() - started) * 1000
+            assert points == sum(len(arrays[0]) for arrays in series.values())
+
+            print(f"{query or '(сырые точки)':<18} точек {points:6d}   "
+                  f"JSON: {json_ms:7.2f} мс {len(json_response.content):8d} Б, разбор {parse_json:6.2f} мс   "
+                  f"двоичный: {binary_ms:7.2f} мс {len(binary_response.content):8d} Б, разбор {parse_binary:6.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
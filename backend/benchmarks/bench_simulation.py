@@ -0,0 +1,45 @@
+# backend/benchmarks/bench_simulation.py
+"""
+Время симуляции сценария по умолчанию (720 минут) для параметров по умолчанию:
+RK4 с разными шагами и адаптивный Дорманд - Принс; расхождение с эталоном (адаптивный, rtol=1e-9) в мг/дл.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_simulation --repeat 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.simulation import MG_DL_PER_MMOL_L, parameter_matrix, scenario_matrix, simulate
+
+CONFIGURATIONS = [
+    ("rk4, шаг 0.5 мин", {"method": "rk4", "step": 0.5}),
+    ("rk4, шаг 1 мин", {"method": "rk4", "step": 1.0}),
+    ("rk4, шаг 2 мин", {"method": "rk4", "step": 2.0}),
+    ("adaptive, rtol 1e-4", {"method": "adaptive"}),
+    ("adaptive, rtol 1e-6", {"method": "adaptive", "rtol": 1e-6, "atol": 1e-8}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    P, S = parameter_matrix([{}]), scenario_matrix([{}])
+    _, reference, _ = simulate(P, S, method="adaptive", rtol=1e-9, atol=1e-10)
+
+    for label, options in CONFIGURATIONS:
+        simulate(P, S, **options)  # прогрев
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            _, glucose, stats = simulate(P, S, **options)
+        elapsed = (time.perf_counter() - started) / args.repeat
+        error = np.abs(glucose - reference).max() * MG_DL_PER_MMOL_L
+        print(f"{label:<22} {elapsed * 1000:7.1f} мс  шагов {stats['steps']:5d}  "
+              f"вызовов f {stats['rhs_evaluations']:5d}  ошибка {error:.4f} мг/дл")
+
+
+if __name__ == "__main__":
+    main()
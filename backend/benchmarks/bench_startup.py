@@ -0,0 +1,111 @@
+# backend/benchmarks/bench_startup.py
+"""
+Время запуска приложения:
+  * холодный импорт app.main (медиана по нескольким новым процессам) и самые тяжелые модули;
+  * время до первого ответа каждого роутера в новом процессе:
+    импорт + lifespan (миграции, писатель) + первый запрос, который сам инициализирует то, что ему нужно.
+    Фоновый прогрев отключен (WARMUP_ON_STARTUP=0), чтобы измерять ленивую инициализацию.
+
+Запуск из каталога backend (нужны SECRET_KEY/ENCRYPTION_KEY и база с врачом 'doctor'):
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# (метка, метод, путь, тело запроса, нужен ли токен)
+FIRST_REQUESTS = [
+    ("/", "GET", "/", None, False),
+    ("ready", "GET", "/api/ready", None, False),
+    ("auth: login", "POST", "/api/auth/login", {"username": "doctor", "password": "supersecretpassword123"}, False),
+    ("patients: список", "GET", "/api/patients/", None, True),
+    ("ingest", "POST", "/api/ingest/", {"patient_id": 1, "data_points": []}, False),
+    ("recommendations: interpret", "POST", "/api/recommendations/interpret", {"text": "снизить базу на 10 %"}, True),
+]
+
+
+def child_import():
+    started = time.perf_counter()
+    import app.main  # noqa: F401
+    print(json.dumps({"import_seconds": time.perf_counter() - started}))
+
+
+def child_first_request(index: int):
+    started = time.perf_counter()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.auth_utils import create_doctor_token
+    from app.database import connection
+
+    label, method, path, body, needs_token = FIRST_REQUESTS[index]
+    with TestClient(app) as client:
+        headers = {}
+        if needs_token:
+            # Токен выдается напрямую, чтобы в замер не попал bcrypt из /login
+            with connection() as con:
+                doctor = con.execute("SELECT id, username, token_version FROM doctors WHERE username = 'doctor'").fetchone()
+            headers["Authorization"] = f"Bearer {create_doctor_token(doctor)}"
+        response = client.request(method, path, json=body, headers=headers)
+        elapsed = time.perf_counter() - started
+    print(json.dumps({"seconds": elapsed, "status": response.status_code}))
+
+
+def run_child(*args) -> dict:
+    env = dict(os.environ, WARMUP_ON_STARTUP="0")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", *args],
+        check=True, capture_output=True, text=True, env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def heaviest_imports(limit: int = 8) -> list:
+    """Модули с наибольшим суммарным временем импорта (python -X importtime)."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        check=True, capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            name = parts[2].strip()
+            if "." not in name or name.startswith("app."):
+                rows.append((int(parts[1]), name))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child-import", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child-request", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_import:
+        child_import()
+        return
+    if args.child_request is not None:
+        child_first_request(args.child_request)
+        return
+
+    imports = [run_child("--child-import")["import_seconds"] for _ in range(args.runs)]
+    print(f"Холодный импорт app.main: медиана {statistics.median(imports) * 1000:.0f} мс "
+          f"(мин {min(imports) * 1000:.0f}, макс {max(imports) * 1000:.0f})")
+    print("Самые тяжелые модули (мс, с зависимостями):")
+    for microseconds, name in heaviest_imports():
+        print(f"  {microseconds / 1000:8.1f}  {name}")
+
+    print("Время до первого ответа (импорт + lifespan + первый запрос):")
+    for index, (label, *_rest) in enumerate(FIRST_REQUESTS):
+        results = [run_child("--child-request", str(index)) for _ in range(args.runs)]
+        seconds = statistics.median(result["seconds"] for result in results)
+        print(f"  {label:<28} {seconds * 1000:7.0f} мс (HTTP {results[0]['status']})")
+
+
+if __name__ == "__main__":
+    main()
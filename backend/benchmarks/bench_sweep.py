@@ -0,0 +1,56 @@
+# backend/benchmarks/bench_sweep.py
+"""
+Перечисление вариантов (Vbas x сдвиг болюса ti_1) для параметров по умолчанию:
+  "по одному":  отдельная симуляция на каждый вариант (как последовательные вызовы /simulate)
+  "пачкой":     одна векторная пачка в процессе
+  "процессы":   app.sweeps.run_sweep с пулом процессов (SWEEP_WORKERS, порог SWEEP_POOL_THRESHOLD)
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_sweep --variants 500 --method rk4
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.simulation import DEFAULT_PARAMETERS, DEFAULT_SCENARIO, simulate
+from app.sweeps import SWEEP_WORKERS, build_variants, run_sweep, shutdown_pool, summarize
+
+
+def measure(label, func, variants):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {elapsed * 1000:8.0f} мс  ({elapsed / variants * 1000:.2f} мс на вариант)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", type=int, default=500)
+    parser.add_argument("--method", choices=("rk4", "adaptive"), default="rk4")
+    parser.add_argument("--single", type=int, default=50, help="сколько вариантов считать по одному (время экстраполируется)")
+    args = parser.parse_args()
+
+    shifts = [-15.0, 0.0, 15.0, 30.0]
+    scales = np.linspace(0.7, 1.3, max(args.variants // len(shifts), 1)).tolist()
+    grid = [{"name": "Vbas", "scale": scales}, {"name": "ti_1", "shift": shifts}]
+    P, S, _ = build_variants(DEFAULT_PARAMETERS, DEFAULT_SCENARIO, [], grid)
+    variants = P.shape[1]
+    print(f"Вариантов: {variants}, метод {args.method}, SWEEP_WORKERS={SWEEP_WORKERS}")
+
+    single = min(args.single, variants)
+    started = time.perf_counter()
+    for column in range(single):
+        simulate(P[:, column:column + 1], S[:, column:column + 1], method=args.method)
+    per_variant = (time.perf_counter() - started) / single
+    print(f"{'по одному':<12} {per_variant * variants * 1000:8.0f} мс  ({per_variant * 1000:.2f} мс на вариант, "
+          f"экстраполяция по {single})")
+
+    measure("пачкой", lambda: summarize(*simulate(P, S, method=args.method)[:2]), variants)
+    run_sweep(P, S, method=args.method)  # прогрев: запуск процессов пула
+    measure("процессы", lambda: summarize(*run_sweep(P, S, method=args.method)[:2]), variants)
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
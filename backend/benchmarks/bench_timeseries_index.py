@@ -0,0 +1,76 @@
+# backend/benchmarks/bench_timeseries_index.py
+"""
+Задержка выборки глюкозы за 7 дней в зависимости от размера timeseries_data.
+С покрывающим индексом (миграция 2) время должно оставаться почти постоянным.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_timeseries_index --sizes 43200 1000000 5000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.database import create_connection
+from app.migrations import apply_migrations
+
+POINTS_PER_DAY = 288
+DAYS_PER_PATIENT = 365
+START_EPOCH = 1_700_000_000
+
+QUERY = """
+    SELECT timestamp_epoch, value FROM timeseries_data
+    WHERE patient_id = ? AND record_type = 'glucose' AND timestamp_epoch BETWEEN ? AND ?
+    ORDER BY timestamp_epoch ASC
+"""
+
+
+def fill(con, total_rows):
+    points_per_patient = POINTS_PER_DAY * DAYS_PER_PATIENT
+    patient_id, inserted = 0, 0
+    while inserted < total_rows:
+        patient_id += 1
+        count = min(points_per_patient, total_rows - inserted)
+        rows = (
+            (patient_id, "", START_EPOCH + i * 300, "glucose", round(random.uniform(3, 15), 1))
+            for i in range(count)
+        )
+        con.executemany(
+            "INSERT INTO timeseries_data (patient_id, timestamp, timestamp_epoch, record_type, value) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        inserted += count
+    con.commit()
+    return patient_id
+
+
+def measure(con, patients, repeats):
+    window = 7 * 86400
+    latest_start = START_EPOCH + (DAYS_PER_PATIENT - 7) * 86400
+    started = time.perf_counter()
+    for _ in range(repeats):
+        start = random.randint(START_EPOCH, latest_start)
+        con.execute(QUERY, (random.randint(1, patients), start, start + window)).fetchall()
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[43200, 1_000_000, 5_000_000])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            con = create_connection(os.path.join(tmp_dir, "bench.db"))
+            apply_migrations(con)
+            patients = fill(con, size)
+            con.execute("ANALYZE")
+            latency = measure(con, patients, args.repeats)
+            con.close()
+        print(f"{size:>12} строк: {latency:8.3f} мс на выборку 7 дней")
+
+
+if __name__ == "__main__":
+    main()
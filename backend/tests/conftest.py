@@ -0,0 +1,117 @@
+# backend/tests/conftest.py
+"""
+Общие фикстуры тестов. Запуск из каталога backend:
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+
+Настройки (app.config) читаются при импорте модулей app, поэтому окружение задается здесь, до импорта:
+временная база, сгенерированные ключи, дешевый bcrypt, без фонового писателя и прогрева.
+Значения из .env разработчика переменные окружения не перекрывают - тесты не трогают рабочую базу.
+"""
+import os
+import secrets
+import tempfile
+from datetime import date
+
+from cryptography.fernet import Fernet
+
+TEST_DIR = tempfile.mkdtemp(prefix="glukoze-tests-")
+os.environ.update({
+    "DB_NAME": os.path.join(TEST_DIR, "test.db"),
+    "SECRET_KEY": secrets.token_hex(32),
+    "ENCRYPTION_KEY": Fernet.generate_key().decode(),
+    "BCRYPT_ROUNDS": "4",
+    "INGEST_WRITE_BEHIND": "0",
+    "INGEST_SPOOL_DIR": "",
+    "WARMUP_ON_STARTUP": "0",
+    "CHUNKED_RECORD_TYPES": "",
+    "SWEEP_WORKERS": "1",
+    "SIMULATION_CACHE_DIR": "",
+    "PARSE_CACHE_DB": "",
+})
+
+import pytest  # noqa: E402
+
+from app.auth_utils import create_doctor_token  # noqa: E402
+from app.blind_index import index_patient  # noqa: E402
+from app.config import DB_NAME  # noqa: E402
+from app.database import create_connection  # noqa: E402
+from app.encryption_utils import encrypt_data  # noqa: E402
+from app.migrations import apply_migrations  # noqa: E402
+from app.password_utils import hash_password  # noqa: E402
+
+TEST_PASSWORD = "test-password-123"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    con = create_connection(DB_NAME)
+    apply_migrations(con)
+    con.close()
+    return DB_NAME
+
+
+@pytest.fixture
+def con(database):
+    connection = create_connection(database)
+    yield connection
+    connection.close()
+
+
+def create_doctor(con, username: str) -> dict:
+    cur = con.execute(
+        "INSERT INTO doctors (username, hashed_password, full_name, specialization) VALUES (?, ?, ?, ?)",
+        (username, hash_password(TEST_PASSWORD), "Тестовый Врач", "Эндокринолог"),
+    )
+    con.commit()
+    return dict(con.execute("SELECT id, username, token_version FROM doctors WHERE id = ?", (cur.lastrowid,)).fetchone())
+
+
+def create_patient(con, doctor_id: int, full_name: str = "Иванов Иван Иванович") -> int:
+    cur = con.execute(
+        "INSERT INTO patients (doctor_id, encrypted_full_name, date_of_birth, encrypted_contact_info) VALUES (?, ?, ?, ?)",
+        (doctor_id, encrypt_data(full_name), date(1980, 1, 1), encrypt_data("+7 000 000-00-00")),
+    )
+    index_patient(con, doctor_id, cur.lastrowid, full_name)
+    con.commit()
+    return cur.lastrowid
+
+
+@pytest.fixture(scope="session")
+def doctor(database):
+    connection = create_connection(database)
+    row = create_doctor(connection, "test-doctor")
+    connection.close()
+    return row
+
+
+@pytest.fixture
+def auth_headers(doctor):
+    return {"Authorization": f"Bearer {create_doctor_token(doctor)}"}
+
+
+@pytest.fixture
+def patient(con, doctor):
+    """Новый пациент на каждый тест: тесты не видят данных друг друга."""
+    return create_patient(con, doctor["id"])
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def store_points(con, patient_id: int, record_type: str, epochs, values):
+    """Записывает точки так же, как прием данных: строки/чанки, агрегаты, версия рядов пациента."""
+    from app.ingest_pipeline import store_rows
+    from app.time_utils import from_epoch
+
+    store_rows(con, [
+        (patient_id, from_epoch(int(epoch)), int(epoch), record_type, float(value), None)
+        for epoch, value in zip(epochs, values)
+    ])
+    con.commit()
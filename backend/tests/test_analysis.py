@@ -0,0 +1,56 @@
+# backend/tests/test_analysis.py
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.analysis_utils import NO_FINDINGS_MESSAGE, analyze_patient_data
+from benchmarks.bench_analysis import legacy_analyze_patient_data
+
+
+def generate(seed: int, days: int = 5):
+    """CGM каждые 5 минут со случайными ночными гипогликемиями и пиками, 3 приема пищи в день."""
+    rnd = random.Random(seed)
+    start = datetime(2025, 3, 1)
+    records = []
+    for minute in range(0, days * 24 * 60, 5):
+        moment = start + timedelta(minutes=minute)
+        value = round(rnd.uniform(4.2, 9.5), 1)
+        if moment.hour < 6 and rnd.random() < 0.01:
+            value = round(rnd.uniform(2.5, 3.9), 1)
+        elif rnd.random() < 0.005:
+            value = round(rnd.uniform(10.1, 16.0), 1)
+        records.append({"timestamp": moment, "record_type": "glucose", "value": value})
+    for day in range(days):
+        for hour in (8, 13, 19):
+            moment = start + timedelta(days=day, hours=hour, minutes=rnd.randint(0, 59))
+            records.append({"timestamp": moment, "record_type": "carbs", "value": rnd.randint(30, 80)})
+    return records
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_legacy_rules(seed):
+    records = generate(seed)
+    assert analyze_patient_data(records) == legacy_analyze_patient_data(records)
+
+
+def test_no_findings():
+    records = [
+        {"timestamp": datetime(2025, 3, 1, 12, 0), "record_type": "glucose", "value": 6.0},
+        {"timestamp": datetime(2025, 3, 1, 11, 0), "record_type": "carbs", "value": 40},
+    ]
+    assert analyze_patient_data(records) == [NO_FINDINGS_MESSAGE]
+    assert analyze_patient_data([]) == [NO_FINDINGS_MESSAGE]
+
+
+def test_window_bounds_match_legacy():
+    # Показание ровно в момент еды не входит в окно, ровно через 2 часа - входит
+    meal = datetime(2025, 3, 1, 13, 0)
+    for offset, expect_spike in ((timedelta(0), False), (timedelta(hours=2), True), (timedelta(hours=2, seconds=1), False)):
+        records = [
+            {"timestamp": meal, "record_type": "carbs", "value": 50},
+            {"timestamp": meal + offset, "record_type": "glucose", "value": 12.0},
+        ]
+        result = analyze_patient_data(records)
+        assert result == legacy_analyze_patient_data(records)
+        assert (result != [NO_FINDINGS_MESSAGE]) == expect_spike
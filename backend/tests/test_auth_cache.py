@@ -0,0 +1,35 @@
+# backend/tests/test_auth_cache.py
+from conftest import TEST_PASSWORD, create_doctor
+
+from app import auth_utils
+from app.auth_utils import create_doctor_token, doctor_cache, invalidate_doctor
+
+
+def test_stale_doctor_row_is_not_cached(con):
+    doctor = create_doctor(con, "cache-race")
+    # Запрос прочитал врача из базы, затем смена пароля закоммичена и кэш сброшен
+    generation = auth_utils._invalidations
+    stale_row = auth_utils._load_doctor("id", doctor["id"])
+    invalidate_doctor(doctor["id"])
+    auth_utils._cache_doctor(doctor["id"], stale_row, generation)
+    assert doctor_cache.get(doctor["id"]) is None
+
+    auth_utils._cache_doctor(doctor["id"], stale_row, auth_utils._invalidations)
+    assert doctor_cache.get(doctor["id"]) == stale_row
+
+
+def test_change_password_revokes_cached_token(client, con):
+    doctor = create_doctor(con, "password-change")
+    old_headers = {"Authorization": f"Bearer {create_doctor_token(doctor)}"}
+    assert client.get("/api/auth/me", headers=old_headers).status_code == 200  # врач попадает в кэш
+
+    response = client.post(
+        "/api/auth/change-password",
+        json={"old_password": TEST_PASSWORD, "new_password": "another-password-456"},
+        headers=old_headers,
+    )
+    assert response.status_code == 200, response.text
+    new_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    assert client.get("/api/auth/me", headers=old_headers).status_code == 401
+    assert client.get("/api/auth/me", headers=new_headers).status_code == 200
@@ -0,0 +1,61 @@
+# backend/tests/test_blind_index.py
+from app.auth_utils import create_doctor_token
+from app.blind_index import index_hashes, name_tokens, query_hashes, rebuild_name_index
+from conftest import create_doctor, create_patient
+
+
+def test_name_tokens_normalization():
+    assert name_tokens("Семёнова-Тян Анна  Ё. 2-я") == ["семенова", "тян", "анна", "е", "я"]
+
+
+def test_query_matches_name_prefixes():
+    hashes = index_hashes("Семёнова Анна Петровна")
+    assert query_hashes("сем ан") <= hashes
+    assert query_hashes("СЕМЕНОВА петр") <= hashes
+    assert not query_hashes("семенов анатолий") <= hashes
+    # Слова короче двух букв в поиске не участвуют
+    assert query_hashes("с а") == set()
+
+
+def search(client, headers, q):
+    response = client.get("/api/patients/", params={"q": q}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {patient["id"] for patient in response.json()}
+
+
+def test_search_endpoint(client, con, doctor, auth_headers):
+    mine = create_patient(con, doctor["id"], "Семёнова Анна Петровна")
+    namesake = create_patient(con, doctor["id"], "Семенов Андрей Петрович")
+    other_doctor = create_doctor(con, "blind-index-other")
+    foreign = create_patient(con, other_doctor["id"], "Семёнова Анна Петровна")
+
+    found = search(client, auth_headers, "семен ан")
+    assert {mine, namesake} <= found and foreign not in found
+    found = search(client, auth_headers, "Семёнова ПЕТРОВНА")
+    assert mine in found and namesake not in found
+
+    other_headers = {"Authorization": f"Bearer {create_doctor_token(other_doctor)}"}
+    assert search(client, other_headers, "семенова") == {foreign}
+
+    response = client.get("/api/patients/", params={"q": "а"}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_rebuild_skips_undecryptable_names(con, doctor):
+    good = create_patient(con, doctor["id"], "Петров Пётр")
+    broken = create_patient(con, doctor["id"], "Сидоров Сидор")
+    # Имя, зашифрованное другим ключом (например, после неверной замены ENCRYPTION_KEY)
+    from cryptography.fernet import Fernet
+    foreign_token = Fernet(Fernet.generate_key()).encrypt("Сидоров Сидор".encode()).decode()
+    con.execute("UPDATE patients SET encrypted_full_name = ? WHERE id = ?", (foreign_token, broken))
+    con.commit()
+
+    total = con.execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+    assert rebuild_name_index(con) == total - 1
+
+    indexed = {row[0] for row in con.execute("SELECT DISTINCT patient_id FROM patient_name_index")}
+    assert good in indexed and broken not in indexed
+
+    con.execute("DELETE FROM patients WHERE id = ?", (broken,))
+    con.commit()
+
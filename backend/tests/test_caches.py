@@ -0,0 +1,96 @@
+# backend/tests/test_caches.py
+import threading
+import time
+
+from app.cache_utils import LRUCache
+from app.encryption_utils import decrypt_cached, decryption_cache, encrypt_data, invalidate_decrypted
+
+
+def test_lru_eviction_order():
+    cache = LRUCache("test-lru", maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" становится самым свежим
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+
+
+def test_ttl_expiration():
+    cache = LRUCache("test-ttl", maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a", "нет") == "нет"
+    assert cache.stats()["expirations"] == 1
+
+
+def test_on_evict_called_for_every_exit():
+    evicted = []
+    cache = LRUCache("test-evict", maxsize=2, on_evict=evicted.append)
+    first = ["a"]
+    cache.set("a", first)
+    cache.set("a", first)   # та же запись - не затирается
+    cache.set("a", ["a2"])  # замена
+    cache.set("b", ["b"])
+    cache.set("c", ["c"])   # вытеснение "a"
+    cache.pop("b")
+    cache.clear()
+    assert evicted == [["a"], ["a2"], ["b"], ["c"]]
+
+
+def test_weigher_limits_total_weight():
+    cache = LRUCache("test-weight", maxsize=100, weigher=len, maxweight=10)
+    cache.set("a", b"x" * 6)
+    cache.set("b", b"x" * 6)
+    assert cache.get("a") is None and cache.weight == 6
+    cache.set("huge", b"x" * 11)  # тяжелее всего кэша - не сохраняется и никого не вытесняет
+    assert cache.get("huge") is None and cache.get("b") is not None
+    cache.pop("b")
+    assert cache.weight == 0
+
+
+def test_transform_runs_under_lock():
+    cache = LRUCache("test-transform", maxsize=10)
+    cache.set("a", bytearray(b"abc"))
+    assert cache.get("a", transform=bytes) == b"abc"
+    assert cache.get("a", transform=lambda value: cache._lock.locked()) is True
+    assert cache.get("missing", default="нет", transform=bytes) == "нет"
+
+
+def test_decrypt_cached_under_concurrent_invalidation():
+    values = {encrypt_data(f"Пациент {i}"): f"Пациент {i}" for i in range(20)}
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            for token, expected in values.items():
+                result = decrypt_cached(token)
+                if result != expected:
+                    errors.append(result)
+
+    def invalidator():
+        while not stop.is_set():
+            invalidate_decrypted(*values)
+            decryption_cache.clear()
+
+    threads = [threading.Thread(target=reader) for _ in range(3)] + [threading.Thread(target=invalidator)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    # Затертый буфер (нули) не должен попасть в результат
+    assert errors == []
+
+
+def test_invalidated_buffer_is_zeroed():
+    token = encrypt_data("Секрет")
+    assert decrypt_cached(token) == "Секрет"
+    buffer = decryption_cache.get(token)
+    invalidate_decrypted(token)
+    assert buffer == bytearray(len(buffer))
@@ -0,0 +1,94 @@
+# backend/tests/test_cgm_metrics.py
+import numpy as np
+import pytest
+from conftest import store_points
+
+from app.cgm_metrics import (
+    _uncovered_runs, collect_partials, compute_metrics, day_partials_cache, partials_from_points, window_metrics,
+)
+from app.time_utils import from_epoch
+from app.timeseries_store import read_series, write_points
+
+DAY = 86400
+START = 20000 * DAY
+
+
+def glucose(days, seed=0, offset=0):
+    rng = np.random.default_rng(seed)
+    epochs = START + offset + np.arange(0, days * DAY, 300)
+    values = np.clip(rng.normal(7.5, 2.5, len(epochs)), 2.2, 22).round(1)
+    return epochs, values
+
+
+def direct_metrics(con, patient_id, start, end):
+    """Эталон: метрики по всем сырым точкам окна одним куском."""
+    return compute_metrics(list(partials_from_points(*read_series(con, patient_id, ("glucose",), start, end)).values()))
+
+
+def test_uncovered_runs():
+    assert _uncovered_runs(1, 9, [3, 4, 7]) == [(1, 2), (5, 6), (8, 9)]
+    assert _uncovered_runs(1, 3, [1, 2, 3]) == []
+    assert _uncovered_runs(1, 3, []) == [(1, 3)]
+
+
+@pytest.mark.parametrize("window", [(0, 7 * DAY - 1), (3600, 5 * DAY + 7200), (DAY + 60, DAY + 7200)])
+def test_partials_match_direct_computation(con, patient, window):
+    store_points(con, patient, "glucose", *glucose(7))
+    start, end = START + window[0], START + window[1]
+    expected = direct_metrics(con, patient, start, end)
+    # Первый вызов заполняет кэш, второй собирает полные сутки из кэша
+    assert window_metrics(con, patient, start, end) == expected
+    assert window_metrics(con, patient, start, end) == expected
+    assert expected["readings"] > 0
+
+
+def test_full_days_served_from_cache(con, patient):
+    store_points(con, patient, "glucose", *glucose(5))
+    collect_partials(con, patient, START, START + 5 * DAY - 1)
+    hits = day_partials_cache.hits
+    collect_partials(con, patient, START, START + 5 * DAY - 1)
+    assert day_partials_cache.hits - hits == 5
+
+
+def test_new_points_invalidate_only_their_day(con, patient):
+    store_points(con, patient, "glucose", *glucose(4))
+    window = (START, START + 4 * DAY - 1)
+    window_metrics(con, patient, *window)
+
+    store_points(con, patient, "glucose", [START + 2 * DAY + 150], [21.0])
+    hits = day_partials_cache.hits
+    assert window_metrics(con, patient, *window) == direct_metrics(con, patient, *window)
+    assert day_partials_cache.hits - hits == 3
+
+
+def test_days_without_rollups_are_not_lost(con, patient):
+    epochs, values = glucose(3, seed=5)
+    store_points(con, patient, "glucose", epochs[: len(epochs) // 3], values[: len(epochs) // 3])
+    # Вторые и третьи сутки записаны в обход агрегатов (массовая загрузка)
+    write_points(con, [
+        (patient, from_epoch(int(e)), int(e), "glucose", float(v), None)
+        for e, v in zip(epochs[len(epochs) // 3:], values[len(epochs) // 3:])
+    ])
+    con.commit()
+    window = (START, START + 3 * DAY - 1)
+    metrics = window_metrics(con, patient, *window)
+    assert metrics == direct_metrics(con, patient, *window)
+    assert metrics["readings"] == len(epochs) and metrics["days_with_data"] == 3
+
+
+def test_empty_window(con, patient):
+    assert window_metrics(con, patient, START, START + 10 * DAY) == {"readings": 0, "days_with_data": 0}
+
+
+def test_metrics_endpoint(client, auth_headers, con, patient):
+    epochs = START + np.arange(0, 2 * DAY, 300)
+    store_points(con, patient, "glucose", epochs, np.round(6 + 3 * np.sin(np.arange(len(epochs)) / 20), 1))
+    window = {"start": from_epoch(START).isoformat(), "end": from_epoch(START + 2 * DAY).isoformat()}
+    response = client.get(f"/api/patients/{patient}/metrics", params=window, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    metrics = response.json()
+    assert metrics["readings"] == 576 and metrics["days_with_data"] == 2
+    assert sum(metrics["ranges"].values()) == pytest.approx(100, abs=0.5)
+
+    reversed_window = {"start": window["end"], "end": window["start"]}
+    assert client.get(f"/api/patients/{patient}/metrics", params=reversed_window, headers=auth_headers).status_code == 400
@@ -0,0 +1,35 @@
+# backend/tests/test_downsampling.py
+import numpy as np
+
+from app.downsampling import lttb, lttb_indices
+
+
+def make_series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.choice(np.arange(n * 10), n, replace=False)).astype(np.int64)
+    y = rng.normal(7, 1, n)
+    return x, y
+
+
+def test_keeps_endpoints_and_order():
+    x, y = make_series(5000)
+    indices = lttb_indices(x, y, 300)
+    assert len(indices) == 300
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_short_series_returned_as_is():
+    x, y = make_series(100)
+    np.testing.assert_array_equal(lttb_indices(x, y, 100), np.arange(100))
+    np.testing.assert_array_equal(lttb_indices(x, y, 500), np.arange(100))
+    np.testing.assert_array_equal(lttb_indices(x, y, 2), np.arange(100))
+
+
+def test_keeps_extremes():
+    x, y = make_series(10000, seed=3)
+    y[4321] = 25.0  # пик
+    y[7777] = 1.5   # гипогликемия
+    new_x, new_y = lttb(x, y, 200)
+    assert 25.0 in new_y and 1.5 in new_y
+    assert set(new_x.tolist()) <= set(x.tolist())
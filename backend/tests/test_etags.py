@@ -0,0 +1,94 @@
+# backend/tests/test_etags.py
+import numpy as np
+from conftest import create_doctor, create_patient, store_points
+from starlette.requests import Request
+
+from app.data_versions import MEDICAL_RECORDS, get_version
+from app.etags import etag_matches, make_etag
+from app.series_format import SERIES_MEDIA_TYPE
+from app.time_utils import from_epoch
+
+START = 20000 * 86400
+WINDOW = {"start_datetime": from_epoch(START).isoformat(), "end_datetime": from_epoch(START + 86400).isoformat()}
+
+
+def request_with(if_none_match):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "headers": headers})
+
+
+def test_etag_matches():
+    etag = make_etag("x", 1, None)
+    assert etag == make_etag("x", 1, None) and etag != make_etag("x", 2, None)
+    assert etag_matches(request_with(etag), etag)
+    assert etag_matches(request_with(f'"other", W/{etag}'), etag)
+    assert etag_matches(request_with("*"), etag)
+    assert not etag_matches(request_with('"other"'), etag)
+    assert not etag_matches(request_with(None), etag)
+
+
+def test_comprehensive_data_conditional_get(client, con, patient, auth_headers):
+    store_points(con, patient, "glucose", START + np.arange(0, 3600, 300), np.full(12, 6.0))
+    path = f"/api/patients/{patient}/comprehensive_data"
+
+    first = client.get(path, params=WINDOW, headers=auth_headers)
+    assert first.status_code == 200 and len(first.json()["glucose"]) == 12
+    etag = first.headers["etag"]
+    assert first.headers["vary"] == "Accept"
+
+    cached = client.get(path, params=WINDOW, headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+
+    # Двоичный ответ - другое представление того же ресурса со своим ETag
+    binary = client.get(path, params=WINDOW, headers={**auth_headers, "Accept": SERIES_MEDIA_TYPE})
+    assert binary.status_code == 200 and binary.headers["etag"] != etag
+
+    # Новые данные меняют версию рядов пациента и ETag
+    response = client.post("/api/ingest/", json={
+        "patient_id": patient,
+        "data_points": [{"timestamp": from_epoch(START + 4000).isoformat(), "record_type": "glucose", "value": 7.5}],
+    })
+    assert response.status_code == 202
+    fresh = client.get(path, params=WINDOW, headers={**auth_headers, "If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.headers["etag"] != etag
+    assert len(fresh.json()["glucose"]) == 13
+
+
+def test_patient_list_etag_changes_on_create(client, auth_headers):
+    first = client.get("/api/patients/", headers=auth_headers)
+    etag = first.headers["etag"]
+    assert client.get("/api/patients/", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+    created = client.post("/api/patients/", headers=auth_headers, json={
+        "full_name": "Новиков Олег", "date_of_birth": "1990-05-05", "contact_info": None,
+    })
+    assert created.status_code == 201, created.text
+    after = client.get("/api/patients/", headers={**auth_headers, "If-None-Match": etag})
+    assert after.status_code == 200
+    assert created.json()["id"] in {patient["id"] for patient in after.json()}
+
+
+def test_foreign_patient_not_found(client, auth_headers, con):
+    foreign = create_patient(con, create_doctor(con, "etag-other")["id"])
+    for path in ("comprehensive_data", "metrics", "glucose_data", "parameters", "scenarios"):
+        assert client.get(f"/api/patients/{foreign}/{path}", headers=auth_headers).status_code == 404
+
+    # Чужому пациенту нельзя добавить запись, и версия его записей не меняется
+    version = get_version(con, MEDICAL_RECORDS, foreign)
+    response = client.post(
+        f"/api/patients/{foreign}/records", headers=auth_headers,
+        json={"record_date": "2024-01-01T10:00:00", "record_data": "чужая запись"},
+    )
+    assert response.status_code == 404
+    assert con.execute("SELECT COUNT(*) FROM medical_records WHERE patient_id = ?", (foreign,)).fetchone()[0] == 0
+    assert get_version(con, MEDICAL_RECORDS, foreign) == version
+
+
+def test_medical_record_changes_records_version(client, auth_headers, con, patient):
+    version = get_version(con, MEDICAL_RECORDS, patient)
+    response = client.post(
+        f"/api/patients/{patient}/records", headers=auth_headers,
+        json={"record_date": "2024-01-01T10:00:00", "record_data": "осмотр"},
+    )
+    assert response.status_code == 201
+    assert get_version(con, MEDICAL_RECORDS, patient) != version
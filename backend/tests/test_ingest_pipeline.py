@@ -0,0 +1,114 @@
+# backend/tests/test_ingest_pipeline.py
+import json
+import os
+import sqlite3
+
+import pytest
+
+from app.data_versions import TIMESERIES, get_version
+from app.ingest_pipeline import SPOOL_LOCK_SUFFIX, IngestPipeline, _is_transient, _to_spool_row, _try_lock
+from app.rollups import read_rollups
+from app.time_utils import from_epoch
+
+START = 20000 * 86400
+
+
+def make_rows(patient_id, count, offset=0):
+    return [
+        (patient_id, from_epoch(START + offset + i * 300), START + offset + i * 300, "glucose", 5.0 + i % 10, None)
+        for i in range(count)
+    ]
+
+
+def count_rows(con, patient_id):
+    return con.execute("SELECT COUNT(*) FROM timeseries_data WHERE patient_id = ?", (patient_id,)).fetchone()[0]
+
+
+def test_submit_and_stop_writes_everything(con, patient, database):
+    pipeline = IngestPipeline(db_name=database, flush_interval=60, flush_points=10_000, spool_dir=None)
+    version = get_version(con, TIMESERIES, patient)
+    pipeline.start()
+    for i in range(5):
+        pipeline.submit(make_rows(patient, 20, offset=i * 20 * 300))
+    pipeline.stop()
+
+    assert count_rows(con, patient) == 100
+    assert pipeline.stats()["written_points"] == 100
+    assert pipeline.stats()["pending_points"] == 0
+    assert get_version(con, TIMESERIES, patient) > version
+    _, counts, _, _, _ = read_rollups(con, patient, ("glucose",), "1d", START, START + 86400)
+    assert counts.sum() == 100
+
+
+def test_queue_limit(database, patient):
+    from app.ingest_pipeline import IngestQueueFull
+
+    pipeline = IngestPipeline(db_name=database, max_points=10, spool_dir=None)
+    pipeline.submit(make_rows(patient, 10))
+    with pytest.raises(IngestQueueFull):
+        pipeline.submit(make_rows(patient, 1))
+    assert pipeline.stats()["rejected_points"] == 1
+
+
+def write_segment(directory, name, batches):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as segment:
+        for rows in batches:
+            segment.write(json.dumps([_to_spool_row(row) for row in rows]) + "\n")
+
+
+def test_replay_skips_live_workers(con, patient, database, tmp_path):
+    spool = tmp_path / "spool"
+    live_dir = spool / "00000000000000000001-11111"
+    dead_dir = spool / "00000000000000000002-22222"
+    write_segment(live_dir, "1-000001.ndjson", [make_rows(patient, 3)])
+    write_segment(dead_dir, "1-000001.ndjson", [make_rows(patient, 4, offset=10_000)])
+    # Сегмент прежнего формата прямо в каталоге спула и недописанная строка при падении
+    write_segment(spool, "0-000001.ndjson", [make_rows(patient, 2, offset=20_000)])
+    with open(spool / "0-000001.ndjson", "a") as segment:
+        segment.write('[[1, "2025')
+
+    # Соседний воркер жив: его файл блокировки удерживается
+    live_lock = open(str(live_dir) + SPOOL_LOCK_SUFFIX, "a")
+    assert _try_lock(live_lock)
+    try:
+        pipeline = IngestPipeline(db_name=database, spool_dir=str(spool))
+        pipeline.start()
+        pipeline.stop()
+        assert count_rows(con, patient) == 6
+        assert live_dir.is_dir() and not dead_dir.exists()
+        assert not (spool / "0-000001.ndjson").exists()
+    finally:
+        live_lock.close()
+
+    # Воркер завершился - блокировка снята ОС, следующий запуск дозаписывает его сегменты
+    pipeline = IngestPipeline(db_name=database, spool_dir=str(spool))
+    pipeline.start()
+    pipeline.stop()
+    assert count_rows(con, patient) == 9
+    assert os.listdir(spool) == []
+
+
+def test_permanent_error_drops_batches(tmp_path, patient):
+    # В базе нет схемы: ошибка не временная, повторов нет, пачки отбрасываются
+    pipeline = IngestPipeline(db_name=str(tmp_path / "empty.db"), flush_interval=60, flush_points=10_000, spool_dir=None)
+    pipeline.start()
+    pipeline.submit(make_rows(patient, 3))
+    pipeline.submit(make_rows(patient, 2))
+    pipeline.stop()
+    assert pipeline.stats()["dropped_points"] == 5
+    assert pipeline.stats()["written_points"] == 0
+
+
+def test_is_transient():
+    locked = sqlite3.OperationalError("database is locked")
+    locked.sqlite_errorcode = 5
+    assert _is_transient(locked)
+    io_error = sqlite3.OperationalError("disk I/O error")
+    io_error.sqlite_errorcode = 10 | (1 << 8)  # расширенный код SQLITE_IOERR_READ
+    assert _is_transient(io_error)
+    missing = sqlite3.OperationalError("no such table: timeseries_data")
+    missing.sqlite_errorcode = 1
+    assert not _is_transient(missing)
+    assert _is_transient(sqlite3.OperationalError("database table is locked"))
+    assert not _is_transient(sqlite3.OperationalError("no such column: value"))
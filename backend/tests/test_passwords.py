@@ -0,0 +1,37 @@
+# backend/tests/test_passwords.py
+from conftest import TEST_PASSWORD, create_doctor
+
+from app.auth_utils import create_doctor_token
+from app.routers import auth
+
+
+def change_password(client, doctor, old_password):
+    return client.post(
+        "/api/auth/change-password",
+        json={"old_password": old_password, "new_password": "another-password-456"},
+        headers={"Authorization": f"Bearer {create_doctor_token(doctor)}"},
+    )
+
+
+def test_login(client, con):
+    create_doctor(con, "login-check")
+    response = client.post("/api/auth/login", json={"username": "login-check", "password": TEST_PASSWORD})
+    assert response.status_code == 200 and response.json()["access_token"]
+    response = client.post("/api/auth/login", json={"username": "login-check", "password": "wrong-password"})
+    assert response.status_code == 401
+
+
+def test_change_password_rejects_wrong_old_password(client, con):
+    assert change_password(client, create_doctor(con, "password-wrong"), "wrong-password").status_code == 400
+
+
+def test_password_checks_are_shed_when_bcrypt_pool_is_busy(client, con, monkeypatch):
+    async def busy(*args):
+        raise auth.PasswordCheckBusy()
+
+    doctor = create_doctor(con, "password-busy")
+    monkeypatch.setattr(auth, "verify_password_async", busy)
+    response = change_password(client, doctor, TEST_PASSWORD)
+    assert response.status_code == 503 and response.headers["retry-after"] == "5"
+    response = client.post("/api/auth/login", json={"username": "password-busy", "password": TEST_PASSWORD})
+    assert response.status_code == 503
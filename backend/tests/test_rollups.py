@@ -0,0 +1,139 @@
+# backend/tests/test_rollups.py
+import numpy as np
+import pytest
+
+from app.rollups import (
+    AUTO_MIN_POINTS, ROLLUP_RESOLUTIONS, aggregate, choose_resolution, find_stale_rollups, read_rollups,
+    repair_rollups, update_rollups,
+)
+from app.time_utils import from_epoch
+from app.timeseries_store import write_points
+
+START = 20000 * 86400
+
+
+def make_rows(patient_id, record_type, epochs, values):
+    return [(patient_id, from_epoch(int(e)), int(e), record_type, float(v), None) for e, v in zip(epochs, values)]
+
+
+def naive_rollup(epochs, values, seconds):
+    buckets = {}
+    for epoch, value in zip(epochs, values):
+        buckets.setdefault(epoch // seconds * seconds, []).append(value)
+    return {bucket: (len(v), sum(v), min(v), max(v)) for bucket, v in buckets.items()}
+
+
+def as_dict(result):
+    buckets, counts, sums, mins, maxs = result
+    return {int(b): (int(c), s, lo, hi) for b, c, s, lo, hi in zip(buckets, counts, sums, mins, maxs)}
+
+
+@pytest.mark.parametrize("seconds", ROLLUP_RESOLUTIONS.values())
+def test_aggregate_matches_naive(seconds):
+    rng = np.random.default_rng(seconds)
+    epochs = np.sort(rng.integers(START, START + 3 * 86400, 1000))
+    values = rng.uniform(2, 20, len(epochs))
+    result = as_dict(aggregate(epochs, values, seconds))
+    expected = naive_rollup(epochs.tolist(), values.tolist(), seconds)
+    assert result.keys() == expected.keys()
+    for bucket, (count, total, low, high) in expected.items():
+        assert result[bucket][0] == count
+        assert result[bucket][1:] == pytest.approx((total, low, high))
+
+
+def test_update_rollups_accumulates(con, patient):
+    rng = np.random.default_rng(7)
+    epochs = np.sort(rng.integers(START, START + 2 * 86400, 600))
+    values = rng.uniform(3, 15, len(epochs)).round(1)
+    # Две порции в произвольном порядке: UPSERT складывает count/sum и уточняет min/max
+    order = rng.permutation(len(epochs))
+    for part in np.array_split(order, 2):
+        update_rollups(con, make_rows(patient, "glucose", epochs[part], values[part]))
+    con.commit()
+
+    for name, seconds in ROLLUP_RESOLUTIONS.items():
+        stored = as_dict(read_rollups(con, patient, ("glucose",), name, START, START + 2 * 86400))
+        expected = naive_rollup(epochs.tolist(), values.tolist(), seconds)
+        assert stored.keys() == expected.keys()
+        for bucket, (count, total, low, high) in expected.items():
+            assert stored[bucket][0] == count
+            assert stored[bucket][1:] == pytest.approx((total, low, high))
+
+
+def test_read_rollups_merges_record_types(con, patient):
+    update_rollups(con, make_rows(patient, "insulin_bolus", [START + 60, START + 120], [4.0, 2.0]))
+    update_rollups(con, make_rows(patient, "insulin_basal", [START + 600], [1.0]))
+    con.commit()
+    buckets, counts, sums, mins, maxs = read_rollups(
+        con, patient, ("insulin", "insulin_bolus", "insulin_basal"), "1h", START, START + 3600,
+    )
+    assert buckets.tolist() == [START]
+    assert counts.tolist() == [3]
+    assert sums.tolist() == [7.0]
+    assert (mins[0], maxs[0]) == (1.0, 4.0)
+
+
+def test_choose_resolution():
+    assert choose_resolution("15m", 0, 10) == "15m"
+    assert choose_resolution("auto", 0, 3600) == "raw"
+    assert choose_resolution("auto", 0, AUTO_MIN_POINTS * 900) == "15m"
+    assert choose_resolution("auto", 0, AUTO_MIN_POINTS * 3600) == "1h"
+    assert choose_resolution("auto", 0, AUTO_MIN_POINTS * 86400) == "1d"
+    assert choose_resolution("auto", 10, 0) == "raw"
+
+
+def test_repair_rebuilds_series_written_without_rollups(con, patient):
+    epochs = START + np.arange(0, 86400, 300)
+    values = np.full(len(epochs), 6.5)
+    # Запись в обход приема (как seed_database.py до исправления): строки есть, агрегатов нет
+    write_points(con, make_rows(patient, "glucose", epochs, values))
+    con.commit()
+    assert (patient, "glucose") in find_stale_rollups(con)
+
+    assert (patient, "glucose") in repair_rollups(con)
+    assert (patient, "glucose") not in find_stale_rollups(con)
+    _, counts, sums, _, _ = read_rollups(con, patient, ("glucose",), "1d", START, START + 86400)
+    assert counts.tolist() == [len(epochs)]
+    assert sums[0] == pytest.approx(values.sum())
+
+
+def test_repair_drops_orphaned_rollups(con, patient):
+    rows = make_rows(patient, "carbs", [START + 60], [30])
+    write_points(con, rows)
+    update_rollups(con, rows)
+    con.commit()
+    assert (patient, "carbs") not in find_stale_rollups(con)
+
+    con.execute("DELETE FROM timeseries_data WHERE patient_id = ? AND record_type = 'carbs'", (patient,))
+    con.commit()
+    assert (patient, "carbs") in find_stale_rollups(con)
+    repair_rollups(con)
+    assert con.execute(
+        "SELECT COUNT(*) FROM timeseries_rollups WHERE patient_id = ? AND record_type = 'carbs'", (patient,)
+    ).fetchone()[0] == 0
+
+
+def test_resent_chunked_points_do_not_inflate_rollups(con, patient, monkeypatch):
+    from conftest import store_points
+    from app import timeseries_store
+
+    monkeypatch.setattr(timeseries_store, "CHUNKED_RECORD_TYPES", ("glucose",))
+    epochs = START + np.arange(0, 86400, 300)
+    values = np.round(np.linspace(4, 12, len(epochs)), 1)
+    store_points(con, patient, "glucose", epochs, values)
+    # Клиент повторяет ту же пачку (например, после таймаута) и дописывает одну новую точку
+    store_points(con, patient, "glucose", np.append(epochs, START + 86400 + 60), np.append(values, 5.0))
+    assert (patient, "glucose") not in find_stale_rollups(con)
+    _, counts, sums, _, _ = read_rollups(con, patient, ("glucose",), "1d", START, START + 2 * 86400)
+    assert counts.tolist() == [len(epochs), 1]
+    assert sums[0] == pytest.approx(values.sum())
+
+    # Повтор с другим значением заменяет точку: сутки пересчитываются, включая min/max
+    store_points(con, patient, "glucose", [epochs[-1]], [2.0])
+    assert (patient, "glucose") not in find_stale_rollups(con)
+    _, counts, sums, mins, maxs = read_rollups(con, patient, ("glucose",), "1d", START, START + 86399)
+    assert counts.tolist() == [len(epochs)]
+    assert sums[0] == pytest.approx(values[:-1].sum() + 2.0)
+    assert (mins[0], maxs[0]) == (2.0, values[-2])
+    _, counts, _, _, maxs = read_rollups(con, patient, ("glucose",), "15m", int(epochs[-1]), int(epochs[-1]))
+    assert counts.tolist() == [3] and maxs[0] == values[-2]
@@ -0,0 +1,70 @@
+# backend/tests/test_series_format.py
+import numpy as np
+import pytest
+from conftest import store_points
+
+from app.series_format import DESCRIPTOR, HEADER, SERIES_MEDIA_TYPE, decode_series, encode_series
+from app.time_utils import from_epoch
+
+START = 20000 * 86400
+WINDOW = {"start_datetime": from_epoch(START).isoformat(), "end_datetime": from_epoch(START + 2 * 86400).isoformat()}
+
+
+def test_round_trip_and_alignment():
+    series = {
+        "glucose": (np.array([1, 2, 3], dtype=np.int64), np.array([5.5, 6.25, 7.0])),
+        "insulin": (np.array([10], dtype=np.int64), np.array([2.0]), np.array([1.0]), np.array([3.0])),
+        "carbs": (np.empty(0, dtype=np.int64), np.empty(0)),
+    }
+    payload = encode_series("15m", series)
+    assert len(payload) % 8 == 0
+    resolution, decoded = decode_series(payload)
+    assert resolution == "15m"
+    assert list(decoded) == list(series)
+    for name, arrays in series.items():
+        assert len(decoded[name]) == len(arrays)
+        np.testing.assert_array_equal(decoded[name][0], arrays[0] * 1000)
+        for original, restored in zip(arrays[1:], decoded[name][1:]):
+            np.testing.assert_allclose(restored, original, rtol=1e-6)
+
+    # Отметки времени каждой серии начинаются со смещения, кратного 8
+    offset = HEADER.size + len(series) * DESCRIPTOR.size
+    for arrays in decoded.values():
+        assert offset % 8 == 0
+        offset += 8 * len(arrays[0]) + 4 * len(arrays[0]) * (len(arrays) - 1)
+        offset += -offset % 8
+
+
+def test_rejects_unknown_format():
+    payload = bytearray(encode_series("raw", {}))
+    payload[:4] = b"XXXX"
+    with pytest.raises(ValueError):
+        decode_series(bytes(payload))
+
+
+@pytest.fixture
+def series_patient(con, patient):
+    epochs = START + np.arange(0, 2 * 86400, 300)
+    store_points(con, patient, "glucose", epochs, np.round(6 + 3 * np.sin(np.arange(len(epochs)) / 20), 1))
+    store_points(con, patient, "carbs", [START + 8 * 3600, START + 13 * 3600], [40, 60])
+    store_points(con, patient, "insulin_bolus", [START + 8 * 3600], [4])
+    return patient
+
+
+@pytest.mark.parametrize("query", [{}, {"resolution": "1h"}, {"max_points": 50}])
+def test_binary_matches_json(client, auth_headers, series_patient, query):
+    path = f"/api/patients/{series_patient}/comprehensive_data"
+    params = {**WINDOW, **query}
+    as_json = client.get(path, params=params, headers=auth_headers).json()
+    response = client.get(path, params=params, headers={**auth_headers, "Accept": SERIES_MEDIA_TYPE})
+    assert response.headers["content-type"] == SERIES_MEDIA_TYPE
+
+    resolution, series = decode_series(response.content)
+    assert resolution == as_json["resolution"]
+    for name, arrays in series.items():
+        points = as_json[name]
+        assert [from_epoch(int(ms) // 1000).isoformat(sep=" ") for ms in arrays[0]] == [point["x"] for point in points]
+        np.testing.assert_allclose(arrays[1], [point["y"] for point in points], rtol=1e-6)
+        if len(arrays) == 4:
+            np.testing.assert_allclose(arrays[2], [point["min"] for point in points], rtol=1e-6)
+    assert len(series["glucose"][0]) == {"resolution": 48, "max_points": 50}.get(next(iter(query), None), 576)
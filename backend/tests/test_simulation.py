@@ -0,0 +1,72 @@
+# backend/tests/test_simulation.py
+import json
+
+import numpy as np
+import pytest
+
+from app.encryption_utils import encrypt_data
+from app.simulation import DEFAULT_PARAMETERS, input_problems, parameter_matrix, scenario_matrix, simulate
+
+
+@pytest.fixture
+def patient_with_parameters(con, patient):
+    con.execute(
+        "INSERT INTO patients_parameters (patient_id, encrypted_parameters) VALUES (?, ?)",
+        (patient, encrypt_data(json.dumps(DEFAULT_PARAMETERS))),
+    )
+    con.commit()
+    return patient
+
+
+def test_input_problems_per_set():
+    P = parameter_matrix([{}, {"Vi": 0.0}, {"ksen": float("nan")}])
+    S = scenario_matrix([{}, {}, {}])
+    problems = input_problems(P, S)
+    assert problems[0] is None
+    assert "Vi" in problems[1] and "положительным" in problems[1]
+    assert "ksen" in problems[2] and "конечным" in problems[2]
+
+
+@pytest.mark.parametrize("method", ["rk4", "adaptive"])
+def test_diverging_solution_raises(method):
+    # Огромная скорость растворения делает систему жесткой: RK4 расходится, адаптивный шаг падает ниже минимума
+    with pytest.raises(ValueError):
+        simulate(parameter_matrix([{"kgri": 1e9}]), scenario_matrix([{}]), method=method)
+
+
+@pytest.mark.parametrize("method", ["rk4", "adaptive"])
+def test_simulate_rejects_zero_volume(client, auth_headers, patient_with_parameters, method):
+    response = client.post(
+        f"/api/patients/{patient_with_parameters}/simulate",
+        json={"method": method, "parameters": {"Vi": 0}}, headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert "Vi" in response.json()["detail"]
+
+
+def test_simulate_rejects_non_finite_override(client, auth_headers, patient_with_parameters):
+    response = client.post(
+        f"/api/patients/{patient_with_parameters}/simulate",
+        content='{"parameters": {"ksen": NaN}}', headers={**auth_headers, "Content-Type": "application/json"},
+    )
+    assert response.status_code == 400
+    assert "ksen" in response.json()["detail"]
+
+
+def test_simulate(client, auth_headers, patient_with_parameters):
+    response = client.post(
+        f"/api/patients/{patient_with_parameters}/simulate", json={"method": "adaptive"}, headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert np.isfinite(response.json()["glucose"]).all()
+
+
+def test_sweep_reports_failed_variants(client, auth_headers, patient_with_parameters):
+    response = client.post(
+        f"/api/patients/{patient_with_parameters}/simulate/sweep",
+        json={"method": "adaptive", "grid": [{"name": "Vi", "scale": [1.0, 0.0]}]}, headers=auth_headers,
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert "min" in body["variants"][0] and "Vi" in body["variants"][1]["error"]
+    assert body["stats"]["failed"] == 1
@@ -0,0 +1,36 @@
+# backend/tests/test_startup.py
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+CHECK_IMPORTS = """
+import sys
+import app.main
+heavy = [name for name in ("bcrypt", "app.simulation", "app.simulation_cache", "app.sweeps") if name in sys.modules]
+assert not heavy, heavy
+"""
+
+
+def test_app_imports_without_keys_and_heavy_modules():
+    env = {name: value for name, value in os.environ.items() if name not in ("SECRET_KEY", "ENCRYPTION_KEY")}
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK_IMPORTS], cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_missing_keys_fail_in_loaders(monkeypatch):
+    from app import auth_utils, encryption_utils
+
+    monkeypatch.setattr(auth_utils, "SECRET_KEY", None)
+    monkeypatch.setattr(encryption_utils, "ENCRYPTION_KEY", None)
+    monkeypatch.setattr(encryption_utils, "_fernet", None)
+    with pytest.raises(ValueError, match="SECRET_KEY"):
+        auth_utils.load_jwt()
+    with pytest.raises(ValueError, match="ENCRYPTION_KEY"):
+        encryption_utils.get_fernet()
@@ -0,0 +1,55 @@
+# backend/tests/test_streaming.py
+import json
+import os
+
+import numpy as np
+import pytest
+from conftest import store_points
+
+from app import database
+from app.database import ConnectionPool
+from app.time_utils import from_epoch
+
+START = 20000 * 86400
+WINDOW = {"start_datetime": from_epoch(START).isoformat(), "end_datetime": from_epoch(START + 2 * 86400).isoformat()}
+
+
+@pytest.fixture
+def series_patient(con, patient):
+    epochs = START + np.arange(0, 2 * 86400, 300)
+    store_points(con, patient, "glucose", epochs, np.round(6 + 3 * np.sin(np.arange(len(epochs)) / 20), 1))
+    store_points(con, patient, "carbs", [START + 8 * 3600, START + 13 * 3600], [40, 60])
+    return patient
+
+
+def read_stream(response):
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    streamed = {}
+    for line in lines[1:-1]:
+        streamed.setdefault(line["series"], []).extend(line["points"])
+    return lines[0], lines[-1], streamed
+
+
+@pytest.mark.parametrize("query", [{}, {"resolution": "1h"}, {"max_points": 50}])
+def test_stream_matches_json(client, auth_headers, series_patient, query):
+    path = f"/api/patients/{series_patient}/comprehensive_data"
+    params = {**WINDOW, **query}
+    response = client.get(path, params=params, headers={**auth_headers, "Accept": "application/x-ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    first, last, streamed = read_stream(response)
+    as_json = client.get(path, params=params, headers=auth_headers).json()
+    assert first == {"resolution": as_json["resolution"]} and last == {"done": True}
+    assert streamed == {name: as_json[name] for name in streamed}
+
+
+def test_stream_with_single_connection_pool(client, auth_headers, series_patient, monkeypatch):
+    # С пулом из одного соединения поток не должен ждать соединение, которое держит сам запрос
+    monkeypatch.setattr(database, "_pool", ConnectionPool(size=1, timeout=0.5))
+    monkeypatch.setattr(database, "_pool_pid", os.getpid())
+    response = client.get(
+        f"/api/patients/{series_patient}/comprehensive_data", params={**WINDOW, "stream": "true"}, headers=auth_headers,
+    )
+    assert response.status_code == 200, response.text
+    _, last, streamed = read_stream(response)
+    assert last == {"done": True} and len(streamed["glucose"]) == 576
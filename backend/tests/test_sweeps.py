@@ -0,0 +1,60 @@
+# backend/tests/test_sweeps.py
+import numpy as np
+import pytest
+
+from app.config import SWEEP_MAX_OUTPUT_VALUES, SWEEP_MAX_STEP_VALUES, SWEEP_MAX_VARIANTS
+from app.simulation import DEFAULT_PARAMETERS, DEFAULT_SCENARIO, PARAMETER_NAMES
+from app.sweeps import batch_limit, build_variants, run_sweep, summarize
+
+NAME = PARAMETER_NAMES[0]
+
+
+def test_batch_limit_budgets():
+    assert batch_limit(1440, 1.0, 5.0) == SWEEP_MAX_VARIANTS
+    # Мелкий шаг вывода: ограничивает число точек вывода x варианты
+    outputs = 1440 * 100 + 1
+    assert batch_limit(1440, 0.01, 0.01) <= SWEEP_MAX_OUTPUT_VALUES // outputs
+    # Мелкий шаг интегрирования: ограничивает шаги x варианты
+    assert batch_limit(1440, 0.001, 5.0) == min(SWEEP_MAX_VARIANTS, SWEEP_MAX_STEP_VALUES // 1440000)
+
+
+def test_build_variants_grid():
+    P, S, labels = build_variants(
+        DEFAULT_PARAMETERS, DEFAULT_SCENARIO, [{}, {"parameters": {NAME: 2.0}}],
+        [{"name": NAME, "scale": [1.0, 1.5, 2.0]}],
+    )
+    assert P.shape[1] == S.shape[1] == len(labels) == 6
+    assert [label[NAME] for label in labels[3:]] == [2.0, 3.0, 4.0]
+
+
+def test_build_variants_respects_limit():
+    grid = [{"name": NAME, "values": [float(i) for i in range(11)]}]
+    build_variants(DEFAULT_PARAMETERS, DEFAULT_SCENARIO, [], grid, max_variants=11)
+    with pytest.raises(ValueError, match="увеличьте step"):
+        build_variants(DEFAULT_PARAMETERS, DEFAULT_SCENARIO, [], grid, max_variants=10)
+    with pytest.raises(ValueError, match="ровно одно"):
+        build_variants(DEFAULT_PARAMETERS, DEFAULT_SCENARIO, [], [{"name": NAME, "values": [1.0], "scale": [1.0]}])
+    with pytest.raises(ValueError, match="t0 и t1"):
+        build_variants(DEFAULT_PARAMETERS, DEFAULT_SCENARIO, [], [{"name": "t1", "values": [1.0]}])
+
+
+def test_failed_variants_are_reported_per_item():
+    P, S, labels = build_variants(
+        DEFAULT_PARAMETERS, DEFAULT_SCENARIO, [], [{"name": "Vi", "values": [0.05, 0.0, 0.1]}],
+    )
+    # Расходящийся вариант в той же пачке: общий шаг не должен останавливать остальные
+    P[PARAMETER_NAMES.index("kgri"), 2] = 1e9
+    times, glucose, stats = run_sweep(P, S, method="adaptive")
+    assert [index for index, _ in stats["errors"]] == [1, 2]
+    assert "Vi" in stats["errors"][0][1]
+    assert np.isfinite(glucose[:, 0]).all() and np.isnan(glucose[:, 1:]).all()
+
+    summaries, envelopes = summarize(times, glucose)
+    assert summaries[0] is not None and summaries[1:] == [None, None]
+    assert np.isfinite(envelopes["p50"]).all()
+
+
+def test_sweep_fails_when_no_variant_succeeds():
+    P, S, _ = build_variants(DEFAULT_PARAMETERS, DEFAULT_SCENARIO, [], [{"name": "Vi", "values": [0.0, -1.0]}])
+    with pytest.raises(ValueError, match="Vi"):
+        run_sweep(P, S)
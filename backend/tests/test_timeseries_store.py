@@ -0,0 +1,96 @@
+# backend/tests/test_timeseries_store.py
+import numpy as np
+import pytest
+
+from app import timeseries_store
+from app.time_utils import from_epoch
+from app.timeseries_store import SECONDS_PER_DAY, compact, decode_chunk, encode_chunk, iter_series, read_series, write_points
+
+DAY = 20000
+
+
+def make_rows(patient_id, record_type, epochs, values):
+    return [(patient_id, from_epoch(int(e)), int(e), record_type, float(v), None) for e, v in zip(epochs, values)]
+
+
+@pytest.mark.parametrize("step", [300, 70000])
+def test_chunk_round_trip(step):
+    # Шаг 70000 с не помещается в uint16 - чанк переходит на дельты uint32
+    timestamps = DAY * SECONDS_PER_DAY + np.arange(0, SECONDS_PER_DAY, step, dtype=np.int64)
+    values = np.round(np.random.default_rng(step).uniform(2, 25, len(timestamps)), 1)
+    blob = encode_chunk(DAY, timestamps, values)
+    decoded_ts, decoded_values = decode_chunk(DAY, blob)
+    np.testing.assert_array_equal(decoded_ts, timestamps)
+    np.testing.assert_array_equal(decoded_values, values)
+    assert blob[1] == (2 if step < 0xFFFF else 4)
+
+
+def test_decode_rejects_unknown_version():
+    blob = bytearray(encode_chunk(DAY, np.array([DAY * SECONDS_PER_DAY]), np.array([5.5])))
+    blob[0] = 99
+    with pytest.raises(ValueError):
+        decode_chunk(DAY, bytes(blob))
+
+
+def test_chunked_writes_merge_with_rows(con, patient, monkeypatch):
+    monkeypatch.setattr(timeseries_store, "CHUNKED_RECORD_TYPES", ("glucose",))
+    start = DAY * SECONDS_PER_DAY
+    epochs = start + np.arange(0, 3 * SECONDS_PER_DAY, 900)
+    values = np.round(5 + np.sin(np.arange(len(epochs)) / 10), 1)
+    write_points(con, make_rows(patient, "glucose", epochs, values))
+    # Повторная отметка в чанке заменяет значение, новые точки дописываются в существующие сутки
+    write_points(con, make_rows(patient, "glucose", [epochs[1], epochs[-1] + 60], [9.9, 7.7]))
+    # Точка того же типа в строках (например, записанная до включения чанков) тоже читается
+    monkeypatch.setattr(timeseries_store, "CHUNKED_RECORD_TYPES", ())
+    write_points(con, make_rows(patient, "glucose", [start + 30], [6.6]))
+    con.commit()
+
+    assert con.execute("SELECT COUNT(*) FROM timeseries_chunks WHERE patient_id = ?", (patient,)).fetchone()[0] == 3
+    expected_ts = np.concatenate([epochs[:1], [start + 30], epochs[1:], [epochs[-1] + 60]])
+    expected_values = np.concatenate([values[:1], [6.6], [9.9], values[2:], [7.7]])
+    timestamps, read_values = read_series(con, patient, ("glucose",), int(expected_ts[0]), int(expected_ts[-1]))
+    np.testing.assert_array_equal(timestamps, expected_ts)
+    np.testing.assert_array_equal(read_values, expected_values)
+
+    # Границы диапазона внутри суток чанка
+    timestamps, _ = read_series(con, patient, ("glucose",), int(epochs[10]), int(epochs[20]))
+    np.testing.assert_array_equal(timestamps, epochs[10:21])
+
+
+def test_iter_series_matches_read_series(con, patient, monkeypatch):
+    rng = np.random.default_rng(1)
+    start = DAY * SECONDS_PER_DAY
+    chunked = np.unique(rng.integers(start, start + 5 * SECONDS_PER_DAY, 2000))
+    plain = np.unique(rng.integers(start, start + 5 * SECONDS_PER_DAY, 500))
+    plain = plain[~np.isin(plain, chunked)]
+    monkeypatch.setattr(timeseries_store, "CHUNKED_RECORD_TYPES", ("glucose",))
+    write_points(con, make_rows(patient, "glucose", chunked, rng.uniform(3, 15, len(chunked)).round(1)))
+    monkeypatch.setattr(timeseries_store, "CHUNKED_RECORD_TYPES", ())
+    write_points(con, make_rows(patient, "glucose", plain, rng.uniform(3, 15, len(plain)).round(1)))
+    con.commit()
+
+    batches = list(iter_series(con, patient, ("glucose",), start, start + 5 * SECONDS_PER_DAY, batch_size=64))
+    timestamps = np.concatenate([batch[0] for batch in batches])
+    np.testing.assert_array_equal(timestamps, np.sort(np.concatenate([chunked, plain])))
+    assert np.all(np.diff(timestamps) > 0)
+    full_ts, full_values = read_series(con, patient, ("glucose",), start, start + 5 * SECONDS_PER_DAY)
+    np.testing.assert_array_equal(full_ts, timestamps)
+    np.testing.assert_array_equal(full_values, np.concatenate([batch[1] for batch in batches]))
+
+
+def test_compact_moves_rows_without_changing_series(con, patient):
+    start = DAY * SECONDS_PER_DAY
+    epochs = start + np.arange(0, 2 * SECONDS_PER_DAY, 600)
+    values = np.round(np.linspace(4, 12, len(epochs)), 1)
+    write_points(con, make_rows(patient, "glucose", epochs, values))
+    con.commit()
+    before = read_series(con, patient, ("glucose",), start, start + 2 * SECONDS_PER_DAY)
+
+    moved = compact(con, record_types=("glucose",))
+    assert moved >= len(epochs)
+    assert con.execute(
+        "SELECT COUNT(*) FROM timeseries_data WHERE patient_id = ? AND record_type = 'glucose'", (patient,)
+    ).fetchone()[0] == 0
+    after = read_series(con, patient, ("glucose",), start, start + 2 * SECONDS_PER_DAY)
+    np.testing.assert_array_equal(before[0], after[0])
+    np.testing.assert_array_equal(before[1], after[1])
@@ -2,6 +2,7 @@ let currentToken = null;
 let currentPatientId = null;
 let patients = [];
 let glucoseChart = null;
+let liveController = null;
 
 // --- DOM Элементы ---
 const patientsListEl = document.getElementById('patients-list');
@@ -26,6 +27,16 @@ const SIDEBAR_WIDTH_KEY = 'sidebarWidth';
 const MIN_SIDEBAR_WIDTH = 180;
 const MAX_SIDEBAR_WIDTH = 600;
 const DEFAULT_SIDEBAR_WIDTH = 280;
+// Пауза перед переподключением потока новых точек после его закрытия сервером
+const LIVE_RECONNECT_DELAY_MS = 5000;
+// Порядок наборов данных графика (см. renderComprehensiveChart)
+const LIVE_DATASET_INDEX = { glucose: 0, carbs: 1, insulin: 2 };
+// Двоичный колоночный формат серий графика (описание - backend/app/series_format.py)
+const SERIES_MEDIA_TYPE = 'application/x-glukoze-series';
+const SERIES_MAGIC = 'GTSB';
+const SERIES_FLAG_MIN_MAX = 1;
+// Значения float32 округляются так же, как на сервере при чтении чанков
+const SERIES_VALUE_SCALE = 1e4;
 
 // --- Инициализация ---
 window.electronAPI.handleToken((token) => {
@@ -135,10 +146,73 @@ async function apiFetch(endpoint, options = {}) {
     return response.json();
 }
 
+// Серии графика запрашиваются в двоичном формате: меньше трафика и никакого разбора JSON по точкам
+async function apiFetchSeries(endpoint) {
+    const response = await fetch(`http://127.0.0.1:8000${endpoint}`, {
+        headers: { 'Accept': SERIES_MEDIA_TYPE, 'Authorization': `Bearer ${currentToken}` }
+    });
+    if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || `Ошибка API: ${response.statusText}`);
+    }
+    return decodeSeries(await response.arrayBuffer());
+}
+
+// В JSON время приходит без зоны и показывается как местное - сохраняем то же положение точек:
+// UTC-миллисекунды сдвигаются на смещение зоны, на графике x - число
+function chartTime(utc) {
+    return utc + new Date(utc).getTimezoneOffset() * 60000;
+}
+
+// Разбирает ответ в ту же структуру, что и JSON: { resolution, glucose: [{x, y}], ... }
+function decodeSeries(buffer) {
+    const view = new DataView(buffer);
+    const bytes = new Uint8Array(buffer);
+    const decoder = new TextDecoder('ascii');
+    const readName = (start, length) => decoder.decode(bytes.subarray(start, start + length)).replace(/\0+$/, '');
+
+    if (readName(0, 4) !== SERIES_MAGIC) throw new Error('Неизвестный формат серий');
+    const seriesCount = view.getUint8(5);
+    const result = { resolution: readName(8, 4) };
+    let offset = 16 + seriesCount * 16;
+
+    for (let i = 0; i < seriesCount; i++) {
+        const descriptor = 16 + i * 16;
+        const name = readName(descriptor, 8);
+        const count = view.getUint32(descriptor + 8, true);
+        const hasMinMax = (view.getUint8(descriptor + 12) & SERIES_FLAG_MIN_MAX) !== 0;
+
+        // int64 читается парами int32 (младшее, старшее слово) - миллисекунды точны до 2^53
+        const stamps = new Int32Array(buffer, offset, count * 2);
+        offset += count * 8;
+        const columns = [];
+        for (let k = 0; k < (hasMinMax ? 3 : 1); k++) {
+            columns.push(new Float32Array(buffer, offset, count));
+            offset += count * 4;
+        }
+        offset += (8 - offset % 8) % 8;
+
+        const round = value => Math.round(value * SERIES_VALUE_SCALE) / SERIES_VALUE_SCALE;
+        const points = new Array(count);
+        for (let j = 0; j < count; j++) {
+            const utc = stamps[2 * j + 1] * 4294967296 + (stamps[2 * j] >>> 0);
+            const point = { x: chartTime(utc), y: round(columns[0][j]) };
+            if (hasMinMax) {
+                point.min = round(columns[1][j]);
+                point.max = round(columns[2][j]);
+            }
+            points[j] = point;
+        }
+        result[name] = points;
+    }
+    return result;
+}
+
 async function fetchAndRenderPatients() {
     try {
-        // Сохраняем ответ сервера в глобальную переменную patients
-        patients = await apiFetch('/api/patients/');
+        // Сохраняем ответ сервера в глобальную переменную patients.
+        // Сводка приходит одним запросом: данные пациента + состояние за последние сутки
+        patients = await apiFetch('/api/patients/overview');
         // Рендерим полный список
         renderPatientsList(patients);
     } catch (error) {
@@ -164,7 +238,7 @@ function renderPatientsList(patientsArray) {
         }
 
         li.dataset.patientId = patient.id;
-        const statusClass = Math.random() > 0.3 ? 'status-ok' : 'status-attention';
+        const statusClass = patient.needs_attention ? 'status-attention' : 'status-ok';
 
         // Форматируем дату для отображения (опционально)
         // const dob = new Date(patient.date_of_birth).toLocaleDateString('ru-RU');
@@ -190,6 +264,7 @@ function renderPatientsList(patientsArray) {
 
 async function displayPatientDetails(patientId) {
     currentPatientId = patientId;
+    stopLiveUpdates();
     try {
         welcomeMessageEl.classList.add('hidden');
         patientDetailsEl.classList.remove('hidden');
@@ -203,12 +278,14 @@ async function displayPatientDetails(patientId) {
         endTimeInput.value = '';
 
         const [chartData, recommendationsData] = await Promise.all([
-            apiFetch(`/api/patients/${currentPatientId}/comprehensive_data`),
+            apiFetchSeries(`/api/patients/${currentPatientId}/comprehensive_data`),
             apiFetch(`/api/patients/${currentPatientId}/recommendations`)
         ]);
 
         renderComprehensiveChart(chartData);
         renderRecommendations(recommendationsData);
+        // Дальше новые точки приходят потоком, без повторной загрузки всего окна
+        startLiveUpdates(patientId);
     } catch (error) { console.error("Не удалось загрузить данные пациента:", error); }
 }
 
@@ -223,11 +300,14 @@ async function updateComprehensiveChart() {
         const endTime = endTimeInput.value || "23:59";
         const startISO = `${startDate}T${startTime}`;
         const endISO = `${endDate}T${endTime}`;
-        endpoint += `?start_datetime=${startISO}&end_datetime=${endISO}`;
+        // Для длинных диапазонов сервер сам выберет агрегаты (15м/1ч/1д) вместо всех точек
+        endpoint += `?start_datetime=${startISO}&end_datetime=${endISO}&resolution=auto`;
+        // Произвольный период - исторический, новые точки в него не добавляются
+        stopLiveUpdates();
     }
 
     try {
-        const chartData = await apiFetch(endpoint);
+        const chartData = await apiFetchSeries(endpoint);
         renderComprehensiveChart(chartData);
     } catch (error) { console.error("Не удалось обновить график:", error); }
 }
@@ -256,6 +336,80 @@ function renderComprehensiveChart(apiData) {
     glucoseChart.resize();
 }
 
+// --- Обновления в реальном времени (Server-Sent Events) ---
+// EventSource не умеет передавать заголовок Authorization, поэтому поток читается через fetch
+function stopLiveUpdates() {
+    if (liveController) {
+        liveController.abort();
+        liveController = null;
+    }
+}
+
+async function startLiveUpdates(patientId) {
+    stopLiveUpdates();
+    const controller = new AbortController();
+    liveController = controller;
+    try {
+        const response = await fetch(`http://127.0.0.1:8000/api/patients/${patientId}/live`, {
+            headers: { 'Authorization': `Bearer ${currentToken}` },
+            signal: controller.signal
+        });
+        if (!response.ok) throw new Error(`Ошибка API: ${response.statusText}`);
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                handleLiveEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+            }
+        }
+    } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error("Поток новых точек прерван:", error);
+    }
+    // Сервер закрыл поток (перезапуск или отключение медленного клиента):
+    // перезагружаем окно графика, чтобы не потерять пропущенные точки, и подписываемся снова
+    setTimeout(async () => {
+        if (liveController !== controller || currentPatientId !== patientId) return;
+        try {
+            renderComprehensiveChart(await apiFetchSeries(`/api/patients/${patientId}/comprehensive_data`));
+        } catch (error) { console.error("Не удалось обновить график:", error); }
+        if (liveController === controller && currentPatientId === patientId) startLiveUpdates(patientId);
+    }, LIVE_RECONNECT_DELAY_MS);
+}
+
+function handleLiveEvent(rawEvent) {
+    let eventName = 'message';
+    let data = '';
+    rawEvent.split('\n').forEach(line => {
+        // Строки-комментарии (пульс) и retry пропускаем
+        if (line.startsWith('event:')) eventName = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+    });
+    if (eventName !== 'points' || !glucoseChart) return;
+
+    const series = JSON.parse(data);
+    Object.entries(series).forEach(([name, points]) => {
+        const index = LIVE_DATASET_INDEX[name];
+        if (index === undefined) return;
+        const dataset = glucoseChart.data.datasets[index].data;
+        // x в событии - строка UTC без зоны ("YYYY-MM-DD HH:MM:SS"); приводим к тем же числам, что и decodeSeries.
+        // Точки не позже последней на графике (повтор после переподключения, перезагрузка окна) пропускаются
+        let lastX = dataset.length ? dataset[dataset.length - 1].x : -Infinity;
+        points.forEach(point => {
+            const x = chartTime(Date.parse(point.x.replace(' ', 'T') + 'Z'));
+            if (!(x > lastX)) return;
+            dataset.push({ x, y: point.y });
+            lastX = x;
+        });
+    });
+    glucoseChart.update('none');
+}
+
 function renderRecommendations(data) {
     recommendationsListEl.innerHTML = '';
     if (data.recommendations && data.recommendations.length > 0) {